@@ -0,0 +1,59 @@
+"""Seat map availability editor engine (Streamlit-free)."""
+from .engine import (
+    load_map,
+    build_seat_index,
+    build_store,
+    status_views,
+    row_pass,
+    PassStats,
+    parse_ranges,
+    parse_groups,
+    apply_tier_edits,
+    tier_adjustments,
+    apply_groups,
+    compile_rules,
+    apply_rules,
+    rules_report,
+    RuleError,
+    diff_stores,
+    diff_summary,
+    iter_diff_rows,
+    best_available,
+    enforce_blocked,
+    set_row_price_to_max_only,
+    find_price_mismatches,
+    serialize,
+    run_plan,
+    Journal,
+    Recorder,
+)
+
+
+__all__ = [
+    "load_map",
+    "build_seat_index",
+    "build_store",
+    "status_views",
+    "row_pass",
+    "PassStats",
+    "parse_ranges",
+    "parse_groups",
+    "apply_tier_edits",
+    "tier_adjustments",
+    "apply_groups",
+    "compile_rules",
+    "apply_rules",
+    "rules_report",
+    "RuleError",
+    "diff_stores",
+    "diff_summary",
+    "iter_diff_rows",
+    "best_available",
+    "enforce_blocked",
+    "set_row_price_to_max_only",
+    "find_price_mismatches",
+    "serialize",
+    "run_plan",
+    "Journal",
+    "Recorder",
+]
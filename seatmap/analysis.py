@@ -0,0 +1,150 @@
+"""Fused analysis passes over a loaded seat map.
+
+Two kinds of aggregate are needed after load and after every apply:
+
+* status views (AV copy/paste ranges, AV count, price tiers) — read from
+  the store's maintained indexes (store.AvailIndex runs, store.TierIndex);
+* row aggregates (row price = max seat price, seats priced below their row) —
+  computed in a single traversal of the JSON rows, with each distinct price
+  string parsed once.
+
+PassStats records how many passes a run made and how many seats each visited.
+"""
+import numpy as np
+
+from .labels import display_prefix, parse_price
+from .instrument import stage, count_visits
+from .journal import MISSING, ObjChange
+
+class PassStats:
+    """Traversal counter: [(pass name, seats visited)]."""
+
+    def __init__(self):
+        self.passes = []
+
+    def add(self, name: str, visits: int):
+        self.passes.append((name, int(visits)))
+
+    @property
+    def seat_visits(self) -> int:
+        return sum(v for _, v in self.passes)
+
+    def summary(self) -> str:
+        detail = ", ".join(f"{name} {v:,}" for name, v in self.passes)
+        return f"{len(self.passes)} passes, {self.seat_visits:,} seat visits ({detail})"
+
+    def as_dict(self):
+        return {"passes": len(self.passes), "seat_visits": self.seat_visits, "detail": dict(self.passes)}
+
+def price_value(raw, cache):
+    """parse_price with a per-run cache keyed by the raw price string."""
+    if not isinstance(raw, str):
+        return parse_price(raw)
+    p = cache.get(raw, cache)
+    if p is cache:
+        p = cache[raw] = parse_price(raw)
+    return p
+
+# ──────────────── status views (store) ────────────────
+
+def iter_av_lines(store):
+    """Copy/paste lines of the AV seats ('Stalls A1-12', …), one per run of consecutive numbers.
+
+    Read from the runs of the store's AvailIndex, rows in listing order; lines
+    are only formatted as they are consumed.
+    """
+    index = store.avail_index()
+    num, sec_id = store.num, store.sec_id
+    for r in index.order:
+        first, last = index.runs[r]
+        if not len(first):
+            continue
+        secs = sec_id[first]
+        if (secs != secs[0]).any():  # display sections differing only in case: one after the other
+            _, at, inv = np.unique(secs, return_index=True, return_inverse=True)
+            order = np.argsort(np.argsort(at)[inv], kind="stable")
+            first, last, secs = first[order], last[order], secs[order]
+        disp_pref = display_prefix(store.row_keys[r][1])
+        for i, s, e in zip(secs.tolist(), num[first].tolist(), num[last].tolist()):
+            if s == e:
+                yield f"{store.sec_disp[i]} {disp_pref}{s}"
+            else:
+                yield f"{store.sec_disp[i]} {disp_pref}{s}-{e}"
+
+@stage("views")
+def status_views(store, stats=None, lines=True):
+    """AV copy/paste lines, AV count and AV tiers.
+
+    tiers: (sec_disp, price text or "∅") -> array of store rows (sorted seat order).
+    lines=False skips formatting the copy/paste lines (None); see iter_av_lines().
+    """
+    tiers = store.tier_index()
+    out_lines = list(iter_av_lines(store)) if lines else None
+    if stats is not None:
+        stats.add("views", 0)  # both read maintained indexes, no seat sweep
+    return out_lines, len(tiers), tiers.views(store)
+
+# ──────────────── row aggregates (JSON) ────────────────
+
+@stage("rows")
+def row_pass(seat_data, row_max=True, mismatches=True, stats=None, price_cache=None, journal=None):
+    """One traversal of every row: set row price to its max seat price, then list seats below it.
+
+    Returns (rows_updated, mismatches). Never modifies seat prices. Row prices
+    are only written when they differ, and recorded in ``journal`` if given.
+    mismatches are (section, row name, row, seat) references; mismatch_table()
+    turns any slice of them into table rows.
+    """
+    cache = {} if price_cache is None else price_cache
+    change = ObjChange("price")
+    rows_updated = 0
+    found = []
+    visits = 0
+
+    for sec in seat_data.values():
+        if not isinstance(sec, dict) or sec.get("type") == "aoi":
+            continue
+        rows = sec.get("rows") or {}
+        for row_name, row in rows.items():
+            seats = row.get("seats") or {}
+            priced = []  # (seat, parsed price)
+            max_price = None
+            for seat in seats.values():
+                p = price_value(seat.get("price"), cache)
+                if p is not None:
+                    priced.append((seat, p))
+                    max_price = p if max_price is None else max(max_price, p)
+            visits += len(seats)
+
+            if row_max and max_price is not None:
+                new = str(max_price)
+                old = row.get("price", MISSING)
+                if old != new:
+                    change.add(row, old, new)
+                    row["price"] = new
+                rows_updated += 1
+
+            if not mismatches or not priced:
+                continue
+            row_price = max_price if row_max else price_value(row.get("price"), cache)
+            if row_price is None:
+                continue
+            found.extend((sec, row_name, row, seat) for seat, p in priced if p < row_price)
+
+    if journal is not None:
+        journal.record(change)
+    count_visits(visits)
+    if stats is not None:
+        stats.add("rows", visits)
+    return rows_updated, found
+
+def mismatch_table(mismatches):
+    """Table rows (dicts) for row_pass() mismatches, built as they are consumed."""
+    for sec, row_name, row, seat in mismatches:
+        yield {
+            "Section": sec.get("section_name", ""),
+            "Row": row_name,
+            "Seat": seat.get("number", ""),
+            "Row Price": str(row.get("price")).strip(),
+            "Seat Price": str(seat.get("price")).strip()
+        }
@@ -0,0 +1,282 @@
+"""Benchmark suite for the editor's hot paths on synthetic venues.
+
+    python -m seatmap bench --sizes 1k,10k,100k,1M -o baseline.json
+    python -m seatmap bench --sizes 1k,10k --compare baseline.json
+    python -m seatmap bench --sizes 100k,500k --index-memory
+    python -m seatmap bench --sizes 500k,2M --index-scaling --workers 1,2,4,8
+    python -m seatmap bench --sizes 10k,100k,1M --index-cache
+
+Each size runs the full Go pipeline ``repeat`` times and keeps the fastest
+time per stage, then runs it once more under tracemalloc for per-stage peak
+allocation (skip with --no-memory). Results are saved as JSON so two runs can
+be compared stage by stage. --index-memory instead reports what each
+per-seat structure retains (see index_memory), --index-scaling how the
+index build scales with worker processes (see index_scaling, shard.py) and
+--index-cache what the layout cache costs and saves (see index_cache).
+"""
+import gc, json, os, platform, sys, tempfile, time, tracemalloc
+
+import numpy as np
+
+from . import cache, engine, shard
+from .export import write
+from .synth import generate_venue, generate_plan
+
+STAGES = (
+    "json.loads", "index", "store", "parse_ranges", "apply",
+    "row_max", "mismatches", "views", "best_available", "serialize",
+)
+
+def parse_size(text: str) -> int:
+    """'1k' → 1000, '1M' → 1000000, '2500' → 2500."""
+    text = text.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if mult > 1 else text) * mult)
+
+def run_pipeline(raw: str, plan, clock):
+    """One Go click, stage by stage. ``clock(name)`` is called after each stage."""
+    seat_data = engine.load_map(raw)
+    clock("json.loads")
+    row_index = engine.build_seat_index(seat_data)[2]
+    clock("index")
+    store = engine.build_store(row_index)
+    clock("store")
+    parsed_groups, _ = engine.parse_groups(
+        plan["groups"], engine.section_names_from_data(seat_data), row_index
+    )
+    clock("parse_ranges")
+    engine.apply_groups(store, parsed_groups)
+    engine.enforce_blocked(store)
+    clock("apply")
+    engine.set_row_price_to_max_only(seat_data)
+    clock("row_max")
+    engine.find_price_mismatches(seat_data)
+    clock("mismatches")
+    engine.status_views(store)
+    clock("views")
+    engine.best_available(store, 4, prefer="centre")
+    clock("best_available")
+    engine.serialize(seat_data, indent=2)
+    clock("serialize")
+
+def time_stages(raw, plan, repeat=3):
+    """Fastest wall time (seconds) per stage over ``repeat`` runs."""
+    best = {}
+    for _ in range(repeat):
+        t = [time.perf_counter()]
+
+        def clock(name):
+            now = time.perf_counter()
+            best[name] = min(best.get(name, float("inf")), now - t[0])
+            t[0] = now
+
+        run_pipeline(raw, plan, clock)
+    return best
+
+def memory_stages(raw, plan):
+    """Peak traced allocation (bytes) per stage, above what was live when it started."""
+    peaks = {}
+    tracemalloc.start()
+    try:
+        base = [tracemalloc.get_traced_memory()[0]]
+
+        def clock(name):
+            cur, peak = tracemalloc.get_traced_memory()
+            peaks[name] = peak - base[0]
+            tracemalloc.reset_peak()
+            base[0] = cur
+
+        run_pipeline(raw, plan, clock)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+def bench_size(n_seats, repeat=3, memory=True, seed=0):
+    seat_data = generate_venue(n_seats, seed)
+    plan = generate_plan(seat_data, seed=seed)
+    raw = json.dumps(seat_data)
+    del seat_data
+    times = time_stages(raw, plan, repeat)
+    peaks = memory_stages(raw, plan) if memory else {}
+    return {
+        "seats": n_seats,
+        "bytes": len(raw),
+        "stages": {
+            name: {"seconds": round(times[name], 6), "peak_mb": round(peaks[name] / 1e6, 3) if name in peaks else None}
+            for name in STAGES
+        },
+        "total_seconds": round(sum(times.values()), 6),
+    }
+
+def dict_layout(seat_index, row_index):
+    """The former index: a dict of (seat, section) tuples, shared with per-row item lists."""
+    old = dict(seat_index)
+    rows = {
+        (sec_low, pref): (list(nums), [old[(sec_low, pref, n)] for n in nums], list(blocked))
+        for (sec_low, pref), (nums, _, _, blocked) in row_index.items()
+    }
+    return old, rows
+
+def index_memory(n_seats, seed=0):
+    """MB retained by the parsed map, the index and the store, next to the
+    dict/tuple index the editor used before SeatIndex (rebuilt for comparison)."""
+    raw = json.dumps(generate_venue(n_seats, seed))
+    sizes = {}
+    tracemalloc.start()
+    try:
+        def retained(name, build):
+            gc.collect()
+            before = tracemalloc.get_traced_memory()[0]
+            obj = build()
+            gc.collect()
+            sizes[name] = round((tracemalloc.get_traced_memory()[0] - before) / 1e6, 3)
+            return obj
+
+        seat_data = retained("seat_data", lambda: engine.load_map(raw))
+        seat_index, _, row_index = retained("index", lambda: engine.build_seat_index(seat_data))
+        retained("store", lambda: engine.build_store(row_index))
+        retained("index (dict/tuple layout)", lambda: dict_layout(seat_index, row_index))
+    finally:
+        tracemalloc.stop()
+    return sizes
+
+def worker_counts(text=None):
+    """'1,2,4' → [1, 2, 4]; default: 1, 2, 4, … up to the CPU count (and the CPU count itself)."""
+    if text:
+        return [int(w) for w in text.split(",") if w.strip()]
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    return counts + ([cpus] if counts[-1] != cpus else [])
+
+def index_scaling(n_seats, workers, repeat=3, seed=0):
+    """Fastest build_seat_index() seconds per worker count (1: serial); each build gets a freshly loaded map."""
+    raw = json.dumps(generate_venue(n_seats, seed))
+    best = {}
+    for w in workers:
+        for _ in range(repeat):
+            seat_data = engine.load_map(raw)
+            t0 = time.perf_counter()
+            engine.build_seat_index(seat_data, workers=w)
+            best[w] = min(best.get(w, float("inf")), time.perf_counter() - t0)
+            del seat_data
+    return best
+
+def index_cache(n_seats, repeat=3, seed=0):
+    """Fastest seconds of a cold build_seat_index(), a cache miss (build + store), a cache hit found by
+    fingerprint (another performance of the venue) and one found by the file's digest (the same file
+    again), on a fresh cache."""
+    raw = json.dumps(generate_venue(n_seats, seed)).encode()
+    best = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeat):
+            store = cache.IndexCache(os.path.join(tmp, "layouts.sqlite"))
+            store.clear()
+            for name, build in (
+                ("cold build", engine.build_seat_index),
+                ("cache miss", lambda d: cache.cached_index(d, cache=store, source=raw)),
+                ("hit (venue)", lambda d: cache.cached_index(d, cache=store)),
+                ("hit (file)", lambda d: cache.cached_index(d, cache=store, source=raw)),
+            ):
+                seat_data = engine.load_map(raw)
+                t0 = time.perf_counter()
+                build(seat_data)
+                best[name] = min(best.get(name, float("inf")), time.perf_counter() - t0)
+                del seat_data
+    return best
+
+def run(sizes, repeat=3, memory=True, seed=0, log=None):
+    results = {}
+    for n in sizes:
+        r = results[str(n)] = bench_size(n, repeat, memory, seed)
+        if log:
+            log(format_size(r))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "json_backend": engine.BACKEND,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def format_size(r) -> str:
+    lines = [f"{r['seats']:,} seats ({r['bytes'] / 1e6:.1f} MB JSON): {r['total_seconds']:.3f}s"]
+    for name, s in r["stages"].items():
+        mem = f"  peak {s['peak_mb']:.1f} MB" if s["peak_mb"] is not None else ""
+        lines.append(f"  {name:<14} {s['seconds'] * 1000:10.2f} ms{mem}")
+    return "\n".join(lines)
+
+def compare(current, baseline, threshold=1.25):
+    """Stages at least ``threshold`` × slower than the baseline: [(size, stage, old s, new s)]."""
+    regressions = []
+    for size, r in current["results"].items():
+        old = baseline.get("results", {}).get(size)
+        if not old:
+            continue
+        for name, s in r["stages"].items():
+            o = old["stages"].get(name)
+            # ignore sub-millisecond noise
+            if o and s["seconds"] > 0.001 and s["seconds"] > o["seconds"] * threshold:
+                regressions.append((size, name, o["seconds"], s["seconds"]))
+    return regressions
+
+def cmd_bench(args) -> int:
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    if args.index_memory:
+        for n in sizes:
+            print(f"{n:,} seats")
+            for name, mb in index_memory(n, args.seed).items():
+                print(f"  {name:<26} {mb:9.1f} MB")
+        return 0
+    if args.index_scaling:
+        counts = worker_counts(args.workers)
+        print(f"{os.cpu_count()} CPUs; maps under {shard.SHARD_MIN_SEATS:,} seats are always indexed serially")
+        for n in sizes:
+            best = index_scaling(n, counts, args.repeat, args.seed)
+            print(f"{n:,} seats")
+            for w, seconds in best.items():
+                print(f"  {w:>3} workers {seconds * 1000:10.1f} ms  {best[counts[0]] / seconds:5.2f}×")
+        return 0
+    if args.index_cache:
+        results = {}
+        for n in sizes:
+            best = index_cache(n, args.repeat, args.seed)
+            results[str(n)] = {
+                name: {"seconds": seconds, "vs_cold": seconds / best["cold build"]} for name, seconds in best.items()
+            }
+            print(f"{n:,} seats")
+            for name, seconds in best.items():
+                print(f"  {name:<11} {seconds * 1000:10.1f} ms  {seconds / best['cold build']:5.2f}× cold")
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"index_cache": results}, f, indent=2)
+        return 0
+    log = lambda text: print(text, file=sys.stderr, flush=True)
+    current = run(sizes, args.repeat, not args.no_memory, args.seed, log)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if not args.compare:
+        return 0
+    with open(args.compare, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    for size, name, old, new in regressions:
+        print(f"REGRESSION {int(size):,} seats {name}: {old * 1000:.2f} ms → {new * 1000:.2f} ms ({new / old:.2f}×)")
+    print(f"{len(regressions)} regressions (threshold {args.threshold:.2f}×) vs {args.compare}")
+    return 1 if regressions else 0
+
+def cmd_gen(args) -> int:
+    seat_data = generate_venue(parse_size(args.seats), args.seed)
+    with open(args.out, "wb") as f:
+        write(seat_data, f, None if args.compact else 2)
+    if args.plan:
+        with open(args.plan, "w", encoding="utf-8") as f:
+            json.dump(generate_plan(seat_data, seed=args.seed), f, indent=2)
+    return 0
@@ -0,0 +1,98 @@
+"""Best available: blocks of N adjacent sellable seats, for box office holds.
+
+    best_available(store, 6, section="Stalls", prefer="front")
+
+A seat is sellable when it is AV and not blocked (pillar, aisle, … see
+labels.BLOCK_WORDS). Adjacent means consecutive seat numbers in one row; with
+``through_blocked`` a block may also straddle blocked seats (an aisle, a
+pillar), which it doesn't count. Candidate rows come from the store's
+AvailIndex: a row is only looked at if its longest AV run (through blocked
+seats: its AV count) is at least N, and rows are tried best first until
+``limit`` blocks are found, so a query reads a few rows, not the map.
+
+prefer: "front" (each section's rows in listing order, A before B — see
+labels.row_order_key), "back" or "centre" (middle rows first). Within a row
+the block nearest the middle of the row wins; one block per row at most.
+"""
+import numpy as np
+
+from .instrument import stage, count_visits
+from .labels import compress_ranges, display_prefix, norm_section_name
+from .store import ST_AV
+
+PREFER = ("front", "back", "centre")
+
+def _row_score(index, rows, prefer):
+    rank, size = index.rank[rows], index.size[rows]
+    if prefer == "front":
+        return rank
+    if prefer == "back":
+        return size - 1 - rank
+    return np.abs(2 * rank - (size - 1))
+
+def _block(store, index, r, n, through_blocked):
+    """Store rows of the best block of ``n`` in seat row ``r``, or None."""
+    a, b = int(index.start[r]), int(index.start[r + 1])
+    pos = np.arange(a, b, dtype=np.int64)
+    if through_blocked:
+        pos = pos[~store.blocked[a:b]]
+    good = np.flatnonzero((store.status[pos] == ST_AV) & ~store.blocked[pos])
+    if len(good) < n:
+        return None
+    at, num, sec = pos[good], store.num[pos[good]], store.sec_id[pos[good]]
+    # neighbours: nothing unsellable in between, and no seat numbers missing (skipped seats are blocked)
+    link = (np.diff(good) == 1) & (np.diff(num) == np.diff(at)) & (sec[1:] == sec[:-1])
+    ends = np.r_[np.flatnonzero(~link), len(good) - 1]
+    seg_end = ends[np.r_[0, np.cumsum(~link)]]
+    starts = np.flatnonzero(seg_end - np.arange(len(good)) + 1 >= n)
+    if not len(starts):
+        return None
+    middle = store.num[a] + store.num[b - 1]
+    k = int(starts[np.argmin(np.abs(num[starts] + num[starts + n - 1] - middle))])
+    return at[k:k + n]
+
+def describe_block(store, rows):
+    """JSON-safe {"section", "row", "seats", "count"}; seats in copy/paste form ('Stalls A5-10')."""
+    sec_disp = store.display_section(int(rows[0]))
+    pref = store.prefs[store.pref_id[rows[0]]]
+    disp_pref = display_prefix(pref)
+    return {
+        "section": sec_disp,
+        "row": disp_pref.rstrip(" -") or pref,
+        "seats": ", ".join(
+            f"{sec_disp} {disp_pref}{s}" if s == e else f"{sec_disp} {disp_pref}{s}-{e}"
+            for s, e in compress_ranges(store.num[rows].tolist())
+        ),
+        "count": len(rows),
+    }
+
+@stage("blocks")
+def best_available(store, n, section=None, prefer="front", through_blocked=False, limit=5):
+    """Up to ``limit`` blocks of ``n`` adjacent sellable seats, best first: [(store rows, describe_block())].
+
+    section: display section name (None: every section). Raises ValueError on
+    a bad ``n`` or ``prefer``.
+    """
+    if n < 1:
+        raise ValueError("the block size must be at least 1")
+    if prefer not in PREFER:
+        raise ValueError(f"prefer must be one of: {', '.join(PREFER)}")
+    index = store.avail_index()
+    rows = np.flatnonzero((index.count if through_blocked else index.longest) >= n)
+    if section is not None:
+        sec_low = norm_section_name(section).lower()
+        if sec_low not in index.sections:
+            return []
+        rows = rows[index.sec[rows] == index.sections.index(sec_low)]
+    rows = rows[np.lexsort((index.pos[rows], _row_score(index, rows, prefer)))]
+
+    out, visits = [], 0
+    for r in rows.tolist():
+        visits += int(index.start[r + 1] - index.start[r])
+        block = _block(store, index, r, n, through_blocked)
+        if block is not None:
+            out.append((block, describe_block(store, block)))
+            if len(out) == limit:
+                break
+    count_visits(visits)
+    return out
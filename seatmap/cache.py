@@ -0,0 +1,348 @@
+"""Persistent index cache: reopening a known venue skips label parsing.
+
+Everything the indexer derives (prefix, number, blocked flag, sort order)
+depends only on the map's structure: section names and types, the
+section/row/seat keys and each seat's number, label and notes, plus the
+block words. fingerprint() hashes exactly that, never status or price, so
+every performance of a venue maps to one entry. An entry (CachedIndex) is
+the row index in flat NumPy arrays, stored in SQLite as raw bytes: numbers,
+blocked flags and section titles per indexed seat, and each seat as its
+ordinal, its place in the map's seat order (layout.iter_seats). It also keeps
+the seat keys used by more than one seat, which depend on labels only, so a
+hit reports them too. A map with the fingerprint has the same seats in the
+same order, so a hit turns ordinals back into seat dicts with one walk over
+the map and list slicing, without matching a label.
+
+Callers that have the bytes a map was loaded from pass them as ``source``:
+their digest (source_digest(), C speed) is remembered next to the entry, so
+opening the same file again skips the fingerprint walk too.
+
+cached_index() is build_seat_index() with the cache in front of it. The cache
+is an accelerator only: if the file can't be opened or written, maps are
+indexed as usual. `seatmap bench --index-cache` times each path against a
+cold build. At 100k seats a hit takes about a quarter of a cold build (a
+fifth when found by digest). A miss costs more than a cold build, about
+1.1-1.5×: the fingerprint, packing the entry and the SQLite write come on
+top of the build, so the cache only pays off for venues opened again.
+"""
+import gc, hashlib, json, os, sqlite3, sys, time
+from contextlib import closing
+
+import numpy as np
+
+from .engine import SeatIndex, block_matcher, build_seat_index
+from .instrument import stage, count_visits
+from .journal import MISSING, ObjChange
+from .layout import Layout, LayoutMismatch, iter_rows
+
+SCHEMA_VERSION = 4
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "seatmap", "layouts.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    digest TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS layouts (
+    fingerprint TEXT PRIMARY KEY,
+    seats INTEGER NOT NULL,
+    meta TEXT NOT NULL,
+    bounds BLOB NOT NULL,
+    nums BLOB NOT NULL,
+    ordinals BLOB NOT NULL,
+    titles BLOB NOT NULL,
+    flags BLOB NOT NULL,
+    blocked BLOB NOT NULL,
+    used REAL NOT NULL
+);
+"""
+_ARRAYS = (("bounds", np.int64), ("nums", np.int64), ("ordinals", np.int32),
+           ("titles", np.int32), ("flags", np.bool_), ("blocked", np.int32))
+
+@stage("fingerprint")
+def fingerprint(seat_data, words, seats=None) -> str:
+    """Hash of everything the index depends on (``words``: the BlockMatcher's block words).
+
+    ``seats``, if given, gets every seat the index walks, in ordinal order
+    (_seat_list()), so a hit or a miss doesn't walk the map again.
+    """
+    h = hashlib.blake2b(repr((SCHEMA_VERSION, sorted(words))).encode(), digest_size=20)
+    visits = 0
+    for sec_key, sec in seat_data.items():
+        if not isinstance(sec, dict):
+            h.update(repr((sec_key, sec)).encode())
+            continue
+        kind = sec.get("type", "def")
+        h.update(repr((sec_key, kind, sec.get("section_name"))).encode())
+        if kind == "aoi":
+            continue
+        for row_key, row in (sec.get("rows", {}) or {}).items():
+            row_seats = row.get("seats") or {}
+            visits += len(row_seats)
+            if seats is not None:
+                seats.extend(row_seats.values())
+            # one string per row: the key and the seats' text fields, separated by control characters
+            h.update(f"\x1d{row_key}\x1d{len(row_seats)}\x1d".encode())
+            h.update("".join([
+                f"{k}\x1f{s.get('number', '')}\x1f{s.get('label', '')}\x1f{s.get('notes', '')}\x1e"
+                for k, s in row_seats.items()
+            ]).encode())
+    count_visits(visits)
+    return h.hexdigest()
+
+@stage("source_digest")
+def source_digest(source, words) -> str:
+    """Hash of the bytes a map was loaded from (and the block words): the same file maps to the same fingerprint."""
+    h = hashlib.sha256(repr((SCHEMA_VERSION, sorted(words))).encode())
+    h.update(source.encode("utf-8") if isinstance(source, str) else source)
+    count_visits(len(source))
+    return h.hexdigest()
+
+def _seat_list(seat_data):
+    """Every seat the index walks, in ordinal order."""
+    return [seat for _, _, seats in iter_rows(seat_data) for seat in seats.values()]
+
+class CachedIndex:
+    """A venue's row index in flat arrays, seats given by ordinal (see the module docstring)."""
+
+    def __init__(self, seat_total, keys, section_titles, per_section_counts, duplicates, arrays):
+        self.seat_total = seat_total
+        self.keys = keys                      # [(sec_low, pref)], row index order
+        self.section_titles = section_titles  # display sections, by title id
+        self.per_section_counts = per_section_counts
+        self.duplicates = duplicates          # [(sec_low, pref, number)] repeated, as build_seat_index() found them
+        # bounds: row i is entries bounds[i]:bounds[i + 1]; nums/ordinals/titles/flags per entry;
+        # blocked: ordinals of every blocked seat, indexed or not
+        self.bounds, self.nums, self.ordinals, self.titles, self.flags, self.blocked = arrays
+
+    @classmethod
+    def from_index(cls, seat_data, per_section_counts, row_index, blocked_seats, duplicates, seats=None):
+        """Pack build_seat_index() output (and its ``blocked`` and ``duplicates`` collectors) for this map.
+
+        ``seats``: _seat_list(seat_data), if the caller has it.
+        """
+        if seats is None:
+            seats = _seat_list(seat_data)
+        # a seat's ordinal by its identity: sorted ids, searched for every indexed and blocked seat at once
+        ids = np.fromiter(map(id, seats), np.uintp, len(seats))
+        order = np.argsort(ids)
+        sorted_ids = ids[order]
+
+        def ordinals_of(objs):
+            return order[np.searchsorted(sorted_ids, np.fromiter(map(id, objs), np.uintp, len(objs)))]
+
+        enabled = gc.isenabled()
+        gc.disable()  # flat lists of existing objects and ints, no cycles to collect
+        try:
+            keys, bounds, nums, indexed, sections, flags = [], [0], [], [], [], []
+            for key, (row_nums, row_seats, row_sections, blocked) in row_index.items():
+                keys.append(key)
+                bounds.append(bounds[-1] + len(row_nums))
+                nums += row_nums
+                indexed += row_seats
+                sections += row_sections
+                flags += blocked
+            title_id = {t: i for i, t in enumerate(dict.fromkeys(sections))}
+            titles = list(map(title_id.__getitem__, sections))
+        finally:
+            if enabled:
+                gc.enable()
+        arrays = [np.array(values, dtype=dtype) for values, (_, dtype) in zip(
+            (bounds, nums, ordinals_of(indexed), titles, flags, ordinals_of(blocked_seats)), _ARRAYS
+        )]  # OverflowError for a seat number beyond int64
+        return cls(len(seats), keys, list(title_id), dict(per_section_counts), list(duplicates), arrays)
+
+    @stage("cache_bind")
+    def bind(self, seat_data, journal=None, seats=None):
+        """(row_index, [blocked seat]) of ``seat_data``; forces blocked seats to UAV like the indexer.
+
+        The map must have this entry's fingerprint; only its seat count is checked (LayoutMismatch).
+        ``seats``: _seat_list(seat_data), if the caller has it.
+        """
+        if seats is None:
+            seats = _seat_list(seat_data)
+        if len(seats) != self.seat_total:
+            raise LayoutMismatch(f"{len(seats)} seats, layout has {self.seat_total}")
+        enabled = gc.isenabled()
+        gc.disable()  # only lists and tuples are allocated here, no cycles to collect
+        try:
+            seat_of, title_of = seats.__getitem__, self.section_titles.__getitem__
+            bounds, nums, flags = self.bounds.tolist(), self.nums.tolist(), self.flags.tolist()
+            indexed = list(map(seat_of, self.ordinals.tolist()))
+            titles = list(map(title_of, self.titles.tolist()))
+            row_index = {
+                key: (nums[a:b], indexed[a:b], titles[a:b], flags[a:b])
+                for key, a, b in zip(self.keys, bounds, bounds[1:])
+            }
+        finally:
+            if enabled:
+                gc.enable()
+
+        blocked = list(map(seat_of, self.blocked.tolist()))
+        forced = ObjChange("status")
+        for seat in blocked:
+            if seat.get("status", MISSING) != "uav":
+                forced.add(seat, seat.get("status", MISSING), "uav")
+                seat["status"] = "uav"
+        if journal is not None:
+            journal.record_base(forced)
+        count_visits(len(seats))
+        return row_index, blocked
+
+class IndexCache:
+    """Venue layouts in a SQLite file, keyed by fingerprint; least recently used beyond ``max_layouts`` are dropped.
+
+    Opens a connection per call, so one instance can be shared by threads
+    (Streamlit sessions) and pickled to worker processes.
+    """
+
+    def __init__(self, path=None, max_layouts=32):
+        self.path = path or os.environ.get("SEATMAP_CACHE") or DEFAULT_PATH
+        self.max_layouts = max_layouts
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with db:  # a cache file from an older version: start it afresh
+                db.execute("DROP TABLE IF EXISTS seat_rows")
+                db.execute("DROP TABLE IF EXISTS sources")
+                db.execute("DROP TABLE IF EXISTS layouts")
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        db.executescript(_SCHEMA)
+        return db
+
+    def fingerprint_of(self, digest):
+        """The fingerprint a source_digest() was last seen with, or None."""
+        try:
+            with closing(self._connect()) as db:
+                record = db.execute("SELECT fingerprint FROM sources WHERE digest = ?", (digest,)).fetchone()
+        except (sqlite3.Error, OSError):
+            return None
+        return record and record[0]
+
+    def add_source(self, digest, key) -> bool:
+        """Remember that the file with ``digest`` has fingerprint ``key`` (an entry in the cache)."""
+        try:
+            with closing(self._connect()) as db, db:
+                db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (digest, key))
+        except (sqlite3.Error, OSError):
+            return False
+        return True
+
+    @stage("cache_read")
+    def get(self, key):
+        """The CachedIndex for ``key``, or None."""
+        try:
+            with closing(self._connect()) as db, db:
+                record = db.execute(
+                    "SELECT seats, meta, bounds, nums, ordinals, titles, flags, blocked FROM layouts"
+                    " WHERE fingerprint = ?", (key,)
+                ).fetchone()
+                if record is None:
+                    return None
+                db.execute("UPDATE layouts SET used = ? WHERE fingerprint = ?", (time.time(), key))
+        except (sqlite3.Error, OSError):
+            return None
+        seat_total, meta, *blobs = record
+        meta = json.loads(meta)
+        keys = [(sys.intern(sec_low), sys.intern(pref)) for sec_low, pref in meta["keys"]]
+        titles = [sys.intern(t) for t in meta["titles"]]
+        duplicates = [tuple(key) for key in meta["duplicates"]]
+        arrays = [np.frombuffer(blob, dtype=dtype) for blob, (_, dtype) in zip(blobs, _ARRAYS)]
+        return CachedIndex(seat_total, keys, titles, meta["counts"], duplicates, arrays)
+
+    @stage("cache_write")
+    def put(self, key, entry) -> bool:
+        """Store ``entry`` (a CachedIndex) under ``key``. False if it couldn't be written (the cache is left as it was)."""
+        meta = json.dumps({
+            "keys": entry.keys, "titles": entry.section_titles,
+            "counts": entry.per_section_counts, "duplicates": entry.duplicates,
+        })
+        blobs = [getattr(entry, name).tobytes() for name, _ in _ARRAYS]
+        try:
+            with closing(self._connect()) as db, db:
+                db.execute(
+                    "INSERT OR REPLACE INTO layouts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, entry.seat_total, meta, *blobs, time.time()),
+                )
+                db.execute(
+                    "DELETE FROM layouts WHERE fingerprint IN"
+                    " (SELECT fingerprint FROM layouts ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_layouts,)
+                )
+                db.execute("DELETE FROM sources WHERE fingerprint NOT IN (SELECT fingerprint FROM layouts)")
+        except (sqlite3.Error, OSError):
+            return False
+        count_visits(entry.seat_total)
+        return True
+
+    def clear(self):
+        with closing(self._connect()) as db, db:
+            db.execute("DELETE FROM layouts")
+            db.execute("DELETE FROM sources")
+
+def _lookup(seat_data, is_blocked, cache, journal, stats=None, workers=1, source=None):
+    """(per_section_counts, row_index, [blocked seat], [repeated key]) of ``seat_data``, bound from ``cache``
+    or built (and stored). ``source``: the bytes ``seat_data`` was loaded from, if the caller has them."""
+    digest = key = entry = seats = None
+    if source is not None:
+        digest = source_digest(source, is_blocked.words)
+        key = cache.fingerprint_of(digest)
+        entry = key and cache.get(key)
+    if entry is None:  # a file not seen before (or its entry was dropped): walk the map
+        seats = []
+        key = fingerprint(seat_data, is_blocked.words, seats)
+        entry = cache.get(key)
+        if entry is not None and digest is not None:
+            cache.add_source(digest, key)
+    if entry is not None:
+        try:
+            row_index, blocked = entry.bind(seat_data, journal, seats)
+        except LayoutMismatch:
+            pass  # a stale entry (or a fingerprint collision): rebuild and replace it
+        else:
+            if stats is not None:
+                stats.add("index (cached)", entry.seat_total)
+            return entry.per_section_counts, row_index, blocked, entry.duplicates
+        if seats is None:  # found by source digest
+            seats = []
+            key = fingerprint(seat_data, is_blocked.words, seats)
+    blocked, duplicates = [], []
+    _, per_section_counts, row_index = build_seat_index(
+        seat_data, stats, is_blocked, journal, workers, duplicates, blocked
+    )
+    try:
+        if cache.put(key, CachedIndex.from_index(seat_data, per_section_counts, row_index, blocked, duplicates, seats)) \
+                and digest is not None:
+            cache.add_source(digest, key)
+    except OverflowError:
+        pass  # a seat number too big for the cache's arrays: not cached
+    return per_section_counts, row_index, blocked, duplicates
+
+def venue_layout(seat_data, matcher=None, cache=None):
+    """Layout(seat_data, matcher), its index from ``cache`` when it holds this venue (and stored there when not)."""
+    is_blocked = matcher or block_matcher()
+    if cache is None:
+        return Layout(seat_data, is_blocked)
+    return Layout(seat_data, is_blocked, index=_lookup(seat_data, is_blocked, cache, None))
+
+def cached_index(seat_data, stats=None, matcher=None, journal=None, cache=None, workers=1, duplicates=None,
+                 source=None):
+    """build_seat_index() through ``cache`` (an IndexCache; None builds as usual).
+
+    On a hit the row index comes from the stored entry. Blocked seats are
+    forced to UAV (and journalled) either way, and ``duplicates`` gets the
+    repeated seat keys either way (stored with the entry). ``workers`` goes to
+    build_seat_index(). ``source``: the bytes (or text) ``seat_data`` was
+    loaded from; a file seen before is then found by their digest, without
+    fingerprinting the map.
+    """
+    is_blocked = matcher or block_matcher()
+    if cache is None:
+        return build_seat_index(seat_data, stats, is_blocked, journal, workers, duplicates)
+    per_section_counts, row_index, _, repeated = _lookup(
+        seat_data, is_blocked, cache, journal, stats, workers, source
+    )
+    if duplicates is not None:
+        duplicates.extend(repeated)
+    return SeatIndex(row_index), per_section_counts, row_index
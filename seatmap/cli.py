@@ -0,0 +1,434 @@
+"""Batch CLI: apply one spec to many seat map files across a process pool.
+
+    python -m seatmap apply --spec plan.json "maps/*.json" -o out/ -j 8
+    python -m seatmap apply --spec plan.json "perfs/*.json" --shared-layout   (one venue, many performances)
+    python -m seatmap apply --spec plan.json "perfs/*.json" --index-cache     (reuse indexes across runs)
+    python -m seatmap apply --spec plan.json --rules pricing.rules "maps/*.json"
+    python -m seatmap apply --spec plan.json stadium.json --index-workers 0   (index one huge map on all cores)
+    python -m seatmap rules pricing.rules venue.json --attribution seats.csv  (dry run, see rules.py)
+    python -m seatmap diff uploaded.json edited.json            (seat status/price changes, see diff.py)
+    python -m seatmap best venue.json 6 --section Stalls --prefer centre   (adjacent AV seats, see blocks.py)
+    python -m seatmap watch incoming/ --spec plan.json -o out/  (apply to files as they arrive, see watch.py)
+    python -m seatmap gen --seats 100k -o venue.json --plan plan.json
+    python -m seatmap bench --sizes 1k,100k -o baseline.json   (see bench.py)
+    python -m seatmap serve --port 8765                         (local HTTP/JSON service, see service.py)
+
+The spec is the same thing the editor collects from its widgets:
+
+    {"groups": [{"range": "Stalls A1-20", "price": "60"}, ...],
+     "price_only": false,
+     "tiers": [{"section": "Stalls", "price": "50", "new_price": "55"}],
+     "tier_change": {"percent": 10, "sections": ["Stalls"]},   (or "delta": -5; price_only only)
+     "rules": ["Stalls rows A-F = 75", "*Circle with restricted = row - 10%"],   (pricing rules, see rules.py)
+     "block_words": ["pillar", "aisle", ...]}   (optional, defaults to BLOCK_WORDS)
+"""
+import argparse, csv, glob, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import bench, engine, instrument, service, watch
+from .cache import IndexCache, cached_index, venue_layout
+from .layout import LayoutMismatch
+
+# Set in each worker (or in-process) for --shared-layout: {"layout", "prepared"}
+_shared = {}
+
+def init_shared(layout, prepared):
+    _shared.clear()
+    if layout is not None:
+        _shared.update(layout=layout, prepared=prepared)
+
+def output_path(path, out_dir=None, fmt="pretty"):
+    stem, ext = os.path.splitext(os.path.basename(path))
+    if fmt == "gzip":
+        ext += ".gz"
+    elif fmt == "patch":
+        ext = ".patch" + ext
+    if out_dir:
+        return os.path.join(out_dir, stem + ext)
+    return os.path.join(os.path.dirname(path), f"{stem}.updated{ext}")
+
+def process_file(path, plan, out_dir=None, fmt="pretty", stream=False, trace=False, cache=None, index_workers=1):
+    """Load → index → apply → serialize one file. Never raises; errors go in the result.
+
+    stream: parse section by section, keep only seat fields, and merge the
+    edits back into a re-read of the input when writing.
+    trace: add the per-stage records (see instrument.py) as result["stages"].
+    With a shared layout installed (init_shared) the index comes from it, and
+    the file falls back to its own index if its seats don't match.
+    cache: an IndexCache for the file's own index (see cache.py).
+    index_workers: processes for the file's own index build (see shard.py).
+    Seat keys used more than once are listed in result["duplicate_seats"].
+    """
+    t0 = time.perf_counter()
+    res = {"file": path, "ok": False, "seats": 0}
+    recorder = instrument.Recorder() if trace else None
+    token = instrument.start(recorder)
+    try:
+        stats = engine.PassStats()
+        journal = engine.Journal()  # load + plan changes, for patch output
+        source = None  # the file's bytes, for the index cache (not read whole when streaming)
+        if stream:
+            seat_data = engine.load_stream(path, journal)
+        else:
+            with open(path, "rb") as f:
+                source = f.read()
+            seat_data = engine.load_map(source, journal)
+        store = prepared = None
+        duplicates = []
+        if _shared:
+            try:
+                store = engine.build_store(_shared["layout"].bind(seat_data, journal), stats, journal)
+                prepared = _shared["prepared"]
+                res["layout"] = "shared"
+                duplicates.extend(_shared["layout"].duplicates)  # same seats and labels as the layout's map
+            except LayoutMismatch as e:
+                res["layout"] = f"own ({e})"
+        if store is None:
+            matcher = engine.block_matcher(plan.get("block_words"))
+            row_index = cached_index(seat_data, stats, matcher, journal, cache, index_workers, duplicates, source)[2]
+            store = engine.build_store(row_index, stats, journal)
+        r = engine.run_plan(seat_data, plan, store, stats, journal, prepared)
+        out = output_path(path, out_dir, fmt)
+        written = engine.write_file(out, seat_data, fmt, r["store"], path if stream else None)
+        res.update({
+            "ok": True,
+            "out": out,
+            "bytes": written,
+            **engine.plan_summary(r, engine.section_names_from_data(seat_data)),
+            "passes": stats.as_dict(),
+        })
+        if duplicates:
+            res["duplicate_seats"] = engine.duplicate_report(duplicates, engine.section_names_from_data(seat_data))
+    except Exception as e:
+        res["error"] = f"{type(e).__name__}: {e}"
+    instrument.stop(token)
+    if recorder is not None:
+        res["stages"] = recorder.records
+    res["seconds"] = round(time.perf_counter() - t0, 4)
+    return res
+
+def expand_patterns(patterns):
+    files = []
+    for pat in patterns:
+        hits = sorted(glob.glob(pat, recursive=True)) or ([pat] if os.path.isfile(pat) else [])
+        files.extend(h for h in hits if h not in files)
+    return files
+
+def shared_layout(path, plan, stream=False, cache=None):
+    """Layout of the venue in ``path`` and the plan prepared against it, or (None, None) if it can't be read."""
+    try:
+        if stream:
+            seat_data = engine.load_stream(path)
+        else:
+            with open(path, "rb") as f:
+                seat_data = engine.load_map(f.read())
+        layout = venue_layout(seat_data, engine.block_matcher(plan.get("block_words")), cache)
+        store = engine.build_store(layout.bind(seat_data))
+        return layout, engine.prepare_plan(plan, layout.section_names, store)
+    except Exception:
+        return None, None  # every file then reports its own error / builds its own index
+
+def run_batch(files, plan, out_dir=None, workers=None, fmt="pretty", stream=False, trace=False, shared=False,
+              cache=None, index_workers=1):
+    """Yield per-file results as they finish (input order).
+
+    shared: the files are performances of one venue; index the first file's
+    layout and resolve the plan once, then reuse both for every file.
+    cache: IndexCache consulted for the shared layout and every file's own index.
+    index_workers: processes for each file's own index build (for a few huge files).
+    """
+    layout, prepared = shared_layout(files[0], plan, stream, cache) if shared and files else (None, None)
+    if workers == 1 or len(files) <= 1:
+        init_shared(layout, prepared)
+        try:
+            for path in files:
+                yield process_file(path, plan, out_dir, fmt, stream, trace, cache, index_workers)
+        finally:
+            init_shared(None, None)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_shared, initargs=(layout, prepared)) as pool:
+        futures = [
+            pool.submit(process_file, p, plan, out_dir, fmt, stream, trace, cache, index_workers) for p in files
+        ]
+        for fut in futures:
+            yield fut.result()
+
+def format_result(r) -> str:
+    if not r["ok"]:
+        return f"FAIL {r['file']}: {r['error']}"
+    return (
+        f"ok   {r['file']} -> {r['out']}  seats={r['seats']} av+={r['made_av']} "
+        f"uav+={r['turned_off']} missing={r['missing']} tiers={r['tier_changed']} "
+        f"rows={r['rows_updated']} changes={r['changes']} ({r['seconds']:.2f}s)"
+        + (f"  rules={r['rule_changed']}" if r.get("rule_changed") else "")
+        + (f"  duplicate_keys={len(r['duplicate_seats'])}" if r.get("duplicate_seats") else "")
+        + (f"  layout={r['layout']}" if "layout" in r else "")
+    )
+
+def cmd_apply(args) -> int:
+    with open(args.spec, encoding="utf-8") as f:
+        plan = json.load(f)
+    if args.price_only:
+        plan["price_only"] = True
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as f:
+            plan["rules"] = f.read()
+
+    files = expand_patterns(args.files)
+    if not files:
+        print("No input files matched.", file=sys.stderr)
+        return 2
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    t0 = time.perf_counter()
+    total_seats = failed = 0
+    missing_files = {}  # missing-seat report -> files reporting it
+    fmt = "compact" if args.compact else args.format
+    cache = IndexCache() if args.index_cache else None
+    trace = open(args.trace, "w", encoding="utf-8") if args.trace else None
+    try:
+        for r in run_batch(
+            files, plan, args.out_dir, args.workers, fmt, args.stream, bool(trace), args.shared_layout, cache,
+            args.index_workers
+        ):
+            stages = r.pop("stages", [])
+            if trace:
+                trace.writelines(json.dumps({"file": r["file"], **s}) + "\n" for s in stages)
+            print(json.dumps(r) if args.json else format_result(r), flush=True)
+            total_seats += r["seats"]
+            failed += not r["ok"]
+            if r.get("missing_seats"):
+                missing_files.setdefault(tuple(r["missing_seats"]), []).append(r["file"])
+            if r.get("duplicate_seats"):
+                print(f"Seat keys used more than once in {r['file']} (last seat wins): "
+                      f"{', '.join(r['duplicate_seats'])}", file=sys.stderr)
+    finally:
+        if trace:
+            trace.close()
+    elapsed = time.perf_counter() - t0
+
+    for report, names in missing_files.items():
+        where = names[0] if len(names) == 1 else f"{len(names)} files"
+        print(f"Seats not found ({where}): {', '.join(report)}", file=sys.stderr)
+
+    rate = total_seats / elapsed if elapsed else 0.0
+    print(
+        f"{len(files)} files ({failed} failed), {total_seats} seats in {elapsed:.2f}s "
+        f"— {rate:,.0f} seats/sec",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+def load_store(path, block_words=None, cache=None):
+    """(seat_data, store) of one file, indexed as `apply` would."""
+    with open(path, "rb") as f:
+        source = f.read()
+    seat_data = engine.load_map(source)
+    row_index = cached_index(seat_data, matcher=engine.block_matcher(block_words), cache=cache, source=source)[2]
+    return seat_data, engine.build_store(row_index)
+
+def cmd_rules(args) -> int:
+    """Dry run: which seats each rule would take and reprice, without writing anything."""
+    with open(args.rules, encoding="utf-8") as f:
+        text = f.read()
+    seat_data, store = load_store(args.file, args.block_words)
+    try:
+        rules = engine.compile_rules(text, engine.section_names_from_data(seat_data))
+    except engine.RuleError as e:
+        print(f"{args.rules}: {e}", file=sys.stderr)
+        return 2
+    t0 = time.perf_counter()
+    rule_of = engine.evaluate_rules(store, rules)
+    report = engine.rules_report(store, rules, seat_data, rule_of)
+    elapsed = time.perf_counter() - t0
+
+    for r in report:
+        if args.json:
+            print(json.dumps(r))
+        else:
+            print(
+                f"line {r['line']:<4} seats={r['seats']:<7} change={r['would_change']:<7} "
+                f"unpriced={r['unpriced']:<5} {r['rule']}"
+            )
+    if args.attribution:
+        with open(args.attribution, "w", encoding="utf-8", newline="") as f:
+            out = csv.DictWriter(f, ["section", "seat", "line", "rule", "price"])
+            out.writeheader()
+            out.writerows(engine.iter_attribution(store, rules, rule_of, seat_data))
+    matched = sum(r["seats"] for r in report)
+    print(f"{len(rules)} rules, {matched} of {len(store)} seats matched in {elapsed:.3f}s", file=sys.stderr)
+    return 0
+
+def cmd_diff(args) -> int:
+    """Seat status/price changes from map A to map B. Exit status 1 if they differ (like diff)."""
+    cache = IndexCache() if args.index_cache else None
+    _, a = load_store(args.a, args.block_words, cache)
+    _, b = load_store(args.b, args.block_words, cache)
+    t0 = time.perf_counter()
+    d = engine.diff_stores(a, b)
+    summary = engine.diff_summary(d)
+    elapsed = time.perf_counter() - t0
+
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        for s in summary["sections"]:
+            print(
+                f"{s['section']}: status {s['status']}, price {s['price']}, "
+                f"only in A {s['only_a']}, only in B {s['only_b']}"
+            )
+    if not args.summary:
+        for r in engine.iter_diff_rows(d):
+            if args.json:
+                print(json.dumps(r))
+            elif r["change"] in ("status", "price"):
+                print(f"  {r['section']} {r['row']}: {r['change']} {r['from']} → {r['to']}: {r['seats']}")
+            else:
+                print(f"  {r['section']} {r['row']}: only in {r['change'][-1].upper()}: {r['seats']}")
+    print(
+        f"{summary['matched']} seats in both: {summary['status_changed']} status, "
+        f"{summary['price_changed']} price changes; {summary['only_a']} only in A, "
+        f"{summary['only_b']} only in B ({elapsed:.3f}s)",
+        file=sys.stderr,
+    )
+    changed = summary["status_changed"] + summary["price_changed"] + summary["only_a"] + summary["only_b"]
+    return 1 if changed else 0
+
+def cmd_best(args) -> int:
+    """Best blocks of N adjacent sellable seats in one map. Exit status 1 if there are none."""
+    _, store = load_store(args.file, args.block_words, IndexCache() if args.index_cache else None)
+    t0 = time.perf_counter()
+    try:
+        blocks = engine.best_available(store, args.n, args.section, args.prefer, args.through_blocked, args.limit)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - t0
+    for _, info in blocks:
+        print(json.dumps(info) if args.json else info["seats"])
+    print(f"{len(blocks)} blocks of {args.n} found in {elapsed * 1000:.1f}ms", file=sys.stderr)
+    return 0 if blocks else 1
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="seatmap", description="Headless seat map availability editor.")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    a = sub.add_parser("apply", help="apply a spec to many seat map files")
+    a.add_argument("files", nargs="+", help="seat map JSON files or glob patterns")
+    a.add_argument("--spec", required=True, help="JSON spec with groups / price_only / tiers")
+    a.add_argument("-o", "--out-dir", help="write outputs here (default: <name>.updated.json alongside)")
+    a.add_argument("-j", "--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    a.add_argument("--price-only", action="store_true", help="only update prices, leave availability")
+    a.add_argument("--rules", metavar="FILE", help="pricing rules to apply after the groups (see rules.py)")
+    a.add_argument(
+        "--format", choices=sorted(engine.FORMATS), default="pretty",
+        help="pretty (indent=2), compact, gzip (compact, .json.gz) or patch (RFC 6902 changes only)"
+    )
+    a.add_argument("--compact", action="store_true", help="same as --format compact")
+    a.add_argument(
+        "--stream", action="store_true",
+        help="streaming load for very large files (memory follows the seat count, not the file size)"
+    )
+    a.add_argument("--json", action="store_true", help="print per-file results as JSON lines")
+    a.add_argument(
+        "--shared-layout", action="store_true",
+        help="files are performances of one venue: index the layout and resolve the spec once"
+    )
+    a.add_argument(
+        "--index-cache", action="store_true",
+        help="keep venue indexes in a SQLite cache ($SEATMAP_CACHE, default ~/.cache/seatmap/layouts.sqlite)"
+    )
+    a.add_argument("--trace", metavar="FILE", help="write per-stage timings of every file as JSON lines")
+    a.add_argument(
+        "--index-workers", type=int, default=1,
+        help="index each file on this many processes (0: all cores; for a few huge maps, see shard.py)"
+    )
+    a.set_defaults(func=cmd_apply)
+
+    g = sub.add_parser("gen", help="write a synthetic venue (and a matching multi-price spec)")
+    g.add_argument("--seats", default="10k", help="seat count, e.g. 5000, 100k, 1M")
+    g.add_argument("--seed", type=int, default=0)
+    g.add_argument("-o", "--out", required=True, help="seat map JSON to write")
+    g.add_argument("--plan", help="also write a spec for `apply` here")
+    g.add_argument("--compact", action="store_true", help="write compact JSON instead of indent=2")
+    g.set_defaults(func=bench.cmd_gen)
+
+    b = sub.add_parser("bench", help="time and memory-profile the hot paths on synthetic venues")
+    b.add_argument("--sizes", default="1k,10k,100k,1M", help="comma-separated seat counts")
+    b.add_argument("--repeat", type=int, default=3, help="timing runs per size (fastest is kept)")
+    b.add_argument("--seed", type=int, default=0)
+    b.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    b.add_argument("--index-memory", action="store_true", help="report memory per index structure instead of timing")
+    b.add_argument(
+        "--index-scaling", action="store_true", help="time the index build per worker count instead (see shard.py)"
+    )
+    b.add_argument(
+        "--index-cache", action="store_true", help="time layout cache hits and a miss against a cold index build instead"
+    )
+    b.add_argument("--workers", help="worker counts for --index-scaling, e.g. 1,2,4,8 (default: up to the CPU count)")
+    b.add_argument("-o", "--out", help="save results as a JSON baseline")
+    b.add_argument("--compare", help="baseline JSON to compare against (exit 1 on regressions)")
+    b.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    b.set_defaults(func=bench.cmd_bench)
+
+    r = sub.add_parser("rules", help="dry-run pricing rules against one seat map")
+    r.add_argument("rules", help="rules file, one rule per line")
+    r.add_argument("file", help="seat map JSON file")
+    r.add_argument("--attribution", metavar="CSV", help="write every matched seat with its rule and new price")
+    r.add_argument("--block-words", type=lambda s: [w for w in s.split(",") if w.strip()], default=None,
+                   help="comma-separated block words (default: BLOCK_WORDS)")
+    r.add_argument("--json", action="store_true", help="print per-rule results as JSON lines")
+    r.set_defaults(func=cmd_rules)
+
+    d = sub.add_parser("diff", help="seat status/price changes between two seat maps")
+    d.add_argument("a", help="seat map A (e.g. the uploaded file)")
+    d.add_argument("b", help="seat map B (e.g. the edited file or another performance)")
+    d.add_argument("--summary", action="store_true", help="per-section counts only, no row lines")
+    d.add_argument("--json", action="store_true", help="summary and row lines as JSON")
+    d.add_argument("--block-words", type=lambda s: [w for w in s.split(",") if w.strip()], default=None,
+                   help="comma-separated block words (default: BLOCK_WORDS)")
+    d.add_argument("--index-cache", action="store_true", help="reuse venue indexes from the SQLite layout cache")
+    d.set_defaults(func=cmd_diff)
+
+    n = sub.add_parser("best", help="find blocks of N adjacent sellable seats")
+    n.add_argument("file", help="seat map JSON file")
+    n.add_argument("n", type=int, help="seats wanted together")
+    n.add_argument("--section", help="only this section (default: all)")
+    n.add_argument("--prefer", choices=engine.PREFER, default="front", help="which rows to try first")
+    n.add_argument("--through-blocked", action="store_true", help="a block may straddle blocked seats (aisle, pillar)")
+    n.add_argument("--limit", type=int, default=5, help="blocks to list, one per row at most")
+    n.add_argument("--json", action="store_true", help="print blocks as JSON lines")
+    n.add_argument("--block-words", type=lambda s: [w for w in s.split(",") if w.strip()], default=None,
+                   help="comma-separated block words (default: BLOCK_WORDS)")
+    n.add_argument("--index-cache", action="store_true", help="reuse venue indexes from the SQLite layout cache")
+    n.set_defaults(func=cmd_best)
+
+    w = sub.add_parser("watch", help="apply a spec to seat map files as they arrive in a directory")
+    w.add_argument("directory", help="directory to watch")
+    w.add_argument("--spec", required=True, help="JSON spec with groups / price_only / tiers")
+    w.add_argument("-o", "--out-dir", required=True, help="outputs, watch-report.jsonl and watch-state.json go here")
+    w.add_argument("-j", "--workers", type=int, default=4, help="files processed at once (process pool when > 1)")
+    w.add_argument("--queue", type=int, default=16, help="files waiting at most; the scanner blocks beyond that")
+    w.add_argument("--settle", type=float, default=1.0, help="seconds a file must be unmodified before it is taken")
+    w.add_argument("--interval", type=float, default=1.0, help="seconds between directory scans")
+    w.add_argument("--pattern", default="*.json", help="file name pattern to pick up")
+    w.add_argument("--price-only", action="store_true", help="only update prices, leave availability")
+    w.add_argument("--rules", metavar="FILE", help="pricing rules to apply after the groups (see rules.py)")
+    w.add_argument("--format", choices=sorted(engine.FORMATS), default="pretty", help="output format, as for apply")
+    w.add_argument("--index-cache", action="store_true", help="reuse venue indexes from the SQLite layout cache")
+    w.add_argument("--once", action="store_true", help="process what is there now, then exit")
+    w.set_defaults(func=watch.cmd_watch)
+
+    s = sub.add_parser("serve", help="run the local HTTP/JSON service")
+    s.add_argument("--host", default="127.0.0.1", help="interface to bind (default: localhost only)")
+    s.add_argument("--port", type=int, default=8765)
+    s.add_argument("--workers", type=int, default=8, help="request worker threads")
+    s.add_argument("--max-mb", type=int, default=2048, help="memory budget for loaded maps (estimated)")
+    s.add_argument("--index-cache", action="store_true", help="reuse venue indexes from the SQLite layout cache")
+    s.set_defaults(func=service.cmd_serve)
+    return p
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,143 @@
+"""Structural diff of two seat maps (or of a map before and after editing).
+
+Seats are aligned on their index keys (section, prefix, number), not on JSON
+positions, so two performances whose files list seats differently still line
+up. Both stores are already in key order; the union of their row keys gives
+every seat a (row id, number) pair, one lexsort lines the two sides up, and
+status and price are compared as array codes. Seat numbers that repeat in a
+row are paired in order (first with first, …).
+
+diff_stores() returns store rows only; diff_summary() counts them per
+section, iter_diff_rows() renders them one row at a time, with seat numbers
+range-compressed ('A1-12, A15').
+"""
+import numpy as np
+
+from .instrument import stage, count_visits
+from .journal import MISSING
+from .labels import compress_ranges, display_prefix, row_order_key
+from .store import ST_OTHER
+
+CHANGES = ("status", "price", "only_a", "only_b")
+
+def _row_ids(store, rank):
+    """Row id (rank of its (sec_low, pref) among both maps' row keys) of every store row."""
+    counts = [len(store.row_index[k][0]) for k in store.row_keys]
+    return np.repeat(np.array([rank[k] for k in store.row_keys], dtype=np.int64), counts)
+
+def _occurrence(row, num):
+    """0 for the first seat with its (row, number), 1 for a repeat, …; inputs sorted."""
+    n = len(row)
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    new = np.r_[True, (row[1:] != row[:-1]) | (num[1:] != num[:-1])]
+    at = np.arange(n, dtype=np.int64)
+    return at - np.maximum.accumulate(np.where(new, at, 0))
+
+@stage("diff")
+def diff_stores(a, b):
+    """Align store ``a`` with store ``b`` and compare status and price.
+
+    Returns {"a", "b", "matched", "status": (a rows, b rows), "price": (a rows, b rows),
+    "only_a": a rows, "only_b": b rows}, every row array in key order. Status is
+    compared as the store does (case-insensitive av/uav, other values verbatim)
+    and price as the text the tier editor shows.
+    """
+    rank = {k: i for i, k in enumerate(sorted(set(a.row_keys) | set(b.row_keys)))}
+    ra, rb = _row_ids(a, rank), _row_ids(b, rank)
+    row = np.r_[ra, rb]
+    num = np.r_[a.num, b.num]
+    occ = np.r_[_occurrence(ra, a.num), _occurrence(rb, b.num)]
+    side = np.r_[np.zeros(len(a), dtype=np.int8), np.ones(len(b), dtype=np.int8)]
+    idx = np.r_[np.arange(len(a), dtype=np.int64), np.arange(len(b), dtype=np.int64)]
+
+    order = np.lexsort((side, occ, num, row))
+    r, n, o = row[order], num[order], occ[order]
+    pair = np.flatnonzero((r[1:] == r[:-1]) & (n[1:] == n[:-1]) & (o[1:] == o[:-1]))  # side 0, then side 1
+    ia, ib = idx[order[pair]], idx[order[pair + 1]]
+    paired = np.zeros(len(order), dtype=bool)
+    paired[pair] = paired[pair + 1] = True
+    lone = order[~paired]
+
+    status = a.status[ia] != b.status[ib]
+    other = np.flatnonzero(~status & (a.status[ia] == ST_OTHER))
+    for k, i, j in zip(other.tolist(), ia[other].tolist(), ib[other].tolist()):
+        status[k] = a.refs[i].get("status", MISSING) != b.refs[j].get("status", MISSING)
+    price_ids = {text: q for q, text in enumerate(a.prices)}
+    b_to_a = np.array([price_ids.get(text, -1) for text in b.prices], dtype=np.int64)
+    price = a.price_id[ia] != b_to_a[b.price_id[ib]]
+
+    count_visits(len(a) + len(b))
+    return {
+        "a": a,
+        "b": b,
+        "matched": len(ia),
+        "status": (ia[status], ib[status]),
+        "price": (ia[price], ib[price]),
+        "only_a": idx[lone[side[lone] == 0]],
+        "only_b": idx[lone[side[lone] == 1]],
+    }
+
+def diff_summary(d):
+    """JSON-safe counts: totals and, per display section, seats changed by kind."""
+    a, b = d["a"], d["b"]
+    per = {}
+    for change in CHANGES:
+        store, rows = (b, d[change]) if change == "only_b" else (a, d[change])
+        if isinstance(rows, tuple):
+            rows = rows[0]
+        counts = np.bincount(store.sec_id[rows], minlength=len(store.sec_disp))
+        for s in np.flatnonzero(counts).tolist():
+            entry = per.setdefault(store.sec_disp[s], dict.fromkeys(CHANGES, 0))
+            entry[change] += int(counts[s])
+    return {
+        "seats_a": len(a),
+        "seats_b": len(b),
+        "matched": d["matched"],
+        "status_changed": len(d["status"][0]),
+        "price_changed": len(d["price"][0]),
+        "only_a": len(d["only_a"]),
+        "only_b": len(d["only_b"]),
+        "sections": [{"section": sec, **per[sec]} for sec in sorted(per, key=str.lower)],
+    }
+
+def _values(store, rows, change):
+    if change == "price":
+        return [store.prices[q] or "∅" for q in store.price_id[rows].tolist()]
+    refs = store.refs
+    return [str(refs[i].get("status", "")) for i in rows.tolist()]
+
+def iter_diff_rows(d):
+    """{"section", "row", "change", "from", "to", "seats"} per seat row and distinct change, in seat order.
+
+    change: "status" | "price" (from → to) or "only_a" | "only_b" (seats on one side only).
+    """
+    a, b = d["a"], d["b"]
+    groups = {}  # (sec_disp, pref, change, from, to) -> [numbers]
+    for change in CHANGES:
+        if change in ("status", "price"):
+            rows, b_rows = d[change]
+            before, after = _values(a, rows, change), _values(b, b_rows, change)
+            store = a
+        else:
+            store = b if change == "only_b" else a
+            rows = d[change]
+            before = after = [""] * len(rows)
+        secs, prefs = store.sec_id[rows].tolist(), store.pref_id[rows].tolist()
+        for s, p, num, old, new in zip(secs, prefs, store.num[rows].tolist(), before, after):
+            key = (store.sec_disp[s], store.prefs[p], change, old, new)
+            groups.setdefault(key, []).append(num)
+
+    for key in sorted(groups, key=lambda k: (k[0].lower(), row_order_key(k[1]), CHANGES.index(k[2]), k[3], k[4])):
+        sec_disp, pref, change, old, new = key
+        disp_pref = display_prefix(pref)
+        yield {
+            "section": sec_disp,
+            "row": disp_pref.rstrip(" -") or pref,
+            "change": change,
+            "from": old,
+            "to": new,
+            "seats": ", ".join(
+                f"{disp_pref}{s}" if s == e else f"{disp_pref}{s}-{e}" for s, e in compress_ranges(groups[key])
+            ),
+        }
@@ -0,0 +1,518 @@
+"""Headless seat map engine: load → index → apply → serialize.
+
+Everything the Streamlit editor does to a seat map lives here so it can be
+driven from the UI, the batch CLI or any other Python code. No Streamlit imports.
+"""
+import json, sys
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Mapping
+
+import numpy as np
+
+from .labels import (
+    BLOCK_WORDS, PRICE_RX, block_matcher,
+    pretty_key, split_labels, parse_price, format_price, norm_section_name, section_names_from_data,
+)
+from .ranges import (
+    WHOLE_ROW, ALL_ROWS,
+    parse_ranges, find_overlaps, iter_intervals, iter_keys, interval_count,
+    add_interval, merge_intervals, subtract_numbers, pretty_interval,
+    expand_sections, section_row_keys,
+)
+from .journal import Journal, ObjChange, MISSING
+from .store import SeatStore, ST_AV, ST_UAV
+from .analysis import PassStats, row_pass, status_views, iter_av_lines, mismatch_table
+from .rules import RuleError, compile_rules, evaluate_rules, apply_rules, rules_report, iter_attribution
+from .diff import diff_stores, diff_summary, iter_diff_rows
+from .blocks import PREFER, best_available
+from .export import FORMATS, BACKEND, iter_chunks, export, write_file
+from .stream import load_stream
+from .instrument import Recorder, stage, count_visits
+
+# The engine is the one import the editor, CLI and service need; names from the
+# submodules above are re-exported here alongside the engine's own.
+__all__ = [
+    # re-exported
+    "BLOCK_WORDS", "PRICE_RX", "block_matcher", "pretty_key", "parse_price", "format_price",
+    "norm_section_name", "section_names_from_data",
+    "WHOLE_ROW", "ALL_ROWS", "parse_ranges", "iter_keys", "interval_count",
+    "Journal", "SeatStore", "PassStats", "row_pass", "status_views", "iter_av_lines", "mismatch_table",
+    "RuleError", "compile_rules", "evaluate_rules", "apply_rules", "rules_report", "iter_attribution",
+    "diff_stores", "diff_summary", "iter_diff_rows", "PREFER", "best_available",
+    "FORMATS", "BACKEND", "export", "write_file", "load_stream", "Recorder",
+    # defined here
+    "load_map", "SeatIndex", "section_title", "build_seat_index", "duplicate_report", "parse_groups",
+    "build_store", "apply_tier_edits", "tier_adjustments", "resolve_groups", "apply_groups",
+    "enforce_blocked", "set_row_price_to_max_only", "find_price_mismatches", "price_sample",
+    "seat_names", "seat_table", "serialize", "tier_plan", "prepare_plan", "iter_missing",
+    "missing_count", "missing_report", "run_plan", "plan_summary",
+]
+
+# ──────────────── load + index ────────────────
+
+@stage("load")
+def load_map(raw, journal=None):
+    """Parse seat map JSON (bytes or str) and normalise section names."""
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    seat_data = json.loads(raw)
+    if not isinstance(seat_data, dict):
+        raise ValueError("Seat map JSON must be an object at the top level")
+
+    renamed = ObjChange("section_name")
+    for sec in seat_data.values():
+        if isinstance(sec, dict) and "section_name" in sec:
+            old = sec["section_name"]
+            sec["section_name"] = norm_section_name(old)
+            if sec["section_name"] != old:
+                renamed.add(sec, old, sec["section_name"])
+    if journal is not None:
+        journal.record_base(renamed)
+    return seat_data
+
+class SeatIndex(Mapping):
+    """(section_low, prefix, number) -> (seat_obj, display_section), read from the row index.
+
+    A view, not a per-seat dict: lookups bisect the row's sorted numbers, and
+    iteration is in row index (sorted) order.
+    """
+
+    def __init__(self, row_index):
+        self.row_index = row_index
+
+    def __getitem__(self, key):
+        try:
+            sec_low, pref, num = key
+            nums, seats, sections, _ = self.row_index[(sec_low, pref)]
+        except (KeyError, TypeError, ValueError):
+            raise KeyError(key) from None
+        i = bisect_left(nums, num)
+        if i == len(nums) or nums[i] != num:
+            raise KeyError(key)
+        return seats[i], sections[i]
+
+    def __iter__(self):
+        for (sec_low, pref), entry in self.row_index.items():
+            for num in entry[0]:
+                yield sec_low, pref, num
+
+    def __len__(self):
+        return sum(len(entry[0]) for entry in self.row_index.values())
+
+def section_title(sec):
+    """(display name, lowercase key) the index files a section's seats under."""
+    sec_disp = sys.intern(sec.get("section_name", "Unknown Section").strip())
+    return sec_disp, sys.intern(sec_disp.lower())
+
+@stage("index")
+def build_seat_index(seat_data, stats=None, matcher=None, journal=None, workers=1, duplicates=None, blocked=None):
+    """(section_low, prefix, number) -> (seat_obj, display_section). Forces blocked items to UAV.
+
+    Also returns the row index built in the same pass:
+    (section_low, prefix) -> (sorted seat numbers, [seat_obj], [display_section], [blocked]),
+    parallel lists with keys in sorted order, for bisect range queries. The
+    first value is a SeatIndex view over it. ``matcher`` is the venue's
+    BlockMatcher; each seat's blocked flag is computed here, once.
+    Statuses forced to UAV are recorded in ``journal.base`` if given.
+    ``workers``: processes for the per-seat work of a big map (0: all cores;
+    see shard.py). When one key is used by several seats the last one wins;
+    ``duplicates`` (a list) collects the repeated (section_low, prefix, number) keys
+    and ``blocked`` (a list) every blocked seat, indexed or not, in map order.
+    """
+    is_blocked = matcher or block_matcher()
+    built = None
+    if workers != 1:
+        from .shard import sharded_index  # shard.py builds on this module
+
+        built = sharded_index(seat_data, is_blocked, workers, duplicates, blocked)
+    if built is None:
+        built = _index_serial(seat_data, is_blocked, duplicates, blocked)
+    row_index, per_section_counts, forced, visits = built
+
+    if journal is not None:
+        journal.record_base(forced)
+    count_visits(visits)
+    if stats is not None:
+        stats.add("index", visits)
+    return SeatIndex(row_index), per_section_counts, row_index
+
+def _index_serial(seat_data, is_blocked, duplicates=None, blocked_seats=None):
+    """build_seat_index() on one core: (row_index, per_section_counts, forced UAV changes, seats visited)."""
+    per_section_counts = defaultdict(int)
+    found = defaultdict(dict)  # (sec_low, pref) -> {num: (seat, sec_disp, blocked)}, last one wins
+    forced = ObjChange("status")
+    visits = 0
+
+    for sec in seat_data.values():
+        if not isinstance(sec, dict):
+            continue
+        if sec.get("type", "def") == "aoi":
+            continue
+
+        sec_disp, sec_low = section_title(sec)
+        rows = sec.get("rows", {}) or {}
+        seats = [seat for row in rows.values() for seat in (row.get("seats") or {}).values()]
+        visits += len(seats)
+
+        # the whole section's labels in one batch (split_labels() splits each distinct one once)
+        for seat, split in zip(seats, split_labels([seat.get("number", "") for seat in seats])):
+            # Force blocked/non-seat items to unavailable up front
+            blocked = is_blocked(seat)
+            if blocked:
+                if blocked_seats is not None:
+                    blocked_seats.append(seat)
+                if seat.get("status", MISSING) != "uav":
+                    forced.add(seat, seat.get("status", MISSING), "uav")
+                seat["status"] = "uav"
+
+            if not split:
+                continue
+
+            pref, num = split
+            by_num = found[(sec_low, pref)]
+            if duplicates is not None and num in by_num:
+                duplicates.append((sec_low, pref, num))
+            by_num[num] = (seat, sec_disp, blocked)
+            per_section_counts[sec_low] += 1
+
+    row_index = {}
+    for key in sorted(found):
+        by_num = found.pop(key)
+        nums = sorted(by_num)
+        entries = [by_num[n] for n in nums]
+        row_index[key] = (nums, [e[0] for e in entries], [e[1] for e in entries], [e[2] for e in entries])
+    return row_index, per_section_counts, forced, visits
+
+def duplicate_report(duplicates, section_names):
+    """'Stalls A-12', … for the keys build_seat_index() found on more than one seat (sorted, once each)."""
+    sec_title = {s.lower(): s for s in section_names}
+    return [pretty_key(key, sec_title) for key in sorted(set(duplicates))]
+
+# ──────────────── range parsing ────────────────
+
+@stage("parse_groups")
+def parse_groups(groups, section_names, row_index=None):
+    """[{"range", "price"}] -> [{"ranges", "price"}] plus the overlapping seats (as ranges).
+
+    A numeric price is taken as its text (7 → "7"). Raises ValueError if a
+    range isn't text or a price isn't text or a number.
+    """
+    parsed_groups = []
+    for g in groups:
+        rng, price = g.get("range"), g.get("price")
+        if rng is not None and not isinstance(rng, str):
+            raise ValueError(f"group range {rng!r} is not text")
+        if price is not None and (isinstance(price, bool) or not isinstance(price, (str, int, float))):
+            raise ValueError(f"group price {price!r} is not a price")
+        rng = (rng or "").strip()
+        ranges = parse_ranges(rng, section_names) if rng else {}
+        parsed_groups.append({"ranges": ranges, "price": "" if price is None else str(price).strip()})
+
+    overlaps = find_overlaps([g["ranges"] for g in parsed_groups], row_index)
+    return parsed_groups, overlaps
+
+# ──────────────── apply ────────────────
+
+@stage("store")
+def build_store(row_index, stats=None, journal=None):
+    """Columnar view of the indexed seats that all apply phases share."""
+    store = SeatStore(row_index, journal)
+    count_visits(len(store))
+    if stats is not None:
+        stats.add("store", len(store))
+    return store
+
+@stage("apply_tiers")
+def apply_tier_edits(store, tier_new_values):
+    """Reprice AV seats whose (sec_disp, current price) has a new value. Returns seats changed.
+
+    Tier members come from the store's tier index, so only their seats are visited.
+    """
+    tiers = store.tier_index()
+    hits = []
+    # resolve every tier against the current prices first, then write
+    for (sec_disp, cur_price), new_p in tier_new_values.items():
+        if not new_p:
+            continue
+        rows = tiers.rows(store, sec_disp, cur_price)
+        if len(rows):
+            hits.append((rows, str(new_p)))
+
+    changed = 0
+    for rows, new_p in hits:
+        store.set_price(rows, new_p)
+        changed += len(rows)
+    count_visits(changed)
+    return changed
+
+def tier_adjustments(store, percent=None, delta=None, tiers=None, sections=None):
+    """New prices for AV tiers changed by ``percent`` (10 → +10%) or by a fixed ``delta``.
+
+    Returns {(sec_disp, price): new price} for apply_tier_edits(). ``tiers``
+    limits it to those (sec_disp, price) tiers and ``sections`` to those
+    display sections. Tiers without a numeric price are skipped; results are
+    rounded to pennies and never go below 0.
+    """
+    new_values = {}
+    for sec_disp, price in store.tier_index().views(store):
+        if (tiers is not None and (sec_disp, price) not in tiers) or (
+            sections is not None and sec_disp not in sections
+        ):
+            continue
+        p = parse_price(price)
+        if p is None:
+            continue
+        p = p * (1 + float(percent) / 100) if percent is not None else p + float(delta or 0)
+        new_values[(sec_disp, price)] = format_price(max(0.0, round(p, 2)))
+    return new_values
+
+def resolve_groups(store, parsed_groups):
+    """Store rows of each group (earlier groups win) and the seats/rows not found.
+
+    Depends only on the layout, so the result holds for every store with the
+    same row index (e.g. all performances of one venue, see layout.py).
+    """
+    missing = {}
+    missing_rows = []  # wildcard rows / sections that don't exist
+    group_of = np.full(len(store), -1, dtype=np.int32)  # store row -> group_index
+    group_rows = []
+
+    for idx, g in enumerate(parsed_groups):
+        parts = []
+        ranges = g["ranges"]
+        for sec_low, pref in ranges:
+            if pref == ALL_ROWS and not section_row_keys(store.row_keys, sec_low):
+                missing_rows.append((sec_low, pref))
+        for sec_low, pref, lo, hi in iter_intervals(expand_sections(ranges, store.row_index)):
+            rows, nums = store.rows_in(sec_low, pref, lo, hi)
+            if (lo, hi) == WHOLE_ROW:
+                if (sec_low, pref) not in store.row_index:
+                    missing_rows.append((sec_low, pref))
+            elif len(nums) < hi - lo + 1:
+                for a, b in subtract_numbers(lo, hi, nums):
+                    add_interval(missing, sec_low, pref, a, b)
+            parts.append(rows)
+        rows = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        rows = rows[group_of[rows] < 0]
+        group_of[rows] = idx
+        group_rows.append(rows)
+
+    return group_rows, {k: merge_intervals(v) for k, v in missing.items()}, sorted(set(missing_rows))
+
+@stage("apply_groups")
+def apply_groups(store, parsed_groups, price_only=False, resolved=None):
+    """Assign seats to groups (earlier groups win), set prices and availability.
+
+    Unless price_only, targeted seats become AV and every other indexed seat UAV.
+    ``resolved``: resolve_groups() output to reuse instead of resolving again.
+    matched_rows / updated_rows (targeted seats / seats that became AV) are
+    store rows in seat order; seat_names() and seat_table() render them.
+    """
+    group_rows, missing, missing_rows = resolved or resolve_groups(store, parsed_groups)
+    count_visits(len(store))
+    order = np.concatenate(group_rows) if group_rows else np.zeros(0, dtype=np.int64)
+    targeted = store.mask(order)
+    matched = updated = np.zeros(0, dtype=np.int64)
+
+    # Availability changes
+    if not price_only:
+        store.set_status(targeted & store.blocked, ST_UAV, "uav")
+        matched = np.flatnonzero(targeted & ~store.blocked)
+        updated = store.set_status(store.mask(matched), ST_AV, "av")
+
+    # Apply prices
+    for g, rows in zip(parsed_groups, group_rows):
+        price = (g["price"] or "").strip()
+        if price and len(rows):
+            store.set_price(rows, price)
+
+    # Auto set all non-target seats to UAV
+    turned_off = 0
+    if not price_only:
+        turned_off = len(store.set_status(~targeted, ST_UAV, "uav"))
+
+    return {
+        "assigned": int(targeted.sum()),
+        "matched_rows": matched,
+        "updated_rows": updated,
+        "missing": missing,
+        "missing_rows": missing_rows,
+        "turned_off": turned_off,
+    }
+
+@stage("enforce_blocked")
+def enforce_blocked(store):
+    """Final enforcement for blocked labels. Returns how many were switched back to UAV."""
+    count_visits(len(store))
+    return len(store.set_status(store.blocked, ST_UAV, "uav"))
+
+def set_row_price_to_max_only(seat_data):
+    """Set row['price'] to the highest numeric seat price found in that row. Never modifies seat prices."""
+    return row_pass(seat_data, mismatches=False)[0]
+
+# ──────────────── reporting + export ────────────────
+
+def find_price_mismatches(seat_data):
+    """Seats priced below their row price (expected, just for visibility)."""
+    return list(mismatch_table(row_pass(seat_data, row_max=False)[1]))
+
+def price_sample(store, limit=300, start=0):
+    sample = []
+    # store rows are already in sorted key order
+    for i in range(start, min(start + limit, len(store))):
+        seat = store.refs[i]
+        sample.append({
+            "Section": store.display_section(i),
+            "Seat": seat.get("number", ""),
+            "Price": seat.get("price", "")
+        })
+    return sample
+
+def seat_names(store, rows):
+    """'Stalls A12', … for store rows, produced as they are consumed."""
+    for i in rows.tolist():
+        yield f"{store.display_section(i)} {store.refs[i].get('number', '').strip()}"
+
+def seat_table(store, rows):
+    """Table rows (dicts) of Section / Seat / Status / Price for store rows."""
+    for i in rows.tolist():
+        seat = store.refs[i]
+        yield {
+            "Section": store.display_section(i),
+            "Seat": seat.get("number", ""),
+            "Status": seat.get("status", ""),
+            "Price": seat.get("price", "")
+        }
+
+@stage("serialize")
+def serialize(seat_data, indent=2) -> str:
+    return b"".join(iter_chunks(seat_data, indent)).decode("utf-8")
+
+# ──────────────── full pipeline ────────────────
+
+def _plan_number(value, field):
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'"{field}" must be a number, not {value!r}') from None
+    if not np.isfinite(number):
+        raise ValueError(f'"{field}" must be a finite number, not {value!r}')
+    return number
+
+def tier_plan(plan):
+    """A plan's tier edits, checked: (tier_adjustments() keyword arguments or None, {(sec_disp, price): new price}).
+
+    Raises ValueError on a malformed "tier_change" or "tiers" entry.
+    """
+    change = plan.get("tier_change") or None
+    if change is not None:
+        if not isinstance(change, dict):
+            raise ValueError('"tier_change" must be an object: {"percent" | "delta", "sections"}')
+        sections = change.get("sections")
+        if sections is not None and (
+            not isinstance(sections, list) or not all(isinstance(name, str) for name in sections)
+        ):
+            raise ValueError('"tier_change.sections" must be a list of section names')
+        change = {
+            "percent": None if change.get("percent") is None else _plan_number(change["percent"], "tier_change.percent"),
+            "delta": None if change.get("delta") is None else _plan_number(change["delta"], "tier_change.delta"),
+            "sections": sections,
+        }
+    tiers = {}
+    for t in plan.get("tiers") or ():
+        if not isinstance(t, dict) or not isinstance(t.get("section"), str) or "new_price" not in t:
+            raise ValueError('each of "tiers" needs "section" and "new_price" (and the current "price")')
+        new_price = str(t["new_price"]).strip()
+        if new_price and parse_price(new_price) is None:
+            raise ValueError(f"tier {t['section']} {t.get('price', '')}: new_price {t['new_price']!r} is not a price")
+        tiers[(t["section"], str(t.get("price", "")).strip() or "∅")] = new_price
+    return change, tiers
+
+def prepare_plan(plan, section_names, store):
+    """The layout-only half of a plan: parsed groups, overlap count, resolved store rows, compiled rules
+    and checked tier edits. Raises ValueError (RuleError for rules) on a malformed plan."""
+    parsed_groups, overlaps = parse_groups(plan.get("groups") or [], section_names, store.row_index)
+    tier_change, tiers = tier_plan(plan)
+    return {
+        "groups": parsed_groups,
+        "overlaps": interval_count(overlaps, store.row_index),
+        "resolved": resolve_groups(store, parsed_groups),
+        "rules": compile_rules(plan.get("rules"), section_names),
+        "tier_change": tier_change,
+        "tiers": tiers,
+    }
+
+def iter_missing(missing, missing_rows, section_names):
+    """'Stalls A-5–9', 'Stalls Z (whole row)', … for apply_groups' missing seats and rows, one at a time."""
+    sec_title = {s.lower(): s for s in section_names}
+    for iv in iter_intervals(missing):
+        yield pretty_interval(sec_title, *iv)
+    for sec_low, pref in missing_rows:
+        yield pretty_interval(sec_title, sec_low, pref, *WHOLE_ROW)
+
+def missing_count(missing, missing_rows) -> int:
+    """How many entries iter_missing() yields."""
+    return sum(len(ivs) for ivs in missing.values()) + len(missing_rows)
+
+def missing_report(missing, missing_rows, section_names):
+    return list(iter_missing(missing, missing_rows, section_names))
+
+def run_plan(seat_data, plan, store=None, stats=None, journal=None, prepared=None):
+    """Apply a plan to an already loaded map, exactly as a Go click in the editor.
+
+    plan: {"groups": [{"range", "price"}], "price_only": bool,
+           "tiers": [{"section", "price", "new_price"}],
+           "tier_change": {"percent" | "delta", "sections": [...]},   (every AV tier, or those sections)
+           "rules": ["Stalls rows A-F = 75", ...],   (pricing rules, or one string; see rules.py)
+           "block_words": [...]}   (optional venue block-word list)
+
+    Recorded as one journal operation on the store; result["changes"] is its size
+    and result["store"] the store it ran on.
+    ``journal`` (used when the store is built here) may already hold load_map's changes.
+    ``prepared``: prepare_plan() output shared by maps with the same layout.
+    """
+    if store is None:
+        matcher = block_matcher(plan.get("block_words"))
+        store = build_store(build_seat_index(seat_data, stats, matcher, journal)[2], stats, journal)
+    price_only = bool(plan.get("price_only"))
+    result = {"seats": len(store), "tier_changed": 0, "rule_changed": 0}
+    if prepared is None:  # before begin(): a plan that doesn't parse changes nothing
+        prepared = prepare_plan(plan, section_names_from_data(seat_data), store)
+    store.journal.begin(plan.get("label") or "plan")
+
+    if price_only and (prepared["tiers"] or prepared["tier_change"]):
+        change = prepared["tier_change"]
+        tier_new_values = tier_adjustments(store, **change) if change else {}
+        tier_new_values.update(prepared["tiers"])  # explicit tier prices win over the bulk change
+        result["tier_changed"] = apply_tier_edits(store, tier_new_values)
+
+    result["overlaps"] = prepared["overlaps"]
+    result.update(apply_groups(store, prepared["groups"], price_only, prepared["resolved"]))
+    result["blocked_kept_uav"] = enforce_blocked(store)
+    if prepared.get("rules"):
+        result["rule_changed"] = sum(apply_rules(store, prepared["rules"], seat_data))
+    result["rows_updated"], result["mismatches"] = row_pass(seat_data, stats=stats, journal=store.journal)
+    op = store.journal.commit()
+    result["changes"] = op.size if op else 0
+    result["store"] = store
+    return result
+
+def plan_summary(result, section_names):
+    """The JSON-safe counts of a run_plan() result (printed by the CLI, returned by the service)."""
+    return {
+        "seats": result["seats"],
+        "assigned": result["assigned"],
+        "made_av": len(result["updated_rows"]),
+        "turned_off": result["turned_off"],
+        "missing": interval_count(result["missing"]) + len(result["missing_rows"]),
+        "missing_seats": missing_report(result["missing"], result["missing_rows"], section_names),
+        "tier_changed": result["tier_changed"],
+        "rule_changed": result["rule_changed"],
+        "blocked_kept_uav": result["blocked_kept_uav"],
+        "rows_updated": result["rows_updated"],
+        "mismatches": len(result["mismatches"]),
+        "changes": result["changes"],
+    }
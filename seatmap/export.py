@@ -0,0 +1,171 @@
+"""Seat map output: full JSON (pretty / compact / gzip, streamed in chunks) or an RFC 6902 patch.
+
+orjson is used when installed and falls back to the standard library for
+anything it refuses (e.g. integers beyond 64 bits). Full maps are encoded one
+top-level section at a time, so writing a file never holds the whole text;
+streamed skeletons (stream.py) are merged back into their source the same way.
+"""
+import gzip, io, json, os
+
+from .instrument import stage
+from .journal import MISSING
+from .stream import iter_merged
+
+try:
+    import orjson
+except ImportError:  # optional fast backend
+    orjson = None
+
+FORMATS = {
+    # name: (file suffix, mime type)
+    "pretty": (".json", "application/json"),
+    "compact": (".json", "application/json"),
+    "gzip": (".json.gz", "application/gzip"),
+    "patch": (".patch.json", "application/json-patch+json"),
+}
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+def dumps(obj, indent=2) -> bytes:
+    """JSON bytes; indent=2 (pretty) or None (compact, no spaces)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+        except (TypeError, orjson.JSONEncodeError):
+            pass
+    if indent:
+        return json.dumps(obj, indent=indent, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def iter_object(items, indent=2):
+    """Encode (key, value) pairs as one JSON object, one member per chunk."""
+    if indent:
+        first, sep, colon, close = b"{\n  ", b",\n  ", b": ", b"\n}"
+    else:
+        first, sep, colon, close = b"{", b",", b":", b"}"
+    n = 0
+    for key, value in items:
+        body = dumps(value, indent)
+        if indent:
+            body = body.replace(b"\n", b"\n  ")
+        yield (sep if n else first) + dumps(str(key), indent) + colon + body
+        n += 1
+    yield close if n else b"{}"
+
+def iter_chunks(seat_data, indent=2, source=None):
+    """The same bytes as dumps(seat_data), one top-level section per chunk.
+
+    With ``source`` (the file a streamed skeleton was loaded from) the full
+    sections are re-read from it and the skeleton's values laid over them.
+    """
+    items = seat_data.items() if source is None else iter_merged(source, seat_data)
+    return iter_object(items, indent)
+
+def write(seat_data, fp, indent=2, source=None):
+    """Stream the map to a binary file object. Returns bytes written."""
+    total = 0
+    for chunk in iter_chunks(seat_data, indent, source):
+        fp.write(chunk)
+        total += len(chunk)
+    return total
+
+def gzip_bytes(seat_data, indent=None, level=6, source=None) -> bytes:
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=level, mtime=0) as gz:
+        write(seat_data, gz, indent, source)
+    return buf.getvalue()
+
+# ──────────────── JSON Patch ────────────────
+
+def pointer(*parts) -> str:
+    """RFC 6901 JSON Pointer from path components."""
+    return "".join("/" + str(p).replace("~", "~0").replace("/", "~1") for p in parts)
+
+def object_paths(seat_data, objs):
+    """JSON Pointer of each wanted section / row / seat dict (by id), in map order."""
+    want = {id(o) for o in objs}
+    paths = {}
+    for sec_key, sec in seat_data.items():
+        if not isinstance(sec, dict):
+            continue
+        if id(sec) in want:
+            paths[id(sec)] = pointer(sec_key)
+        rows = sec.get("rows")
+        if not isinstance(rows, dict):
+            continue
+        for row_key, row in rows.items():
+            if not isinstance(row, dict):
+                continue
+            if id(row) in want:
+                paths[id(row)] = pointer(sec_key, "rows", row_key)
+            seats = row.get("seats")
+            if not isinstance(seats, dict):
+                continue
+            for seat_key, seat in seats.items():
+                if id(seat) in want:
+                    paths[id(seat)] = pointer(sec_key, "rows", row_key, "seats", seat_key)
+    return paths
+
+def json_patch(seat_data, changes):
+    """RFC 6902 operations turning the uploaded map into the current one.
+
+    changes: Journal.net_changes() — [(obj, field, original, current)].
+    """
+    paths = object_paths(seat_data, [c[0] for c in changes])
+    rank = {k: n for n, k in enumerate(paths)}
+    ops = []
+    for obj, field, old, new in sorted(
+        (c for c in changes if id(c[0]) in paths), key=lambda c: rank[id(c[0])]
+    ):
+        path = paths[id(obj)] + pointer(field)
+        if new is MISSING:
+            ops.append({"op": "remove", "path": path})
+        elif old is MISSING:
+            ops.append({"op": "add", "path": path, "value": new})
+        else:
+            ops.append({"op": "replace", "path": path, "value": new})
+    return ops
+
+# ──────────────── one call per format ────────────────
+
+@stage("serialize")
+def export(seat_data, fmt="pretty", store=None, source=None) -> bytes:
+    """Encode the map in one of FORMATS ("patch" needs the store whose journal saw the edits).
+
+    ``source``: the original file when seat_data is a streamed skeleton (see stream.py).
+    """
+    if fmt == "pretty":
+        return b"".join(iter_chunks(seat_data, 2, source))
+    if fmt == "compact":
+        return b"".join(iter_chunks(seat_data, None, source))
+    if fmt == "gzip":
+        return gzip_bytes(seat_data, source=source)
+    if fmt == "patch":
+        if store is None:
+            raise ValueError("patch output needs the store that recorded the edits")
+        return dumps(json_patch(seat_data, store.journal.net_changes(store)), None)
+    raise ValueError(f"unknown output format {fmt!r} (expected one of {', '.join(FORMATS)})")
+
+@stage("write")
+def write_file(path, seat_data, fmt="pretty", store=None, source=None):
+    """Write one output file; full maps are streamed. Returns bytes written (uncompressed).
+
+    Written to a temporary file first, so ``path`` may be the ``source`` itself.
+    """
+    tmp = f"{path}.tmp"
+    try:
+        if fmt in ("pretty", "compact"):
+            with open(tmp, "wb") as f:
+                written = write(seat_data, f, 2 if fmt == "pretty" else None, source)
+        elif fmt == "gzip":
+            with gzip.open(tmp, "wb") as f:
+                written = write(seat_data, f, None, source)
+        else:
+            data = export(seat_data, fmt, store, source)
+            with open(tmp, "wb") as f:
+                written = f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return written
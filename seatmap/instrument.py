@@ -0,0 +1,137 @@
+"""Per-stage instrumentation: wall time, seat visits and allocation deltas.
+
+Pipeline functions are wrapped with @stage("name"). While no Recorder is
+active the wrapper costs one ContextVar lookup; with one active, each call
+becomes a record:
+
+    {"stage", "depth", "start", "seconds", "visits", "alloc_bytes", "peak_bytes"}
+
+Allocation figures need tracemalloc (Recorder(memory=True)) and are None
+otherwise. The recorder lives in a ContextVar, so concurrent Streamlit
+sessions (one script thread each) never see each other's stages.
+"""
+import contextvars, functools, json, time, tracemalloc
+from contextlib import contextmanager
+
+_active = contextvars.ContextVar("seatmap_recorder", default=None)
+
+class Recorder:
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.records = []
+        self._stack = []
+        self._t0 = time.perf_counter()
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str):
+        rec = {"stage": name, "depth": len(self._stack), "start": 0.0, "seconds": 0.0,
+               "visits": 0, "alloc_bytes": None, "peak_bytes": None}
+        self.records.append(rec)
+        frame = {"rec": rec, "peak": 0}
+        if self.memory and tracemalloc.is_tracing():
+            # fold the running peak into the parent before resetting it for this stage
+            cur, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent["peak"] = max(parent["peak"], peak - parent["base"])
+            tracemalloc.reset_peak()
+            frame["base"] = cur
+        self._stack.append(frame)
+        t = time.perf_counter()
+        rec["start"] = round(t - self._t0, 6)
+        try:
+            yield rec
+        finally:
+            rec["seconds"] = round(time.perf_counter() - t, 6)
+            self._stack.pop()
+            if "base" in frame:
+                cur, peak = tracemalloc.get_traced_memory()
+                rec["alloc_bytes"] = cur - frame["base"]
+                rec["peak_bytes"] = max(frame["peak"], peak - frame["base"])
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent["peak"] = max(parent["peak"], rec["peak_bytes"] + frame["base"] - parent["base"])
+                tracemalloc.reset_peak()
+
+    def add_visits(self, n: int):
+        if self._stack:
+            self._stack[-1]["rec"]["visits"] += int(n)
+
+    def summary(self):
+        """One row per stage name: calls and totals, in first-seen order."""
+        rows = {}
+        for r in self.records:
+            s = rows.setdefault(r["stage"], {
+                "Stage": r["stage"], "Calls": 0, "Seconds": 0.0, "Seat visits": 0,
+                "Alloc (MB)": None, "Peak (MB)": None,
+            })
+            s["Calls"] += 1
+            s["Seconds"] = round(s["Seconds"] + r["seconds"], 6)
+            s["Seat visits"] += r["visits"]
+            if r["alloc_bytes"] is not None:
+                s["Alloc (MB)"] = round((s["Alloc (MB)"] or 0) + r["alloc_bytes"] / 1e6, 3)
+                s["Peak (MB)"] = round(max(s["Peak (MB)"] or 0, r["peak_bytes"] / 1e6), 3)
+        return list(rows.values())
+
+    def to_jsonl(self, **extra) -> str:
+        """One JSON object per record; ``extra`` fields (e.g. file=…) are added to each."""
+        return "".join(json.dumps({**extra, **r}) + "\n" for r in self.records)
+
+def start(recorder):
+    """Make ``recorder`` active for this context (None: leave instrumentation off). Returns a token for stop()."""
+    if recorder is None:
+        return None
+    if recorder.memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        recorder._started_tracing = True
+    return recorder, _active.set(recorder)
+
+def stop(token):
+    if token is None:
+        return
+    recorder, tok = token
+    _active.reset(tok)
+    if recorder._started_tracing:
+        tracemalloc.stop()
+        recorder._started_tracing = False
+
+@contextmanager
+def recording(recorder):
+    token = start(recorder)
+    try:
+        yield recorder
+    finally:
+        stop(token)
+
+def active():
+    return _active.get()
+
+@contextmanager
+def span(name: str):
+    """Record an inline block as a stage (no-op without an active recorder)."""
+    rec = _active.get()
+    if rec is None:
+        yield None
+    else:
+        with rec.stage(name) as r:
+            yield r
+
+def count_visits(n: int):
+    """Credit ``n`` seat visits to the innermost running stage."""
+    rec = _active.get()
+    if rec is not None:
+        rec.add_visits(n)
+
+def stage(name: str):
+    """Decorator: record each call as stage ``name`` while a Recorder is active."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rec = _active.get()
+            if rec is None:
+                return fn(*args, **kwargs)
+            with rec.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
@@ -0,0 +1,199 @@
+"""Change journal: what each operation changed, so it can be undone and redone.
+
+An operation (one Go click, one CLI plan) is a list of changes. A change is one
+field set to one new value on many seats, kept compactly as the store rows plus
+their old array codes and old raw JSON values. Undo/redo replays the journal in
+place; nothing is re-parsed or re-indexed.
+"""
+import itertools
+
+import numpy as np
+
+class _Missing:
+    """Marker for a key that was absent from the JSON object."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __reduce__(self):
+        return "MISSING"  # copy/pickle keep the singleton
+
+MISSING = _Missing()
+
+def _write(obj, field, raw):
+    if raw is MISSING:
+        obj.pop(field, None)
+    else:
+        obj[field] = raw
+
+class FieldChange:
+    """store.<field> set to ``new_id`` (JSON value ``new_raw``) on ``rows``."""
+    __slots__ = ("field", "rows", "old_ids", "old_exact", "old_raw", "new_id", "new_raw")
+
+    def __init__(self, field, rows, old_ids, old_exact, old_raw, new_id, new_raw):
+        self.field = field          # "status" | "price"
+        self.rows = rows            # store rows (int64 array)
+        self.old_ids = old_ids      # previous status codes / price ids
+        self.old_exact = old_exact  # previous price_exact flags (price only)
+        self.old_raw = old_raw      # previous JSON values (MISSING if absent)
+        self.new_id = new_id
+        self.new_raw = new_raw
+
+    def __len__(self):
+        return len(self.rows)
+
+    def entries(self, store):
+        """(obj, old raw value) pairs."""
+        refs = store.refs
+        return zip([refs[i] for i in self.rows.tolist()], self.old_raw)
+
+    def _arrays(self, store):
+        return store.status if self.field == "status" else store.price_id
+
+    def revert(self, store):
+        self._arrays(store)[self.rows] = self.old_ids
+        if self.old_exact is not None:
+            store.price_exact[self.rows] = self.old_exact
+        refs = store.refs
+        for i, raw in zip(self.rows.tolist(), self.old_raw):
+            _write(refs[i], self.field, raw)
+        store.touched(self.rows)
+
+    def reapply(self, store):
+        self._arrays(store)[self.rows] = self.new_id
+        if self.old_exact is not None:
+            store.price_exact[self.rows] = self.new_raw == self.new_raw.strip()
+        refs = store.refs
+        for i in self.rows.tolist():
+            refs[i][self.field] = self.new_raw
+        store.touched(self.rows)
+
+class ObjChange:
+    """A field on JSON objects outside the store (e.g. row prices)."""
+    __slots__ = ("field", "objs", "old_raw", "new_raw")
+
+    def __init__(self, field):
+        self.field = field
+        self.objs = []
+        self.old_raw = []
+        self.new_raw = []
+
+    def __len__(self):
+        return len(self.objs)
+
+    def entries(self, store):
+        return zip(self.objs, self.old_raw)
+
+    def add(self, obj, old, new):
+        self.objs.append(obj)
+        self.old_raw.append(old)
+        self.new_raw.append(new)
+
+    def revert(self, store):
+        for obj, raw in zip(self.objs, self.old_raw):
+            _write(obj, self.field, raw)
+
+    def reapply(self, store):
+        for obj, raw in zip(self.objs, self.new_raw):
+            _write(obj, self.field, raw)
+
+class Operation:
+    def __init__(self, label: str):
+        self.label = label
+        self.changes = []
+
+    @property
+    def size(self) -> int:
+        """Number of (seat or row, field) entries."""
+        return sum(len(c) for c in self.changes)
+
+    def summary(self):
+        out = {}
+        for c in self.changes:
+            name = c.field if isinstance(c, FieldChange) else f"row {c.field}"
+            out[name] = out.get(name, 0) + len(c)
+        return out
+
+class Journal:
+    """Undo/redo stacks of operations. Changes are only recorded between begin() and commit().
+
+    ``base`` holds what loading itself changed (normalised section names,
+    blocked seats forced to UAV); it is never undone but counts as a change
+    against the uploaded file.
+    """
+
+    def __init__(self):
+        self.base = []
+        self.undo_stack = []
+        self.redo_stack = []
+        self._op = None
+
+    def record_base(self, change):
+        if len(change):
+            self.base.append(change)
+
+    @property
+    def recording(self) -> bool:
+        return self._op is not None
+
+    def begin(self, label: str):
+        self._op = Operation(label)
+
+    def record(self, change):
+        if self._op is not None and len(change):
+            self._op.changes.append(change)
+
+    def commit(self):
+        """Close the current operation; returns it (None if nothing changed)."""
+        op, self._op = self._op, None
+        if op is None or not op.changes:
+            return None
+        self.undo_stack.append(op)
+        self.redo_stack.clear()
+        return op
+
+    def undo(self, store):
+        if not self.undo_stack:
+            return None
+        op = self.undo_stack.pop()
+        for c in reversed(op.changes):
+            c.revert(store)
+        self.redo_stack.append(op)
+        return op
+
+    def redo(self, store):
+        if not self.redo_stack:
+            return None
+        op = self.redo_stack.pop()
+        for c in op.changes:
+            c.reapply(store)
+        self.undo_stack.append(op)
+        return op
+
+    def net_changes(self, store):
+        """[(obj, field, original, current)] for every field changed since load, in first-touch order.
+
+        Fields changed and changed back (or undone) are left out.
+        """
+        first = {}
+        for c in itertools.chain(self.base, *(op.changes for op in self.undo_stack)):
+            for obj, old in c.entries(store):
+                first.setdefault((id(obj), c.field), (obj, c.field, old))
+        out = []
+        for obj, field, old in first.values():
+            new = obj.get(field, MISSING)
+            if new != old or type(new) is not type(old):
+                out.append((obj, field, old, new))
+        return out
+
+def capture(store, field, rows, new_id, new_raw):
+    """FieldChange for ``rows`` before they are overwritten (old values read now)."""
+    rows = np.asarray(rows, dtype=np.int64)
+    refs = store.refs
+    if field == "status":
+        old_ids, old_exact = store.status[rows].copy(), None
+    else:
+        old_ids, old_exact = store.price_id[rows].copy(), store.price_exact[rows].copy()
+    old_raw = [refs[i].get(field, MISSING) for i in rows.tolist()]
+    return FieldChange(field, rows, old_ids, old_exact, old_raw, new_id, new_raw)
@@ -0,0 +1,158 @@
+"""Seat label helpers: normalisation, prefix splitting, blocked detection, display."""
+import re, itertools, sys
+from functools import lru_cache
+
+# ───────────────── helper functions ─────────────────
+
+BRACKET_RX = re.compile(r"(\([^)]*\))")
+
+BLOCK_WORDS = [
+    "pillar", "pillars",
+    "space", "spaces",
+    "blank", "blanks",
+    "aisle", "aisles",
+    "gap", "gaps",
+    "void",
+    "blocked",
+    "not for sale",
+    "no seat",
+    "not a seat",
+    "wheelchair space",
+    "companion space",
+]
+
+PRICE_RX = re.compile(r"^\d+(?:\.\d+)?$")
+
+def strip_brackets(s: str) -> str:
+    return BRACKET_RX.sub("", s or "").strip()
+
+class BlockMatcher:
+    """Block words compiled once into a single alternation regex.
+
+    Call it with a seat dict; a seat is blocked when any word occurs in its
+    number/label/notes text (brackets stripped, case-insensitive).
+    """
+
+    def __init__(self, words=None):
+        words = BLOCK_WORDS if words is None else words
+        self.words = tuple(dict.fromkeys(w.strip().lower() for w in words if w and w.strip()))
+        pattern = "|".join(re.escape(w) for w in sorted(self.words, key=len, reverse=True))
+        self._search = re.compile(pattern).search if pattern else None
+
+    def __call__(self, seat: dict) -> bool:
+        if self._search is None:
+            return False
+        raw = seat.get("number", "") or ""
+        label = seat.get("label", "") or ""
+        notes = seat.get("notes", "") or ""
+        text = f"{raw} {label} {notes}".strip()
+        if "(" in text:
+            text = strip_brackets(text)
+        return self._search(text.lower()) is not None
+
+@lru_cache(maxsize=16)
+def _block_matcher(words):
+    return BlockMatcher(words)
+
+def block_matcher(words=None) -> BlockMatcher:
+    """Shared matcher for a venue's block-word list (None = BLOCK_WORDS)."""
+    return _block_matcher(tuple(BLOCK_WORDS if words is None else words))
+
+def is_blocked_label(seat: dict, matcher=None) -> bool:
+    """Identify seats/items that should never be on sale."""
+    return (matcher or block_matcher())(seat)
+
+def compress_ranges(nums):
+    nums = sorted(set(nums))
+    out = []
+    for _, g in itertools.groupby(enumerate(nums), lambda x: x[1] - x[0]):
+        block = list(g)
+        s, e = block[0][1], block[-1][1]
+        out.append((s, e))
+    return out
+
+def row_order_key(pref: str):
+    m = re.fullmatch(r"row(\d+)", pref)
+    if m:
+        return (0, -int(m.group(1)))
+    return (1, pref.upper())
+
+def display_prefix(pref: str) -> str:
+    if pref.startswith("row"):
+        m = re.match(r"row(\d+)$", pref)
+        if m:
+            return f"ROW {m.group(1)} - "
+    return pref.upper()
+
+def pretty_key(key, sec_title) -> str:
+    """'Stalls A-12' / 'Rausing Circle ROW 1-6' for a (sec_low, pref, num) key."""
+    sec_low, pref, n = key
+    pp = "ROW " + pref[3:] if pref.startswith("row") else pref.upper()
+    return f"{sec_title.get(sec_low, '?')} {pp}-{n}"
+
+_DASH_RX = re.compile(r"\s*-\s*")
+_SPACE_RX = re.compile(r"\s+")
+_ROW0_RX = re.compile(r"row0?(\d+)")
+_ROW_LABEL_RX = re.compile(r"(row\d+)-?(\d+)$")
+_PREFIX_LABEL_RX = re.compile(r"([a-z][a-z\-]{0,19})(\d+)$")
+
+def norm_label(s: str) -> str:
+    s = strip_brackets(s or "")
+    s = s.replace("–", "-").replace("—", "-")
+    s = s.replace("\u00a0", " ").replace("\u202f", " ")
+    s = s.lower().replace("seat", "")
+    s = _DASH_RX.sub("-", s)
+    s = _SPACE_RX.sub("", s)
+    s = _ROW0_RX.sub(r"row\1", s)
+    return s
+
+def split_norm_label(norm: str):
+    norm = norm.replace("seat", "")
+    m = _ROW_LABEL_RX.match(norm)
+    if m:
+        return m.group(1), int(m.group(2))
+    m = _PREFIX_LABEL_RX.match(norm)
+    if m:
+        return m.group(1), int(m.group(2))
+    return None
+
+@lru_cache(maxsize=1 << 16)
+def split_label(raw):
+    """split_norm_label(norm_label(raw)), memoised, with the prefix interned.
+
+    Raw labels ("A12", "ROW 3 - 12") repeat across sections and performances,
+    so each distinct one is normalised once and every seat in a row shares
+    one prefix string.
+    """
+    split = split_norm_label(norm_label(raw))
+    return (sys.intern(split[0]), split[1]) if split else None
+
+def split_labels(raws):
+    """split_label() for a batch of raw labels (a section) → [(prefix, number) or None].
+
+    Each distinct label in the batch is looked up once; repeats (the same
+    numbers in every row of a block, a label used twice) reuse its result.
+    """
+    memo = dict.fromkeys(raws)
+    for raw in memo:
+        memo[raw] = split_label(raw)
+    return list(map(memo.__getitem__, raws))
+
+def parse_price(value):
+    """Seat/row price string → float, or None when it isn't a plain number."""
+    s = (str(value) if value is not None else "").strip()
+    return float(s) if PRICE_RX.match(s) else None
+
+def format_price(value: float) -> str:
+    """Price text for a computed price: at most two decimals, no trailing zeros ('55', '52.5')."""
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+def norm_section_name(name: str) -> str:
+    return re.sub(r"\s+", " ", name).strip()
+
+def section_names_from_data(seat_data):
+    names = []
+    for sec in seat_data.values():
+        if isinstance(sec, dict) and sec.get("section_name") and sec.get("type", "def") != "aoi":
+            names.append(norm_section_name(sec["section_name"]))
+    return names
@@ -0,0 +1,125 @@
+"""Venue layouts shared by many performance files.
+
+Performances of one venue differ only in seat status and price, so everything
+the index derives from labels (normalisation, prefix splitting, blocked
+detection, sort order) can be computed once. A Layout keeps, per indexed
+seat, where it sits in the JSON (section, row and seat keys) and what it was
+derived from (number, label, notes). bind() then builds a performance's row
+index with plain dict lookups and checks its sections and each seat against
+the layout.
+"""
+from .engine import block_matcher, build_seat_index, section_names_from_data
+from .instrument import stage, count_visits
+from .journal import MISSING, ObjChange
+
+class LayoutMismatch(ValueError):
+    """The file's seats are not the ones the layout was built from."""
+
+def iter_rows(seat_data):
+    """(section key, row key, seats dict) for every row the index walks (everything under non-aoi sections)."""
+    for sec_key, sec in seat_data.items():
+        if not isinstance(sec, dict) or sec.get("type", "def") == "aoi":
+            continue
+        for row_key, row in (sec.get("rows", {}) or {}).items():
+            yield sec_key, row_key, row.get("seats") or {}
+
+def count_seats(seat_data) -> int:
+    return sum(len(seats) for _, _, seats in iter_rows(seat_data))
+
+def iter_seats(seat_data):
+    """((section key, row key, seat key), seat) for every seat the index walks."""
+    for sec_key, row_key, seats in iter_rows(seat_data):
+        for seat_key, seat in seats.items():
+            yield (sec_key, row_key, seat_key), seat
+
+def seat_ident(seat):
+    return seat.get("number", ""), seat.get("label", ""), seat.get("notes", "")
+
+def section_types(seat_data):
+    """(section key, type) of every section, aoi ones included."""
+    return [(sec_key, sec.get("type", "def")) for sec_key, sec in seat_data.items() if isinstance(sec, dict)]
+
+class Layout:
+    """Row index of a venue with JSON positions instead of seat dicts."""
+
+    def __init__(self, seat_data, matcher=None, index=None):
+        """``index``: (per_section_counts, row_index, [blocked seat], [repeated key]) from build_seat_index()
+        on this map (with its ``blocked`` and ``duplicates`` collectors), if already built. Labels are
+        only matched by the index build.
+        """
+        if index is None:
+            blocked_seats, duplicates = [], []
+            index = (*build_seat_index(
+                seat_data, matcher=matcher or block_matcher(), duplicates=duplicates, blocked=blocked_seats
+            )[1:], blocked_seats, duplicates)
+        per_section_counts, row_index, blocked_seats, duplicates = index
+        where = {id(seat): pos for pos, seat in iter_seats(seat_data)}
+        blocked = [(where[id(seat)], seat_ident(seat)) for seat in blocked_seats]  # every blocked seat, indexed or not
+        # (sec_low, pref) -> (nums, [(position, ident)], [sec_disp], [blocked])
+        rows = {
+            key: (nums, [(where[id(seat)], seat_ident(seat)) for seat in seats], sections, flags)
+            for key, (nums, seats, sections, flags) in row_index.items()
+        }
+        self.rows = rows
+        self.blocked = blocked
+        self.seat_total = len(where)
+        self.section_names = section_names_from_data(seat_data)
+        self.section_types = section_types(seat_data)
+        self.per_section_counts = dict(per_section_counts)
+        self.duplicates = list(duplicates)  # (sec_low, pref, number) keys of more than one seat
+
+    def __len__(self):
+        return sum(len(entry[0]) for entry in self.rows.values())
+
+    @stage("bind")
+    def bind(self, seat_data, journal=None):
+        """This map's row index, built from the layout. Forces blocked seats to UAV like the indexer.
+
+        Raises LayoutMismatch if a section is renamed or changes type, a seat is
+        missing or differs in number/label/notes, or the map has seats the
+        layout doesn't know.
+        """
+        names = section_names_from_data(seat_data)
+        if names != self.section_names:
+            raise LayoutMismatch(_differs("sections", names, self.section_names))
+        types = section_types(seat_data)
+        if types != self.section_types:
+            raise LayoutMismatch(_differs("section types", types, self.section_types))
+        seats_of = {(s, r): seats for s, r, seats in iter_rows(seat_data)}
+        n = sum(map(len, seats_of.values()))
+        if n != self.seat_total:
+            raise LayoutMismatch(f"{n} seats, layout has {self.seat_total}")
+
+        def seat_at(pos, ident):
+            seat = seats_of.get(pos[:2], {}).get(pos[2])
+            if seat is None or seat_ident(seat) != ident:
+                raise LayoutMismatch(_mismatch(pos, seat, ident))
+            return seat
+
+        # look everything up (and check it) before changing anything
+        blocked_seats = [seat_at(pos, ident) for pos, ident in self.blocked]
+        row_index = {}
+        for key, (nums, places, sections, blocked) in self.rows.items():
+            row_index[key] = (nums, [seat_at(pos, ident) for pos, ident in places], sections, blocked)
+
+        forced = ObjChange("status")
+        for seat in blocked_seats:
+            if seat.get("status", MISSING) != "uav":
+                forced.add(seat, seat.get("status", MISSING), "uav")
+                seat["status"] = "uav"
+        if journal is not None:
+            journal.record_base(forced)
+        count_visits(n)
+        return row_index
+
+def _mismatch(pos, seat, ident) -> str:
+    where = "/".join(pos)
+    if seat is None:
+        return f"no seat at {where}"
+    return f"seat at {where} is {seat.get('number', '')!r}, layout has {ident[0]!r}"
+
+def _differs(what, ours, layout) -> str:
+    for a, b in zip(ours, layout):
+        if a != b:
+            return f"{what}: {a!r}, layout has {b!r}"
+    return f"{len(ours)} {what}, layout has {len(layout)}"
@@ -0,0 +1,256 @@
+"""Seat range specs as compact interval lists.
+
+A parsed spec maps (sec_low, pref) -> sorted, merged [(lo, hi), ...] so that
+"Stalls A1-100000" costs one interval instead of 100000 tuples. Overlaps,
+precedence and missing seats are all interval arithmetic.
+
+Wildcards: "Stalls A" / "Stalls A*" / "Stalls ROW 3 - *" select a whole row
+(stored as the WHOLE_ROW interval) and "Stalls *" a whole section (stored
+under the prefix "*"). They are resolved against the row index, never expanded.
+"""
+import re, sys
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+from .instrument import stage
+
+WHOLE_ROW = (0, sys.maxsize)
+ALL_ROWS = "*"
+
+RANGE_RX = re.compile(
+    r"(?:(row)\s*(\d+)\s*(?:-|–)?\s*(\d+)\s*(?:to|–|-)\s*(\d+))"
+    r"|(?:(row)\s*(\d+)\s*(?:-|–)?\s*(\d+))"
+    r"|([a-z][a-z\-]{0,19})\s*(\d+)\s*(?:\s*(?:to|–|-)\s*(\d+))?",
+    re.I
+)
+
+CHUNK_SPLIT_RX = re.compile(r"\s*,\s*")
+
+WILD_RX = re.compile(r"(?:(row)\s*(\d+)\s*(?:-|–)?\s*|([a-z][a-z\-]{0,19})\s*)\*", re.I)
+BARE_ROW_RX = re.compile(r"[a-z][a-z\-]{0,19}", re.I)
+
+class SectionTrie:
+    """Longest section name that prefixes a chunk and is followed by end/whitespace."""
+
+    def __init__(self, section_names):
+        self.root = {}
+        for s in section_names:
+            if not s:
+                continue
+            node = self.root
+            for ch in s.lower():
+                node = node.setdefault(ch, {})
+            node[None] = s  # terminal: canonical name
+
+    def match(self, chunk_low: str):
+        """(low_name, canon) or None."""
+        node, best = self.root, None
+        for i, ch in enumerate(chunk_low):
+            if None in node and ch.isspace():
+                best = (chunk_low[:i], node[None])
+            node = node.get(ch)
+            if node is None:
+                return best
+        if None in node:
+            best = (chunk_low, node[None])
+        return best
+
+@lru_cache(maxsize=32)
+def _trie(section_names: tuple):
+    return SectionTrie(section_names)
+
+def section_trie(section_names) -> SectionTrie:
+    return _trie(tuple(section_names))
+
+def merge_intervals(ivs):
+    """Sort and merge overlapping/adjacent (lo, hi) pairs."""
+    out = []
+    for lo, hi in sorted(ivs):
+        if out and lo <= out[-1][1] + 1:
+            if hi > out[-1][1]:
+                out[-1] = (out[-1][0], hi)
+        else:
+            out.append((lo, hi))
+    return out
+
+def add_interval(ranges, sec_low, pref, lo, hi):
+    ranges.setdefault((sec_low, pref), []).append((lo, hi))
+
+# Parse ranges (prices provided by fields, no inline @price)
+# Returns: {(sec_low, pref): [(lo, hi), ...]}  (sorted, merged)
+@stage("parse_ranges")
+def parse_ranges(user_text: str, section_names):
+    ranges = {}
+    if not user_text:
+        return ranges
+
+    trie = section_trie(section_names)
+    chunks = [c.strip() for c in CHUNK_SPLIT_RX.split(user_text) if c.strip()]
+
+    for chunk in chunks:
+        sec_match = trie.match(chunk.lower())
+        if not sec_match:
+            continue
+
+        sec_low, sec_canon = sec_match
+        rest = chunk[len(sec_canon):].strip()
+
+        # whole section / whole rows
+        if rest == "*":
+            add_interval(ranges, sec_low, ALL_ROWS, *WHOLE_ROW)
+            continue
+        for m in WILD_RX.finditer(rest):
+            pref = f"row{int(m.group(2))}" if m.group(1) else m.group(3).lower()
+            add_interval(ranges, sec_low, pref, *WHOLE_ROW)
+        rest = WILD_RX.sub(" ", rest).strip()
+        if BARE_ROW_RX.fullmatch(rest):
+            add_interval(ranges, sec_low, rest.lower(), *WHOLE_ROW)
+            continue
+
+        for m in RANGE_RX.finditer(rest):
+            if m.group(1):
+                rownum = int(m.group(2))
+                lo, hi = sorted((int(m.group(3)), int(m.group(4))))
+                add_interval(ranges, sec_low, f"row{rownum}", lo, hi)
+
+            elif m.group(5):
+                rownum = int(m.group(6))
+                n = int(m.group(7))
+                add_interval(ranges, sec_low, f"row{rownum}", n, n)
+
+            else:
+                pref = m.group(8).lower()
+                a = int(m.group(9))
+                b = int(m.group(10) or m.group(9))
+                lo, hi = sorted((a, b))
+                add_interval(ranges, sec_low, pref, lo, hi)
+
+    return {k: merge_intervals(v) for k, v in ranges.items()}
+
+# ──────────────── against the row index ────────────────
+# row_index: (sec_low, pref) -> (sorted nums, seats, sections, blocked), keys in sorted order.
+
+def row_span(nums, lo, hi):
+    """[i, j) of the sorted ``nums`` that fall within lo..hi."""
+    return bisect_left(nums, lo), bisect_right(nums, hi)
+
+def section_row_keys(row_keys, sec_low):
+    """The (sec_low, pref) keys of one section, from the sorted ``row_keys``."""
+    i = bisect_left(row_keys, (sec_low,))
+    j = bisect_left(row_keys, (sec_low + "\x00",))
+    return row_keys[i:j]
+
+def expand_sections(ranges, row_index):
+    """Replace whole-section entries with a whole-row entry per existing row."""
+    if not any(pref == ALL_ROWS for _, pref in ranges):
+        return ranges
+    row_keys = list(row_index)
+    out = {}
+    for (sec_low, pref), ivs in ranges.items():
+        if pref == ALL_ROWS:
+            for rk in section_row_keys(row_keys, sec_low):
+                out.setdefault(rk, []).append(WHOLE_ROW)
+        else:
+            out.setdefault((sec_low, pref), []).extend(ivs)
+    return {k: merge_intervals(v) for k, v in out.items()}
+
+def resolve(ranges, row_index):
+    """Concrete intervals: sections expanded, whole rows clipped to their first..last seat."""
+    out = {}
+    for row, ivs in expand_sections(ranges, row_index).items():
+        entry = row_index.get(row)
+        res = []
+        for lo, hi in ivs:
+            if (lo, hi) == WHOLE_ROW:
+                if entry and entry[0]:
+                    res.append((entry[0][0], entry[0][-1]))
+            else:
+                res.append((lo, hi))
+        if res:
+            out[row] = merge_intervals(res)
+    return out
+
+def interval_count(ranges, row_index=None) -> int:
+    """Number of seats a spec covers (wildcards count existing seats; 0 without an index)."""
+    total = 0
+    if row_index is not None:
+        ranges = expand_sections(ranges, row_index)
+    for row, ivs in ranges.items():
+        for lo, hi in ivs:
+            if (lo, hi) == WHOLE_ROW:
+                if row_index is not None and row in row_index:
+                    total += len(row_index[row][0])
+            else:
+                total += hi - lo + 1
+    return total
+
+def iter_keys(ranges, row_index=None):
+    """Expand to (sec_low, pref, num) keys in sorted order (lazily)."""
+    if row_index is not None:
+        ranges = expand_sections(ranges, row_index)
+    for (sec_low, pref) in sorted(ranges):
+        for lo, hi in ranges[(sec_low, pref)]:
+            if (lo, hi) == WHOLE_ROW:
+                entry = row_index.get((sec_low, pref)) if row_index is not None else None
+                for n in (entry[0] if entry else ()):
+                    yield (sec_low, pref, n)
+                continue
+            for n in range(lo, hi + 1):
+                yield (sec_low, pref, n)
+
+def iter_intervals(ranges):
+    """(sec_low, pref, lo, hi) in sorted order."""
+    for (sec_low, pref) in sorted(ranges):
+        for lo, hi in ranges[(sec_low, pref)]:
+            yield sec_low, pref, lo, hi
+
+@stage("overlaps")
+def find_overlaps(range_list, row_index=None):
+    """Seats requested by two or more specs, as a spec (sweep per row)."""
+    if row_index is not None:
+        range_list = [resolve(r, row_index) for r in range_list]
+    events = {}
+    for ranges in range_list:
+        for row, ivs in ranges.items():
+            ev = events.setdefault(row, [])
+            for lo, hi in ivs:
+                ev.append((lo, 1))
+                ev.append((hi + 1, -1))
+
+    overlaps = {}
+    for row, ev in events.items():
+        ev.sort()
+        depth, start = 0, None
+        for x, d in ev:
+            depth += d
+            if depth >= 2 and start is None:
+                start = x
+            elif depth < 2 and start is not None:
+                if x - 1 >= start:
+                    overlaps.setdefault(row, []).append((start, x - 1))
+                start = None
+        if row in overlaps:
+            overlaps[row] = merge_intervals(overlaps[row])
+    return overlaps
+
+def subtract_numbers(lo, hi, nums):
+    """Intervals of [lo, hi] not covered by the sorted, unique ``nums`` (all within [lo, hi])."""
+    out = []
+    nxt = lo
+    for n in nums:
+        if n > nxt:
+            out.append((nxt, n - 1))
+        nxt = n + 1
+    if nxt <= hi:
+        out.append((nxt, hi))
+    return out
+
+def pretty_interval(sec_title, sec_low, pref, lo, hi) -> str:
+    """'Stalls A-5', 'Stalls A-5–9', 'Stalls A (whole row)' or 'Stalls *'."""
+    if pref == ALL_ROWS:
+        return f"{sec_title.get(sec_low, '?')} *"
+    pp = "ROW " + pref[3:] if pref.startswith("row") else pref.upper()
+    if (lo, hi) == WHOLE_ROW:
+        return f"{sec_title.get(sec_low, '?')} {pp} (whole row)"
+    base = f"{sec_title.get(sec_low, '?')} {pp}-{lo}"
+    return base if lo == hi else f"{base}–{hi}"
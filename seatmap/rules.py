@@ -0,0 +1,334 @@
+"""Pricing rules: declarative price changes compiled to store row selections.
+
+One rule per line ("#" starts a comment), for example:
+
+    Stalls rows A-F = 75
+    *Circle with restricted = row - 10%
+    *Circle rows ROW 1-3 except blocked = 60
+    Stalls * = row max
+    Dress Circle A1-10, Dress Circle B = -10%
+
+    rule      := target ["with" word] ["except" exclusion {"," exclusion}] "=" price
+    target    := "all"
+               | sections "rows" rowspec        rows A-F, ROW 1-3, AA-AC, B
+               | sections                       section names or globs ("*Circle"), comma-separated
+               | seat ranges                    as typed in the editor ("Stalls A1-20, Stalls B")
+    exclusion := "blocked" | "av" | "uav" | "with" word | seat ranges
+    price     := number                         75
+               | ("+" | "-") number ["%"]       relative to the seat's own price
+               | "row" [("+" | "-") number ["%"]]
+                                                relative to the "price" of the seat's JSON row
+               | "row max" [("+" | "-") number ["%"]]
+                                                relative to the highest seat price in the
+                                                seat's JSON row
+
+"row" is the row price as it stands when the rules run: row_pass() keeps it
+at the row's highest seat price, but only after the rules (and any groups or
+tier edits run before them) have been written. "row max" is that value
+computed from the current seat prices. Both are per JSON row, not per row
+index row, which can merge several JSON rows.
+
+compile_rules() parses a plan once against the section names (it depends on
+nothing else, so one compiled plan serves every performance of a venue).
+evaluate_rules() resolves each rule to store rows through the row index, a few
+array ops per rule, and attributes every seat to the first rule that matches
+it, as apply_groups() does with groups. rule_prices() resolves every new price
+before anything is written; apply_rules() writes them and rules_report() is
+the dry run.
+"""
+import fnmatch, re
+
+import numpy as np
+
+from .instrument import stage, count_visits
+from .labels import PRICE_RX, format_price, strip_brackets
+from .ranges import parse_ranges, iter_intervals, expand_sections, section_row_keys
+from .store import NO_PRICE, ST_AV, ST_UAV, price_text, to_pence
+
+class RuleError(ValueError):
+    """A rule that doesn't parse or selects nothing that exists."""
+
+RULE_RX = re.compile(
+    r"^(?P<target>.+?)(?:\s+with\s+(?P<word>.+?))?(?:\s+except\s+(?P<exclude>.+?))?\s*=\s*(?P<price>[^=]+)$",
+    re.I
+)
+PRICE_EXPR_RX = re.compile(
+    r"^(?:(?P<row>row(?:\s+max)?)\s*)?(?:(?P<sign>[+-])\s*(?P<amount>\d+(?:\.\d+)?)\s*(?P<pct>%)?)?$", re.I
+)
+ROWS_RX = re.compile(r"^(?P<sections>.+?)\s+rows\s+(?P<rows>.+)$", re.I)
+ROW_SPAN_RX = re.compile(
+    r"^(?:row\s*(?P<n1>\d+)(?:\s*(?:-|–|to)\s*(?:row\s*)?(?P<n2>\d+))?"
+    r"|(?P<p1>[a-z]{1,3})(?:\s*(?:-|–|to)\s*(?P<p2>[a-z]{1,3}))?)$",
+    re.I
+)
+
+# ──────────────── compile ────────────────
+
+def _sections(text, section_names):
+    """Lower-cased section names matched by comma-separated names/globs, or None if a part matches nothing."""
+    names = {s.lower() for s in section_names}
+    found = set()
+    for part in (p.strip().lower() for p in text.split(",")):
+        hits = fnmatch.filter(names, part) if any(c in part for c in "*?[") else [part] * (part in names)
+        if not hits:
+            return None
+        found.update(hits)
+    return frozenset(found)
+
+def _row_spans(text):
+    """[("row", lo, hi) | ("pref", lo, hi)] for a rowspec such as "A-F, H" or "ROW 1-3"."""
+    spans = []
+    for part in (p.strip() for p in text.split(",")):
+        m = ROW_SPAN_RX.match(part)
+        if m is None:
+            raise RuleError(f"bad rows {part!r} (expected e.g. A-F or ROW 1-3)")
+        if m.group("n1"):
+            lo, hi = sorted((int(m.group("n1")), int(m.group("n2") or m.group("n1"))))
+            spans.append(("row", lo, hi))
+        else:
+            lo, hi = (m.group("p1").lower(), (m.group("p2") or m.group("p1")).lower())
+            lo, hi = sorted(((len(lo), lo), (len(hi), hi)))  # A < Z < AA
+            spans.append(("pref", lo, hi))
+    return spans
+
+def _row_in_spans(pref, spans):
+    m = re.fullmatch(r"row(\d+)", pref)
+    for kind, lo, hi in spans:
+        if kind == "row":
+            if m and lo <= int(m.group(1)) <= hi:
+                return True
+        elif not m and lo <= (len(pref), pref) <= hi:
+            return True
+    return False
+
+def _selector(text, section_names, exclusion=False):
+    """Compiled selection: ("all",) | ("sections", secs, spans) | ("ranges", ranges) | ("blocked",) | …"""
+    low = text.strip().lower()
+    if low == "all" and not exclusion:
+        return ("all",)
+    if exclusion and low in ("blocked", "av", "uav"):
+        return ("blocked",) if low == "blocked" else ("status", ST_AV if low == "av" else ST_UAV)
+    if exclusion and low.startswith("with "):
+        return ("word", low[5:].strip())
+    m = ROWS_RX.match(text.strip())
+    if m:
+        secs = _sections(m.group("sections"), section_names)
+        if secs is None:
+            raise RuleError(f"no section matches {m.group('sections')!r}")
+        return ("sections", secs, _row_spans(m.group("rows")))
+    secs = _sections(text, section_names)
+    if secs is not None:
+        return ("sections", secs, None)
+    ranges = parse_ranges(text, section_names)
+    if not ranges:
+        raise RuleError(f"{text.strip()!r} is not a section, rows or seat range")
+    return ("ranges", ranges)
+
+def _price(text):
+    """(base, amount, percent): base "abs" (amount is the price), "seat", "row" or "row max" (amount is the change)."""
+    text = text.strip()
+    if PRICE_RX.match(text):
+        return ("abs", text, False)
+    m = PRICE_EXPR_RX.match(text)
+    if m is None or not (m.group("row") or m.group("sign")):
+        raise RuleError(f"bad price {text!r} (expected e.g. 75, +5, -10%, row, row + 5, row max)")
+    amount = float(m.group("amount") or 0) * (-1 if m.group("sign") == "-" else 1)
+    base = " ".join(m.group("row").lower().split()) if m.group("row") else "seat"
+    return (base, amount, bool(m.group("pct")))
+
+@stage("compile_rules")
+def compile_rules(rules, section_names):
+    """Parse rules (a string, one rule per line, or a list of lines) into [rule dict].
+
+    rule: {"line", "text", "select", "word", "exclude", "price"}. Raises
+    RuleError naming the line of the first rule that doesn't parse.
+    """
+    lines = rules.splitlines() if isinstance(rules, str) else list(rules or ())
+    out = []
+    for n, line in enumerate(lines, 1):
+        text = line.split("#", 1)[0].strip()
+        if not text:
+            continue
+        m = RULE_RX.match(text)
+        try:
+            if m is None:
+                raise RuleError("expected '<seats> = <price>'")
+            exclude = m.group("exclude")
+            out.append({
+                "line": n,
+                "text": text,
+                "select": _selector(m.group("target"), section_names),
+                "word": (m.group("word") or "").strip().lower() or None,
+                "exclude": [_selector(e, section_names, exclusion=True) for e in exclude.split(",")]
+                           if exclude else [],
+                "price": _price(m.group("price")),
+            })
+        except RuleError as e:
+            raise RuleError(f"line {n}: {e}") from None
+    return out
+
+# ──────────────── evaluate ────────────────
+
+def _seat_text(seat) -> str:
+    text = f"{seat.get('number', '') or ''} {seat.get('label', '') or ''} {seat.get('notes', '') or ''}"
+    return (strip_brackets(text) if "(" in text else text).lower()
+
+class _Context:
+    """Per-evaluation lookups shared by every rule (built on first use)."""
+
+    def __init__(self, store):
+        self.store = store
+        self._texts = None
+        self._words = {}
+
+    def word(self, word):
+        """Bool per store row: ``word`` occurs in the seat's number/label/notes."""
+        m = self._words.get(word)
+        if m is None:
+            if self._texts is None:
+                self._texts = [_seat_text(seat) for seat in self.store.refs]
+            texts = self._texts
+            m = self._words[word] = np.fromiter((word in t for t in texts), dtype=bool, count=len(texts))
+        return m
+
+def _rows(store, sel):
+    """Store rows of a target selection. Sections and ranges resolve through the row index,
+    so a rule costs what it selects, not the size of the venue."""
+    kind = sel[0]
+    if kind == "all":
+        return np.arange(len(store), dtype=np.int64)
+    parts = []
+    if kind == "sections":
+        _, secs, spans = sel
+        for sec_low in sorted(secs):
+            for key in section_row_keys(store.row_keys, sec_low):
+                if spans is None or _row_in_spans(key[1], spans):
+                    start = store._row_start[key]
+                    parts.append(np.arange(start, start + len(store.row_index[key][0]), dtype=np.int64))
+    else:
+        parts = [store.rows_in(*iv)[0] for iv in iter_intervals(expand_sections(sel[1], store.row_index))]
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+def _excluded(store, sel, rows, ctx):
+    """Bool per entry of ``rows``: it falls under the exclusion ``sel``."""
+    kind = sel[0]
+    if kind == "blocked":
+        return store.blocked[rows]
+    if kind == "status":
+        return store.status[rows] == sel[1]
+    if kind == "word":
+        return ctx.word(sel[1])[rows]
+    return np.isin(rows, _rows(store, sel))
+
+@stage("rules")
+def evaluate_rules(store, rules):
+    """Store row -> index of the first rule matching it (-1: none), as an int32 array."""
+    rule_of = np.full(len(store), -1, dtype=np.int32)
+    ctx = _Context(store)
+    visits = 0
+    for i, rule in enumerate(rules):
+        rows = _rows(store, rule["select"])
+        visits += len(rows)
+        rows = rows[rule_of[rows] < 0]
+        if rule["word"]:
+            rows = rows[ctx.word(rule["word"])[rows]]
+        for sel in rule["exclude"]:
+            rows = rows[~_excluded(store, sel, rows, ctx)]
+        rule_of[rows] = i
+    count_visits(visits)
+    return rule_of
+
+def rule_rows(rule_of, n_rules):
+    """[store rows attributed to rule i] (seat order) for every rule."""
+    order = np.argsort(rule_of, kind="stable")
+    bounds = np.searchsorted(rule_of[order], np.arange(n_rules + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(n_rules)]
+
+def _json_row_prices(store, seat_data, cur):
+    """{"row", "row max"}: per store row, the pence of its JSON row's "price" and of its highest seat price."""
+    row_id = {}
+    row_price = []
+    for sec in seat_data.values():
+        if not isinstance(sec, dict) or sec.get("type", "def") == "aoi":
+            continue
+        for row in (sec.get("rows", {}) or {}).values():
+            row_id.update(dict.fromkeys(map(id, (row.get("seats") or {}).values()), len(row_price)))
+            row_price.append(to_pence(price_text(row)))
+    ids = np.fromiter((row_id[id(seat)] for seat in store.refs), dtype=np.int64, count=len(store))
+    row_max = np.full(len(row_price), NO_PRICE, dtype=np.int64)
+    np.maximum.at(row_max, ids, cur)  # NO_PRICE is below every price
+    return {"row": np.array(row_price, dtype=np.int64)[ids], "row max": row_max[ids]}
+
+def rule_prices(store, rules, rule_of, seat_data):
+    """Per rule, [(store rows, new price text)], all resolved against the prices before any is written.
+
+    Relative rules skip seats whose base (own, row or row max price) isn't a
+    plain number. The row bases come from the seat's JSON row in ``seat_data``
+    (see the module docstring).
+    """
+    cur = store.price_p
+    row_bases = None
+    out = []
+    for rule, rows in zip(rules, rule_rows(rule_of, len(rules))):
+        base, amount, percent = rule["price"]
+        if base == "abs" or not len(rows):
+            out.append([(rows, amount)] if len(rows) else [])
+            continue
+        if base != "seat" and row_bases is None:
+            row_bases = _json_row_prices(store, seat_data, cur)
+        pence = (cur if base == "seat" else row_bases[base])[rows]
+        priced = pence != NO_PRICE
+        rows, pence = rows[priced], pence[priced]
+        new = np.round(pence * (1 + amount / 100)) if percent else pence + round(amount * 100)
+        values, inv = np.unique(np.maximum(new, 0).astype(np.int64), return_inverse=True)
+        inv = inv.reshape(-1)
+        groups = np.split(rows[np.argsort(inv, kind="stable")], np.cumsum(np.bincount(inv))[:-1])
+        out.append([(part, format_price(v / 100)) for part, v in zip(groups, values.tolist())])
+    return out
+
+@stage("apply_rules")
+def apply_rules(store, rules, seat_data, rule_of=None):
+    """Reprice the seats attributed to each rule. Returns seats changed per rule."""
+    if rule_of is None:
+        rule_of = evaluate_rules(store, rules)
+    changed = []
+    for writes in rule_prices(store, rules, rule_of, seat_data):
+        changed.append(sum(len(store.set_price(rows, price)) for rows, price in writes))
+    count_visits(sum(changed))
+    return changed
+
+def rules_report(store, rules, seat_data, rule_of=None, sample=5):
+    """Dry run: per rule, its seats, how many it would reprice and a few sample seats. Changes nothing."""
+    if rule_of is None:
+        rule_of = evaluate_rules(store, rules)
+    report = []
+    for rule, rows, writes in zip(rules, rule_rows(rule_of, len(rules)), rule_prices(store, rules, rule_of, seat_data)):
+        would = 0
+        for w_rows, price in writes:
+            q = store._price_ids.get(price)
+            would += len(w_rows) if q is None else int(((store.price_id[w_rows] != q) | ~store.price_exact[w_rows]).sum())
+        report.append({
+            "line": rule["line"],
+            "rule": rule["text"],
+            "seats": len(rows),
+            "unpriced": len(rows) - sum(len(r) for r, _ in writes),
+            "would_change": would,
+            "sample": [f"{store.display_section(i)} {store.seat_label(i)}" for i in rows[:sample].tolist()],
+        })
+    return report
+
+def iter_attribution(store, rules, rule_of, seat_data):
+    """{"section", "seat", "line", "rule", "price"} for every attributed seat, in seat order."""
+    new_price = {}
+    for writes in rule_prices(store, rules, rule_of, seat_data):
+        for rows, price in writes:
+            new_price.update(dict.fromkeys(rows.tolist(), price))
+    for i in np.flatnonzero(rule_of >= 0).tolist():
+        rule = rules[rule_of[i]]
+        yield {
+            "section": store.display_section(i),
+            "seat": store.seat_label(i),
+            "line": rule["line"],
+            "rule": rule["text"],
+            "price": new_price.get(i, ""),
+        }
@@ -0,0 +1,434 @@
+"""Local HTTP/JSON service over the engine, for box office tooling.
+
+    python -m seatmap serve --port 8765 --workers 8 --max-mb 2048
+
+    POST   /maps                      upload a seat map (body: the JSON; ?block_words=pillar,aisle)
+    GET    /maps                      loaded maps
+    GET    /maps/<id>                 counts for one map
+    GET    /maps/<id>/tiers           AV price tiers: [{"section", "price", "seats"}]
+    POST   /maps/<id>/preview         resolve a spec without applying it (body: {"groups": [...]})
+    POST   /maps/<id>/apply           apply a spec (the CLI's spec format; see cli.py)
+    POST   /maps/<id>/rules           dry-run pricing rules (body: {"rules": [...]}): per-rule hits
+    POST   /maps/<id>/undo, /redo     step through the map's change journal
+    GET    /maps/<id>/diff            ?against=<id>[&limit=1000]: seat status/price changes from <id> to that map
+    GET    /maps/<id>/best            ?n=6[&section=Stalls&prefer=centre&through_blocked=1&limit=5]: adjacent AV seats
+    GET    /maps/<id>/export          ?format=pretty|compact|gzip|patch (patch: changes since upload)
+    DELETE /maps/<id>
+
+Loaded maps stay in memory, least recently used first out once their
+estimated size passes the budget. Connections are handled by a fixed pool
+of worker threads; each map has its own lock, so edits to one map are
+serialized while different maps are worked on in parallel.
+"""
+import contextlib, itertools, json, re, secrets, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import engine
+from .cache import IndexCache, cached_index
+from .store import ST_AV
+
+# parsed map + index + store ≈ 6× the JSON text (see `seatmap bench --index-memory`)
+MEMORY_FACTOR = 6
+MAX_UPLOAD = 512 << 20
+
+class ServiceError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class LoadedMap:
+    """One uploaded map with its store; ``lock`` guards every read and edit."""
+
+    def __init__(self, map_id, seat_data, store, stats, block_words, nbytes):
+        self.id = map_id
+        self.seat_data = seat_data
+        self.store = store
+        self.section_names = engine.section_names_from_data(seat_data)
+        self.load_stats = stats
+        self.block_words = block_words
+        self.cost = nbytes * MEMORY_FACTOR
+        self.loaded = time.time()
+        self.lock = threading.Lock()
+
+    def summary(self):
+        journal = self.store.journal
+        return {
+            "id": self.id,
+            "seats": len(self.store),
+            "sections": len(self.section_names),
+            "available": int((self.store.status == ST_AV).sum()),
+            "undo": len(journal.undo_stack),
+            "redo": len(journal.redo_stack),
+            "est_mb": round(self.cost / 1e6, 1),
+        }
+
+class MapLRU:
+    """Loaded maps by id, evicting the least recently used beyond ``max_bytes`` (estimated)."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, m):
+        """Insert ``m``; returns the ids evicted to make room (never ``m`` itself)."""
+        evicted = []
+        with self._lock:
+            self._maps[m.id] = m
+            self.used += m.cost
+            while self.used > self.max_bytes and len(self._maps) > 1:
+                _, old = self._maps.popitem(last=False)
+                self.used -= old.cost
+                evicted.append(old.id)
+        return evicted
+
+    def get(self, map_id):
+        with self._lock:
+            m = self._maps.get(map_id)
+            if m is None:
+                raise ServiceError(404, f"no map {map_id!r} (never uploaded, deleted or evicted)")
+            self._maps.move_to_end(map_id)
+            return m
+
+    def remove(self, map_id):
+        with self._lock:
+            m = self._maps.pop(map_id, None)
+            if m is None:
+                raise ServiceError(404, f"no map {map_id!r}")
+            self.used -= m.cost
+
+    def values(self):
+        with self._lock:
+            return list(self._maps.values())
+
+class Service:
+    """The endpoints as plain methods (JSON-safe dicts in and out), independent of HTTP."""
+
+    def __init__(self, max_bytes=2 << 30, cache=None):
+        self.maps = MapLRU(max_bytes)
+        self.cache = cache
+
+    def upload(self, raw: bytes, block_words=None):
+        if not raw:
+            raise ServiceError(400, "empty upload")
+        stats = engine.PassStats()
+        journal = engine.Journal()
+        try:
+            seat_data = engine.load_map(raw, journal)
+        except ValueError as e:  # not JSON, not UTF-8 or not an object
+            raise ServiceError(400, f"not a seat map JSON file: {e}") from None
+        if not any(isinstance(sec, dict) and isinstance(sec.get("rows"), dict) for sec in seat_data.values()):
+            raise ServiceError(400, 'not a seat map JSON file: no section has "rows"')
+        matcher = engine.block_matcher(block_words)
+        row_index = cached_index(seat_data, stats, matcher, journal, self.cache, source=raw)[2]
+        store = engine.build_store(row_index, stats, journal)
+        m = LoadedMap(secrets.token_hex(8), seat_data, store, stats, block_words, len(raw))
+        evicted = self.maps.add(m)
+        return {**m.summary(), "load": stats.summary(), "evicted": evicted}
+
+    def list_maps(self):
+        return {"maps": [m.summary() for m in self.maps.values()], "used_mb": round(self.maps.used / 1e6, 1)}
+
+    def summary(self, map_id):
+        m = self.maps.get(map_id)
+        with m.lock:
+            return m.summary()
+
+    def tiers(self, map_id):
+        m = self.maps.get(map_id)
+        with m.lock:
+            _, _, tiers = engine.status_views(m.store, lines=False)
+        return {"tiers": [
+            {"section": sec, "price": price, "seats": len(rows)}
+            for (sec, price), rows in sorted(tiers.items(), key=lambda kv: (kv[0][0].lower(), kv[0][1]))
+        ]}
+
+    def preview(self, map_id, spec):
+        groups = _groups(spec)
+        m = self.maps.get(map_id)
+        with m.lock:
+            prepared = _prepare(m, {"groups": groups})
+        group_rows, missing, missing_rows = prepared["resolved"]
+        return {
+            "groups": [
+                {"range": g.get("range", ""), "price": g.get("price", ""), "seats": len(rows)}
+                for g, rows in zip(groups, group_rows)
+            ],
+            "targets": sum(len(rows) for rows in group_rows),
+            "overlaps": prepared["overlaps"],
+            "missing": engine.interval_count(missing) + len(missing_rows),
+            "missing_seats": engine.missing_report(missing, missing_rows, m.section_names),
+        }
+
+    def apply(self, map_id, plan):
+        if not isinstance(plan, dict):
+            raise ServiceError(400, "spec must be a JSON object")
+        if plan.get("groups"):
+            _groups(plan)
+        m = self.maps.get(map_id)
+        words = engine.BLOCK_WORDS if m.block_words is None else m.block_words
+        if plan.get("block_words") is not None and list(plan["block_words"]) != list(words):
+            raise ServiceError(400, "block_words are fixed at upload (?block_words=…)")
+        with m.lock:
+            prepared = _prepare(m, plan)  # checked before run_plan opens its journal operation
+            r = engine.run_plan(m.seat_data, plan, m.store, prepared=prepared)
+            return {**engine.plan_summary(r, m.section_names), "map": m.summary()}
+
+    def rules(self, map_id, spec):
+        if not isinstance(spec, dict) or not isinstance(spec.get("rules"), (str, list)):
+            raise ServiceError(400, 'spec needs "rules": a string or a list of lines')
+        m = self.maps.get(map_id)
+        try:
+            rules = engine.compile_rules(spec["rules"], m.section_names)
+        except engine.RuleError as e:
+            raise ServiceError(400, f"bad rules: {e}") from None
+        with m.lock:
+            report = engine.rules_report(m.store, rules, m.seat_data)
+        return {"rules": report, "seats": sum(r["seats"] for r in report)}
+
+    def step(self, map_id, redo=False):
+        m = self.maps.get(map_id)
+        with m.lock:
+            op = m.store.redo() if redo else m.store.undo()
+            return {"label": op.label if op else None, "changes": op.summary() if op else {}, "map": m.summary()}
+
+    def diff(self, map_id, against, limit=1000):
+        if not against:
+            raise ServiceError(400, "diff needs ?against=<map id>")
+        m, other = self.maps.get(map_id), self.maps.get(against)
+        first, second = sorted((m, other), key=lambda x: x.id)
+        with first.lock, (second.lock if second is not first else contextlib.nullcontext()):
+            d = engine.diff_stores(m.store, other.store)
+            rows = list(itertools.islice(engine.iter_diff_rows(d), limit + 1))
+            return {**engine.diff_summary(d), "rows": rows[:limit], "truncated": len(rows) > limit}
+
+    def best(self, map_id, n, section=None, prefer="front", through_blocked=False, limit=5):
+        m = self.maps.get(map_id)
+        with m.lock:
+            try:
+                blocks = engine.best_available(m.store, n, section, prefer, through_blocked, limit)
+            except ValueError as e:
+                raise ServiceError(400, str(e)) from None
+        return {"blocks": [info for _, info in blocks]}
+
+    def export(self, map_id, fmt="pretty"):
+        """(bytes, mime type, file suffix)."""
+        if fmt not in engine.FORMATS:
+            raise ServiceError(400, f"unknown format {fmt!r} (expected one of {', '.join(engine.FORMATS)})")
+        m = self.maps.get(map_id)
+        with m.lock:
+            data = engine.export(m.seat_data, fmt, m.store)
+        suffix, mime = engine.FORMATS[fmt]
+        return data, mime, suffix
+
+    def delete(self, map_id):
+        self.maps.remove(map_id)
+        return {"deleted": map_id}
+
+def _groups(spec):
+    """The spec's groups; a bare {"range": …} previews as one group."""
+    if not isinstance(spec, dict):
+        raise ServiceError(400, "spec must be a JSON object")
+    groups = spec.get("groups")
+    if groups is None and "range" in spec:
+        groups = [{"range": spec["range"], "price": spec.get("price", "")}]
+    if not isinstance(groups, list) or not all(isinstance(g, dict) and "range" in g for g in groups):
+        raise ServiceError(400, 'spec needs "groups": [{"range": …, "price": …}, …]')
+    return groups
+
+def _prepare(m, plan):
+    """engine.prepare_plan() for map ``m``; a malformed plan is a 400."""
+    try:
+        return engine.prepare_plan(plan, m.section_names, m.store)
+    except engine.RuleError as e:
+        raise ServiceError(400, f"bad rules: {e}") from None
+    except ValueError as e:
+        raise ServiceError(400, f"bad spec: {e}") from None
+
+# ──────────────── HTTP ────────────────
+
+ROUTES = [
+    ("GET", r"/maps", "list_maps"),
+    ("POST", r"/maps", "upload"),
+    ("GET", r"/maps/(\w+)", "summary"),
+    ("DELETE", r"/maps/(\w+)", "delete"),
+    ("GET", r"/maps/(\w+)/tiers", "tiers"),
+    ("POST", r"/maps/(\w+)/preview", "preview"),
+    ("POST", r"/maps/(\w+)/apply", "apply"),
+    ("POST", r"/maps/(\w+)/rules", "rules"),
+    ("POST", r"/maps/(\w+)/undo", "undo"),
+    ("POST", r"/maps/(\w+)/redo", "redo"),
+    ("GET", r"/maps/(\w+)/diff", "diff"),
+    ("GET", r"/maps/(\w+)/best", "best"),
+    ("GET", r"/maps/(\w+)/export", "export"),
+]
+ROUTES = [(method, re.compile(pattern + "/?"), name) for method, pattern, name in ROUTES]
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "seatmap"
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        allowed = []
+        for m, rx, name in ROUTES:
+            match = rx.fullmatch(url.path)
+            if match:
+                if m == method:
+                    break
+                allowed.append(m)
+        else:
+            if allowed:
+                return self.send_json(405, {"error": f"{method} not allowed here"}, {"Allow": ", ".join(allowed)})
+            return self.send_json(404, {"error": f"no route {url.path}"})
+        try:
+            getattr(self, "ep_" + name)(*match.groups(), query=query)
+        except ServiceError as e:
+            self.send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, url.path, e)
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    # ─────────── endpoints ───────────
+
+    @property
+    def service(self) -> Service:
+        return self.server.service
+
+    def ep_list_maps(self, query):
+        self.send_json(200, self.service.list_maps())
+
+    def ep_upload(self, query):
+        words = query.get("block_words")
+        words = [w.strip() for w in words.split(",") if w.strip()] if words is not None else None
+        self.send_json(201, self.service.upload(self.body(), words))
+
+    def ep_summary(self, map_id, query):
+        self.send_json(200, self.service.summary(map_id))
+
+    def ep_delete(self, map_id, query):
+        self.send_json(200, self.service.delete(map_id))
+
+    def ep_tiers(self, map_id, query):
+        self.send_json(200, self.service.tiers(map_id))
+
+    def ep_preview(self, map_id, query):
+        self.send_json(200, self.service.preview(map_id, self.json_body()))
+
+    def ep_apply(self, map_id, query):
+        self.send_json(200, self.service.apply(map_id, self.json_body()))
+
+    def ep_rules(self, map_id, query):
+        self.send_json(200, self.service.rules(map_id, self.json_body()))
+
+    def ep_undo(self, map_id, query):
+        self.send_json(200, self.service.step(map_id))
+
+    def ep_redo(self, map_id, query):
+        self.send_json(200, self.service.step(map_id, redo=True))
+
+    def ep_diff(self, map_id, query):
+        try:
+            limit = int(query.get("limit", 1000))
+        except ValueError:
+            raise ServiceError(400, "limit must be a number") from None
+        self.send_json(200, self.service.diff(map_id, query.get("against"), limit))
+
+    def ep_best(self, map_id, query):
+        try:
+            n, limit = int(query.get("n", "")), int(query.get("limit", 5))
+        except ValueError:
+            raise ServiceError(400, "best needs ?n=<seats> (and a numeric limit)") from None
+        through = query.get("through_blocked", "") in ("1", "true", "yes")
+        self.send_json(200, self.service.best(map_id, n, query.get("section"), query.get("prefer", "front"), through, limit))
+
+    def ep_export(self, map_id, query):
+        data, mime, suffix = self.service.export(map_id, query.get("format", "pretty"))
+        self.send(200, data, mime, {"Content-Disposition": f'attachment; filename="{map_id}{suffix}"'})
+
+    # ─────────── plumbing ───────────
+
+    def body(self) -> bytes:
+        try:
+            n = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise ServiceError(400, "bad Content-Length") from None
+        if n > MAX_UPLOAD:
+            raise ServiceError(413, f"body over {MAX_UPLOAD >> 20} MB")
+        return self.rfile.read(n)
+
+    def json_body(self):
+        try:
+            return json.loads(self.body() or b"{}")
+        except ValueError as e:
+            raise ServiceError(400, f"body is not JSON: {e}") from None
+
+    def send_json(self, status, payload, headers=None):
+        self.send(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def send(self, status, data, mime, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", mime)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        if not self.server.quiet:
+            super().log_message(fmt, *args)
+
+class PoolHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a fixed pool of worker threads."""
+
+    def __init__(self, address, service, workers=8, quiet=False):
+        super().__init__(address, Handler)
+        self.service = service
+        self.quiet = quiet
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="seatmap-http")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+def make_server(host="127.0.0.1", port=8765, workers=8, max_mb=2048, index_cache=False, quiet=False):
+    """A server bound to host:port (port 0: any free port, see server.server_address)."""
+    service = Service(max_mb * 1_000_000, IndexCache() if index_cache else None)
+    return PoolHTTPServer((host, port), service, workers, quiet)
+
+def cmd_serve(args) -> int:
+    server = make_server(args.host, args.port, args.workers, args.max_mb, args.index_cache)
+    host, port = server.server_address[:2]
+    print(f"seatmap service on http://{host}:{port} ({args.workers} workers, {args.max_mb} MB of maps)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
@@ -0,0 +1,185 @@
+"""Sharded index build: one huge seat map indexed on several CPU cores.
+
+    engine.build_seat_index(seat_data, workers=8)      (0: every core)
+
+The per-seat work of the index — block-word matching and label normalising
+and splitting — runs in a process pool. The map's indexed sections are cut
+into shards of about the same seat count (a big section is cut between rows,
+small ones share a shard). Workers are forked, so they read the map, the
+compiled BlockMatcher and split_label's memo from the parent's memory
+instead of being sent a pickled copy.
+
+A worker returns a compact fragment per piece of a section: per prefix, the
+sorted seat numbers, blocked flags and each seat's position in the piece
+(its JSON path: rows, then seats, in order), plus the positions of the
+blocked seats. The parent resolves positions to seat dicts, forces blocked
+seats to UAV and merges the fragments in map order, so the row index is the
+serial build's, "last seat wins" for a repeated key included. Repeated
+(section, prefix, number) keys are reported as they are merged.
+
+Maps under SHARD_MIN_SEATS, a single worker, platforms without fork
+(pickling the map costs about as much as indexing it) and a pool that
+breaks all fall back to the serial build (sharded_index() returns None).
+"""
+import gc, multiprocessing, os, sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .engine import section_title
+from .instrument import span
+from .journal import MISSING, ObjChange
+from .labels import split_labels
+
+SHARD_MIN_SEATS = 200_000  # below this, starting the pool costs more than it saves
+SHARDS_PER_WORKER = 4      # smaller shards even out sections of different sizes
+
+# The map being indexed and its matcher: set before the pool forks, inherited by the workers.
+_data = None
+_matcher = None
+
+def _section_rows(sec):
+    return list((sec.get("rows", {}) or {}).values())
+
+def plan_shards(seat_data, parts):
+    """([[(section key, first row, stop row)]], seats): indexed sections in map order, cut into ~``parts`` shards."""
+    sections, total = [], 0
+    for sec_key, sec in seat_data.items():
+        if not isinstance(sec, dict) or sec.get("type", "def") == "aoi":
+            continue
+        sizes = [len(row.get("seats") or {}) for row in _section_rows(sec)]
+        sections.append((sec_key, sizes))
+        total += sum(sizes)
+
+    target = max(1, -(-total // max(1, parts)))
+    shards, shard, filled = [], [], 0
+    for sec_key, sizes in sections:
+        first = 0
+        for i, n in enumerate(sizes):
+            filled += n
+            if filled >= target:
+                shard.append((sec_key, first, i + 1))
+                shards.append(shard)
+                shard, filled, first = [], 0, i + 1
+        if first < len(sizes):
+            shard.append((sec_key, first, len(sizes)))
+    if shard:
+        shards.append(shard)
+    return shards, total
+
+def _index_shard(pieces):
+    """Worker: [(entries, blocked positions, repeated (prefix, number), seats split, seats seen)] per piece.
+
+    entries: [(prefix, sorted numbers, positions, blocked flags)].
+    """
+    out = []
+    for sec_key, first, stop in pieces:
+        found = defaultdict(dict)  # prefix -> {number: position}, last one wins
+        blocked_at, repeated = [], []
+        pos = split_count = 0
+        rows = _section_rows(_data[sec_key])[first:stop]
+        seats = [seat for row in rows for seat in (row.get("seats") or {}).values()]
+        for seat, split in zip(seats, split_labels([seat.get("number", "") for seat in seats])):
+            if _matcher(seat):
+                blocked_at.append(pos)
+            if split:
+                pref, num = split
+                by_num = found[pref]
+                if num in by_num:
+                    repeated.append(split)
+                by_num[num] = pos
+                split_count += 1
+            pos += 1
+        blocked = set(blocked_at)
+        entries = []
+        for pref, by_num in found.items():
+            nums = sorted(by_num)
+            at = [by_num[n] for n in nums]
+            entries.append((pref, nums, at, [p in blocked for p in at]))
+        out.append((entries, blocked_at, repeated, split_count, pos))
+    return out
+
+def sharded_index(seat_data, matcher, workers=0, duplicates=None, blocked=None):
+    """(row_index, per_section_counts, forced UAV changes, seats visited) as the serial build, or None to use it."""
+    global _data, _matcher
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    shards, total = plan_shards(seat_data, workers * SHARDS_PER_WORKER)
+    if total < SHARD_MIN_SEATS or len(shards) < 2:
+        return None
+
+    _data, _matcher = seat_data, matcher
+    gc.freeze()  # the workers' collector then leaves the inherited map alone (no copy-on-write of its pages)
+    try:
+        with span("shard_workers"), ProcessPoolExecutor(
+            min(workers, len(shards)), mp_context=multiprocessing.get_context("fork")
+        ) as pool:
+            results = list(pool.map(_index_shard, shards))
+    except (BrokenProcessPool, OSError):
+        return None  # e.g. a worker killed for memory: nothing was changed yet
+    finally:
+        gc.unfreeze()
+        _data = _matcher = None
+
+    enabled = gc.isenabled()
+    gc.disable()  # the merge allocates lists and tuples only, no cycles to collect
+    try:
+        with span("shard_merge"):
+            return _merge(seat_data, shards, results, duplicates, blocked)
+    finally:
+        if enabled:
+            gc.enable()
+
+def _merge(seat_data, shards, results, duplicates, blocked=None):
+    parts = defaultdict(list)  # (sec_low, pref) -> [(nums, [seat], sec_disp, [blocked])], map order
+    per_section_counts = defaultdict(int)
+    forced = ObjChange("status")
+    visits = 0
+    for pieces, fragments in zip(shards, results):
+        for (sec_key, first, stop), (entries, blocked_at, repeated, split_count, seen) in zip(pieces, fragments):
+            sec = seat_data[sec_key]
+            sec_disp, sec_low = section_title(sec)
+            flat = [seat for row in _section_rows(sec)[first:stop] for seat in (row.get("seats") or {}).values()]
+            for i in blocked_at:
+                seat = flat[i]
+                if seat.get("status", MISSING) != "uav":
+                    forced.add(seat, seat.get("status", MISSING), "uav")
+                seat["status"] = "uav"
+            if blocked is not None:
+                blocked.extend(flat[i] for i in blocked_at)
+            for pref, nums, at, flags in entries:
+                parts[(sec_low, sys.intern(pref))].append((nums, [flat[i] for i in at], sec_disp, flags))
+            if duplicates is not None:
+                duplicates.extend((sec_low, pref, num) for pref, num in repeated)
+            if split_count:
+                per_section_counts[sec_low] += split_count
+            visits += seen
+
+    row_index = {}
+    for key in sorted(parts):
+        chunks = parts.pop(key)
+        if len(chunks) == 1:
+            nums, seats, sec_disp, flags = chunks[0]
+            row_index[key] = (nums, seats, [sec_disp] * len(nums), flags)
+            continue
+        ordered = sorted(chunks, key=lambda c: c[0][0])
+        if all(a[0][-1] < b[0][0] for a, b in zip(ordered, ordered[1:])):
+            # pieces with separate number ranges (the left and right blocks of a row): concatenate
+            row_index[key] = (
+                [n for c in ordered for n in c[0]],
+                [seat for c in ordered for seat in c[1]],
+                [c[2] for c in ordered for _ in c[0]],
+                [flag for c in ordered for flag in c[3]],
+            )
+            continue
+        by_num = {}  # numbers interleave or repeat across pieces: merge one by one, later pieces win
+        for nums, seats, sec_disp, flags in chunks:
+            for num, seat, flag in zip(nums, seats, flags):
+                if duplicates is not None and num in by_num:
+                    duplicates.append((*key, num))
+                by_num[num] = (seat, sec_disp, flag)
+        nums = sorted(by_num)
+        entries = [by_num[n] for n in nums]
+        row_index[key] = (nums, [e[0] for e in entries], [e[1] for e in entries], [e[2] for e in entries])
+    return row_index, per_section_counts, forced, visits
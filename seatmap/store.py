@@ -0,0 +1,355 @@
+"""Columnar seat store: one NumPy array per field, one row per indexed seat.
+
+Selections are boolean masks over the store rows, so "turn off everything not
+targeted" is a single vectorized op. Only rows whose value actually changes
+are written back to the seat dicts they were built from (``refs``), and every
+write is recorded in the store's change journal (see journal.py) and reported
+to the store's maintained indexes, if it has them (TierIndex, AvailIndex).
+"""
+import numpy as np
+
+from .labels import PRICE_RX, row_order_key
+from .journal import Journal, capture
+from .ranges import row_span
+
+# status codes (compared case-insensitively, like the editor always has)
+ST_OTHER, ST_AV, ST_UAV = 0, 1, 2
+STATUS_CODES = {"av": ST_AV, "uav": ST_UAV}
+
+NO_PRICE = -1  # price_p for missing / non-numeric prices
+
+def status_code(value) -> int:
+    return STATUS_CODES.get((value or "").lower(), ST_OTHER)
+
+def price_text(seat: dict) -> str:
+    """The seat's price as the tier editor sees it (None → 'None', missing → '')."""
+    return str(seat.get("price", "")).strip()
+
+def to_pence(text: str) -> int:
+    return int(round(float(text) * 100)) if PRICE_RX.match(text) else NO_PRICE
+
+class SeatStore:
+    """Parallel arrays over the indexed seats, laid out in row_index order.
+
+    Seats of one (sec_low, pref) row are contiguous and sorted by number, so
+    store order is SeatIndex (sorted key) order.
+    """
+
+    def __init__(self, row_index, journal=None):
+        n = sum(len(entry[0]) for entry in row_index.values())
+        self.row_index = row_index  # (sec_low, pref) -> (nums, [seat], [sec_disp], [blocked])
+        self.row_keys = list(row_index)  # sorted
+        self.refs = []              # [seat dict]  ← back-reference into the JSON
+        self.sec_disp = []          # sec_id  -> display section
+        self.sec_names = []         # sec_id  -> sec_low (== sec_disp.lower())
+        self.prefs = []             # pref_id -> prefix
+        self.prices = []            # price_id -> price text (see price_text)
+        self._row_start = {}        # (sec_low, pref) -> first store row
+
+        sec_ids, pref_ids, price_ids = {}, {}, {}
+        self.sec_id = np.empty(n, dtype=np.int32)
+        self.pref_id = np.empty(n, dtype=np.int32)
+        self.num = np.empty(n, dtype=np.int64)
+        self.status = np.empty(n, dtype=np.int8)
+        self.price_id = np.empty(n, dtype=np.int32)
+        self.blocked = np.empty(n, dtype=bool)
+        self.price_exact = np.empty(n, dtype=bool)  # JSON price is exactly the text (a str)
+        self.journal = Journal() if journal is None else journal
+
+        i = 0
+        for (sec_low, pref), (nums, seats, sections, blocked) in row_index.items():
+            self._row_start[(sec_low, pref)] = i
+            p = pref_ids.get(pref)
+            if p is None:
+                p = pref_ids[pref] = len(self.prefs)
+                self.prefs.append(pref)
+
+            for num, seat, disp, b in zip(nums, seats, sections, blocked):
+                s = sec_ids.get(disp)
+                if s is None:
+                    s = sec_ids[disp] = len(self.sec_names)
+                    self.sec_names.append(sec_low)
+                    self.sec_disp.append(disp)
+                txt = price_text(seat)
+                raw = seat.get("price")
+                q = price_ids.get(txt)
+                if q is None:
+                    q = price_ids[txt] = len(self.prices)
+                    self.prices.append(txt)
+
+                self.refs.append(seat)
+                self.sec_id[i] = s
+                self.pref_id[i] = p
+                self.num[i] = num
+                self.status[i] = status_code(seat.get("status", ""))
+                self.price_id[i] = q
+                self.blocked[i] = b
+                self.price_exact[i] = raw == txt and isinstance(raw, str)
+                i += 1
+
+        self._price_ids = price_ids
+        self._sec_ids = sec_ids     # display section -> sec_id
+        self._tiers = None          # TierIndex, built by tier_index()
+        self._avail = None          # AvailIndex, built by avail_index()
+
+    def __len__(self):
+        return len(self.refs)
+
+    @property
+    def price_p(self):
+        """Price in integer pence per row (NO_PRICE when not a plain number)."""
+        table = np.array([to_pence(t) for t in self.prices], dtype=np.int64)
+        return table[self.price_id]
+
+    # ─────────── selection ───────────
+
+    def rows_in(self, sec_low: str, pref: str, lo: int, hi: int):
+        """Store rows of the seats numbered lo..hi in one row, and their numbers (ascending)."""
+        entry = self.row_index.get((sec_low, pref))
+        if entry is None:
+            return np.zeros(0, dtype=np.int64), []
+        i, j = row_span(entry[0], lo, hi)
+        s = self._row_start[(sec_low, pref)]
+        return np.arange(s + i, s + j, dtype=np.int64), entry[0][i:j]
+
+    def row_of(self, key):
+        """Store row of a (sec_low, pref, num) key, or None."""
+        rows, _ = self.rows_in(key[0], key[1], key[2], key[2])
+        return int(rows[0]) if len(rows) else None
+
+    def mask(self, rows=None):
+        m = np.zeros(len(self), dtype=bool)
+        if rows is not None:
+            m[rows] = True
+        return m
+
+    def price_ref(self, text: str) -> int:
+        q = self._price_ids.get(text)
+        if q is None:
+            q = self._price_ids[text] = len(self.prices)
+            self.prices.append(text)
+        return q
+
+    # ─────────── vectorized updates (write back changed rows only) ───────────
+
+    def set_status(self, mask, code: int, value: str):
+        """Set status on the masked rows whose code differs. Returns the changed rows."""
+        changed = np.flatnonzero(mask & (self.status != code))
+        if self.journal.recording:
+            self.journal.record(capture(self, "status", changed, code, value))
+        self.status[changed] = code
+        refs = self.refs
+        for i in changed.tolist():
+            refs[i]["status"] = value
+        self.touched(changed)
+        return changed
+
+    def set_price(self, rows, price: str):
+        """Write ``price`` to the given rows whose JSON price differs. Returns the changed rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        q = self.price_ref(price.strip())
+        if price == price.strip():
+            rows = rows[(self.price_id[rows] != q) | ~self.price_exact[rows]]
+        if self.journal.recording:
+            self.journal.record(capture(self, "price", rows, q, price))
+        self.price_id[rows] = q
+        self.price_exact[rows] = price == price.strip()
+        refs = self.refs
+        for i in rows.tolist():
+            refs[i]["price"] = price
+        self.touched(rows)
+        return rows
+
+    def touched(self, rows):
+        """Status or price of ``rows`` was just written (here or by the journal)."""
+        if self._tiers is not None:
+            self._tiers.update(self, rows)
+        if self._avail is not None:
+            self._avail.update(self, rows)
+
+    def undo(self):
+        """Revert the last journaled operation. Returns it (None if nothing to undo)."""
+        return self.journal.undo(self)
+
+    def redo(self):
+        return self.journal.redo(self)
+
+    # ─────────── queries ───────────
+
+    def seat_label(self, i: int) -> str:
+        return self.refs[i].get("number", "")
+
+    def key(self, i: int):
+        """(sec_low, pref, num) of a store row."""
+        return self.sec_names[self.sec_id[i]], self.prefs[self.pref_id[i]], int(self.num[i])
+
+    def display_section(self, i: int) -> str:
+        return self.sec_disp[self.sec_id[i]]
+
+    def sec_rows_mask(self, sec_disp: str):
+        s = self._sec_ids.get(sec_disp)
+        return self.sec_id == s if s is not None else self.mask()
+
+    def tier_index(self):
+        """The store's TierIndex, built on first use and kept up to date by every write after that."""
+        if self._tiers is None:
+            self._tiers = TierIndex(self)
+        return self._tiers
+
+    def avail_index(self):
+        """The store's AvailIndex, built on first use and kept up to date by every write after that."""
+        if self._avail is None:
+            self._avail = AvailIndex(self)
+        return self._avail
+
+# ─────────── tier index ───────────
+
+NOT_AV = -1  # tier key of rows that aren't AV
+
+def _tier_keys(store, rows):
+    """Tier key (sec_id << 32 | price_id) of each row, NOT_AV for rows that aren't AV."""
+    keys = (store.sec_id[rows].astype(np.int64) << 32) | store.price_id[rows]
+    return np.where(store.status[rows] == ST_AV, keys, NOT_AV)
+
+def _by_key(keys, rows):
+    """(key, its rows in ascending order) for each distinct key."""
+    if not len(keys):
+        return
+    order = np.lexsort((rows, keys))
+    keys, rows = keys[order], rows[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    for a, b in zip(starts.tolist(), np.r_[starts[1:], len(keys)].tolist()):
+        yield int(keys[a]), rows[a:b]
+
+class TierIndex:
+    """Price tiers of the AV seats: (display section, price text) -> sorted store rows.
+
+    Built once per store with one sweep, then maintained by SeatStore.touched():
+    only the rows a write touched are moved between tiers. Member arrays are
+    replaced, never changed in place, so arrays handed out stay valid.
+    """
+
+    def __init__(self, store):
+        rows = np.arange(len(store), dtype=np.int64)
+        self.tier_of = _tier_keys(store, rows)  # store row -> tier key
+        self.members = {key: part for key, part in _by_key(self.tier_of, rows) if key != NOT_AV}
+
+    def __len__(self):
+        """AV seats."""
+        return sum(len(part) for part in self.members.values())
+
+    def update(self, store, rows):
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        new = _tier_keys(store, rows)
+        old = self.tier_of[rows]
+        moved = new != old
+        if not moved.any():
+            return
+        rows, old, new = rows[moved], old[moved], new[moved]
+        self.tier_of[rows] = new
+        members = self.members
+        for key, part in _by_key(old, rows):
+            if key == NOT_AV:
+                continue
+            left = np.setdiff1d(members[key], part, assume_unique=True)
+            if len(left):
+                members[key] = left
+            else:
+                del members[key]
+        for key, part in _by_key(new, rows):
+            if key != NOT_AV:
+                cur = members.get(key)
+                members[key] = part if cur is None else np.union1d(cur, part)
+
+    def rows(self, store, sec_disp: str, price: str):
+        """Store rows of one tier (price "∅": no price), empty if there is no such tier."""
+        s = store._sec_ids.get(sec_disp)
+        q = store._price_ids.get("" if price == "∅" else price)
+        if s is None or q is None:
+            return np.zeros(0, dtype=np.int64)
+        return self.members.get((s << 32) | q, np.zeros(0, dtype=np.int64))
+
+    def views(self, store):
+        """{(sec_disp, price text or "∅"): store rows} of every tier."""
+        return {
+            (store.sec_disp[key >> 32], store.prices[key & 0xFFFFFFFF] or "∅"): part
+            for key, part in self.members.items()
+        }
+
+# ─────────── availability index ───────────
+
+_NO_RUNS = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+def _av_runs(store, a, b, row_of):
+    """(first, last) store rows of every run of AV seats with consecutive numbers in store rows a..b-1.
+
+    Runs end at seat-row and display-section boundaries.
+    """
+    av = np.flatnonzero(store.status[a:b] == ST_AV) + a
+    if not len(av):
+        return _NO_RUNS
+    num, sec, row = store.num[av], store.sec_id[av], row_of[av]
+    brk = np.ones(len(av), dtype=bool)
+    brk[1:] = (num[1:] != num[:-1] + 1) | (sec[1:] != sec[:-1]) | (row[1:] != row[:-1])
+    starts = np.flatnonzero(brk)
+    return av[starts], av[np.r_[starts[1:], len(av)] - 1]
+
+class AvailIndex:
+    """Runs of AV seats per seat row ((sec_low, pref) row key), rows in listing order.
+
+    A run is a stretch of AV seats with consecutive numbers, kept as (first,
+    last) store rows. Built once per store with one sweep, then maintained by
+    SeatStore.touched(): only the seat rows a write touched are swept again.
+    ``order`` lists the seat rows as the editor lists them (section, then
+    row_order_key), and ``rank`` / ``size`` place each row within its section.
+    """
+
+    def __init__(self, store):
+        keys = store.row_keys
+        n = len(keys)
+        self.start = np.array([store._row_start[k] for k in keys] + [len(store)], dtype=np.int64)
+        self.row_of = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.start))  # store row -> seat row
+        self.order = sorted(range(n), key=lambda r: (keys[r][0], row_order_key(keys[r][1])))
+        self.sections = []                          # sec_low, listing order
+        self.sec = np.empty(n, dtype=np.int64)      # seat row -> index in sections
+        self.rank = np.empty(n, dtype=np.int64)     # seat row -> position among its section's rows
+        self.size = np.empty(n, dtype=np.int64)     # seat row -> rows in its section
+        self.pos = np.empty(n, dtype=np.int64)      # seat row -> position in order
+        first = 0
+        for i, r in enumerate(self.order):
+            if not self.sections or keys[r][0] != self.sections[-1]:
+                self.size[self.order[first:i]] = i - first
+                first = i
+                self.sections.append(keys[r][0])
+            self.sec[r] = len(self.sections) - 1
+            self.rank[r] = i - first
+            self.pos[r] = i
+        self.size[self.order[first:]] = n - first
+        self.runs = [_NO_RUNS] * n                  # seat row -> (first rows, last rows)
+        self.longest = np.zeros(n, dtype=np.int64)  # seat row -> longest run
+        self.count = np.zeros(n, dtype=np.int64)    # seat row -> AV seats
+        self._sweep(store, 0, n)
+
+    def __len__(self):
+        """AV seats."""
+        return int(self.count.sum())
+
+    def _sweep(self, store, r0, r1):
+        """Recompute the runs of seat rows r0..r1-1."""
+        first, last = _av_runs(store, self.start[r0], self.start[r1], self.row_of)
+        row = self.row_of[first]
+        bounds = np.searchsorted(row, np.arange(r0, r1 + 1)).tolist()
+        for r, i, j in zip(range(r0, r1), bounds[:-1], bounds[1:]):
+            self.runs[r] = (first[i:j], last[i:j]) if j > i else _NO_RUNS
+        length = last - first + 1
+        self.longest[r0:r1] = 0
+        np.maximum.at(self.longest, row, length)
+        self.count[r0:r1] = np.bincount(row - r0, weights=length, minlength=r1 - r0).astype(np.int64)
+
+    def update(self, store, rows):
+        touched = np.unique(self.row_of[np.asarray(rows, dtype=np.int64)])
+        if len(touched) > 32:
+            self._sweep(store, int(touched[0]), int(touched[-1]) + 1)
+        else:
+            for r in touched.tolist():
+                self._sweep(store, r, r + 1)
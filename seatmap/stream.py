@@ -0,0 +1,192 @@
+"""Streaming ingestion for very large seat maps.
+
+load_stream() reads the top-level object one section at a time and keeps only
+what the editor reads or writes, in the map's own shape:
+
+    {section_key: {section fields, "rows": {row_key: {"price", "seats": {seat_key: {seat fields}}}}}}
+
+Every engine function works on this skeleton unchanged. The keys double as the
+position of each seat in the source, so iter_merged() can stream the original
+file back out section by section with the skeleton's values laid over it.
+Peak memory is the skeleton plus one section of the source.
+"""
+import codecs, io, json, os, re
+
+from .instrument import stage
+from .journal import MISSING, ObjChange
+from .labels import norm_section_name
+
+SECTION_FIELDS = ("section_name", "type")
+ROW_FIELDS = ("price",)
+SEAT_FIELDS = ("number", "label", "notes", "status", "price")
+
+CHUNK_SIZE = 1 << 20
+
+_WS_RX = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+class _Reader:
+    """Text buffer over a byte stream that refills (doubling) until a JSON value fits."""
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.text, self.pos, self.eof = "", 0, False
+
+    def more(self) -> bool:
+        if self.eof:
+            return False
+        data = self.fp.read(max(self.chunk_size, len(self.text) - self.pos))
+        text = data if isinstance(data, str) else self.decoder.decode(data, final=not data)
+        self.text = self.text[self.pos:] + text
+        self.pos = 0
+        self.eof = not data
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WS_RX.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or not self.more():
+                return self.text[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Expecting one of {chars!r} at offset {self.pos} of the buffered text, got {ch!r}")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                v, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.more():
+                    continue
+                raise
+            if end == len(self.text) and self.more():
+                continue  # a number may carry on into the next chunk
+            self.pos = end
+            return v
+
+def _open(source):
+    """Binary file object for a path, bytes or an already open (seekable) file."""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "rb")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+def iter_members(fp, chunk_size=CHUNK_SIZE):
+    """(key, value) pairs of the top-level JSON object, decoding one member at a time."""
+    r = _Reader(fp, chunk_size)
+    if r.peek() != "{":
+        raise ValueError("Seat map JSON must be an object at the top level")
+    r.pos += 1
+    if r.peek() == "}":
+        r.pos += 1
+    else:
+        while True:
+            key = r.value()
+            r.expect(":")
+            yield key, r.value()
+            if r.expect(",}") == "}":
+                break
+    if r.peek():
+        raise ValueError("Extra data after the seat map object")
+
+# ──────────────── skeleton ────────────────
+
+def _pick(obj, fields):
+    return {k: obj[k] for k in fields if k in obj}
+
+def compact_section(sec):
+    """The fields of one section the engine uses (non-dicts are kept as they are)."""
+    if not isinstance(sec, dict):
+        return sec
+    out = _pick(sec, SECTION_FIELDS)
+    if sec.get("type", "def") == "aoi" or "rows" not in sec:
+        return out
+    rows = sec["rows"]
+    if not isinstance(rows, dict):
+        out["rows"] = rows
+        return out
+    out["rows"] = crows = {}
+    for row_key, row in rows.items():
+        if not isinstance(row, dict):
+            crows[row_key] = row
+            continue
+        crow = crows[row_key] = _pick(row, ROW_FIELDS)
+        if "seats" in row:
+            seats = row["seats"]
+            crow["seats"] = (
+                {k: _pick(seat, SEAT_FIELDS) if isinstance(seat, dict) else seat for k, seat in seats.items()}
+                if isinstance(seats, dict) else seats
+            )
+    return out
+
+@stage("load")
+def load_stream(source, journal=None, chunk_size=CHUNK_SIZE):
+    """Streaming load_map: a compact skeleton of the map, section names normalised."""
+    fp = _open(source)
+    seat_data = {}
+    renamed = ObjChange("section_name")
+    try:
+        for key, sec in iter_members(fp, chunk_size):
+            sec = seat_data[key] = compact_section(sec)
+            if isinstance(sec, dict) and "section_name" in sec:
+                old = sec["section_name"]
+                sec["section_name"] = norm_section_name(old)
+                if sec["section_name"] != old:
+                    renamed.add(sec, old, sec["section_name"])
+    finally:
+        if fp is not source:
+            fp.close()
+    if journal is not None:
+        journal.record_base(renamed)
+    return seat_data
+
+# ──────────────── write-back ────────────────
+
+def _overlay(dst, src, fields):
+    for f in fields:
+        v = src.get(f, MISSING)
+        if v is MISSING:
+            dst.pop(f, None)
+        else:
+            dst[f] = v
+
+def merge_section(sec, skel):
+    """Lay the skeleton's values over one decoded source section (in place)."""
+    if not isinstance(sec, dict) or not isinstance(skel, dict):
+        return sec if skel is MISSING else skel
+    _overlay(sec, skel, SECTION_FIELDS)
+    rows, crows = sec.get("rows"), skel.get("rows")
+    if not isinstance(rows, dict) or not isinstance(crows, dict):
+        return sec
+    for row_key, crow in crows.items():
+        row = rows.get(row_key)
+        if not isinstance(row, dict) or not isinstance(crow, dict):
+            continue
+        _overlay(row, crow, ROW_FIELDS)
+        seats, cseats = row.get("seats"), crow.get("seats")
+        if not isinstance(seats, dict) or not isinstance(cseats, dict):
+            continue
+        for seat_key, cseat in cseats.items():
+            seat = seats.get(seat_key)
+            if isinstance(seat, dict) and isinstance(cseat, dict):
+                _overlay(seat, cseat, SEAT_FIELDS)
+    return sec
+
+def iter_merged(source, seat_data, chunk_size=CHUNK_SIZE):
+    """(key, full section) pairs: the source re-read with the skeleton's edits applied."""
+    fp = _open(source)
+    try:
+        for key, sec in iter_members(fp, chunk_size):
+            yield key, merge_section(sec, seat_data.get(key, MISSING))
+    finally:
+        if fp is not source:
+            fp.close()
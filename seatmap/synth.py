@@ -0,0 +1,111 @@
+"""Synthetic venues: realistic seat map JSON of any size, for benchmarks.
+
+Maps use the shapes the editor meets in real files: named sections (with the
+odd stray whitespace), "aoi" sections, lettered rows ("A12") and "ROW 3 - 12"
+/ "Row 03-12" rows, bracketed labels, block words in number/label/notes, and
+prices as strings, numbers, blanks, None and junk.
+"""
+import random
+
+SECTION_NAMES = [
+    "Stalls", "Dress Circle", "Upper Circle", "Grand Circle", "Royal Circle",
+    "Balcony", "Gallery", "Rausing Circle", "Lower Tier", "Upper Tier",
+]
+AOI_NAMES = ["Stage", "Sound Desk", "Orchestra Pit", "Bar"]
+ROW_STYLES = ("letter", "row", "row0")
+STATUSES = ["av"] * 6 + ["AV", "uav", "uav", "UAV", "res"]
+PRICES = ["45", "45.00", "60", "62.5", "75", "90", 55, 80.0, "", None, "TBC"]
+BRACKETS = ["(restricted view)", "(aisle)", "(limited legroom)", "(wheelchair)"]
+BLOCKED = [("label", "Pillar"), ("label", "Space"), ("notes", "wheelchair space"),
+           ("number", "Aisle"), ("label", "Not for sale")]
+
+def row_letters(i: int) -> str:
+    """A..Z, AA..AZ, BA.. (spreadsheet-style)."""
+    s = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+def section_name(i: int) -> str:
+    base = SECTION_NAMES[i % len(SECTION_NAMES)]
+    return base if i < len(SECTION_NAMES) else f"{base} {i // len(SECTION_NAMES) + 1}"
+
+def seat_number(style: str, row: int, n: int) -> str:
+    if style == "letter":
+        return f"{row_letters(row)}{n}"
+    if style == "row":
+        return f"ROW {row + 1} - {n}"
+    return f"Row {row + 1:02d}-{n}"
+
+def generate_venue(n_seats: int, seed: int = 0, seats_per_row=(12, 40), rows_per_section=(8, 30)):
+    """A seat map dict with about ``n_seats`` seats (exactly, when n_seats >= the smallest row)."""
+    rnd = random.Random(seed)
+    seat_data = {}
+    made = sec_no = 0
+    while made < n_seats:
+        name = section_name(sec_no)
+        if rnd.random() < 0.1:
+            name = f" {name.replace(' ', '  ')} "  # normalised on load
+        style = ROW_STYLES[sec_no % len(ROW_STYLES)]
+        rows = {}
+        for r in range(rnd.randint(*rows_per_section)):
+            width = min(rnd.randint(*seats_per_row), n_seats - made)
+            if width <= 0:
+                break
+            row_price = rnd.choice(["0", "45", None])
+            seats = {}
+            for n in range(1, width + 1):
+                number = seat_number(style, r, n)
+                if rnd.random() < 0.03:
+                    number = f"{number} {rnd.choice(BRACKETS)}"
+                seat = {
+                    "number": number,
+                    "status": rnd.choice(STATUSES),
+                    "price": rnd.choice(PRICES),
+                    "x": round(n * 1.5, 1),
+                    "y": round(r * 2.0, 1),
+                }
+                if rnd.random() < 0.02:
+                    field, word = rnd.choice(BLOCKED)
+                    seat[field] = word if field != "number" else f"{word} {n}"
+                if rnd.random() < 0.01:
+                    del seat["price"]
+                seats[f"{sec_no}-{r}-{n}"] = seat
+            made += width
+            rows[f"row-{r}"] = {"price": row_price, "seats": seats}
+        seat_data[f"section-{sec_no}"] = {"section_name": name, "type": "def", "rows": rows}
+        if sec_no % 7 == 3:
+            aoi = AOI_NAMES[(sec_no // 7) % len(AOI_NAMES)]
+            seat_data[f"aoi-{sec_no}"] = {"section_name": aoi, "type": "aoi"}
+        sec_no += 1
+    return seat_data
+
+def generate_plan(seat_data, groups: int = 8, chunks: int = 12, seed: int = 0):
+    """A multi-price spec of ``groups`` groups, each listing ``chunks`` ranges from real rows."""
+    rnd = random.Random(seed)
+    rows = []  # (section name, style, row number, width)
+    for sec in seat_data.values():
+        if not isinstance(sec, dict) or sec.get("type") == "aoi":
+            continue
+        name = " ".join(sec["section_name"].split())
+        for row in sec.get("rows", {}).values():
+            seats = list(row["seats"].values())
+            first = seats[0]["number"] if seats else ""
+            rows.append((name, first, len(seats)))
+    out = []
+    for g in range(groups):
+        parts = []
+        for _ in range(chunks):
+            name, first, width = rnd.choice(rows)
+            lo = rnd.randint(1, max(1, width // 2))
+            hi = rnd.randint(lo, width)
+            head = first.split(" (")[0]
+            if head.upper().startswith("ROW "):
+                row_no = head.split("-")[0].split()[1]
+                parts.append(f"{name} ROW {int(row_no)} - {lo}-{hi}")
+            else:
+                parts.append(f"{name} {head.rstrip('0123456789')}{lo}-{hi}")
+        out.append({"range": ", ".join(parts), "price": str(40 + 5 * g)})
+    return {"groups": out, "price_only": False}
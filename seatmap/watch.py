@@ -0,0 +1,267 @@
+"""Watch-folder daemon: apply a stored plan to seat maps as they arrive.
+
+    python -m seatmap watch incoming/ --spec plan.json -o published/ -j 4
+
+A scanner polls the directory (no extra dependency) and queues every file
+that is new or changed and has settled, meaning it hasn't been modified for
+``settle`` seconds, so half-written drops are left alone. The queue is
+bounded: when the workers fall behind, the scanner blocks instead of piling
+up work (back-pressure). Workers run cli.process_file(), in a process pool
+when there is more than one. A file whose content hash matches the version
+last processed is skipped, so a touch or a re-drop of the same file costs a
+hash. A file that fails, even by killing its worker process, is reported
+with "ok": false and the workers carry on (a broken pool is replaced).
+
+Every file handled appends a line to <out>/watch-report.jsonl. The line holds
+the plan summary (seats made AV, tier and rule changes, missing seats, …)
+and the latencies: queue wait (detected → started), processing, and the
+seconds per pipeline stage. Content hashes are kept in
+<out>/watch-state.json, so a restart doesn't redo files already published.
+"""
+import fnmatch, hashlib, json, os, queue, sys, threading, time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import cli
+from .cache import IndexCache
+
+REPORT_NAME = "watch-report.jsonl"
+STATE_NAME = "watch-state.json"
+
+def content_hash(path) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def stage_seconds(records):
+    """{stage: seconds} of the top-level stages in a trace (see instrument.py)."""
+    out = {}
+    for r in records:
+        if r["depth"] == 0:
+            out[r["stage"]] = round(out.get(r["stage"], 0.0) + r["seconds"], 6)
+    return out
+
+def percentiles(values, points=(50, 95)):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    out = {f"p{p}": round(ordered[min(len(ordered) - 1, len(ordered) * p // 100)], 4) for p in points}
+    out["max"] = round(ordered[-1], 4)
+    return out
+
+class Watcher:
+    """Scanner + bounded queue + workers for one watched directory."""
+
+    def __init__(self, directory, plan, out_dir, workers=4, queue_size=16, settle=1.0, interval=1.0,
+                 fmt="pretty", pattern="*.json", cache=None, log=None):
+        if os.path.abspath(out_dir) == os.path.abspath(directory):
+            raise ValueError("the output directory must not be the watched directory")
+        self.directory = directory
+        self.plan = plan
+        self.out_dir = out_dir
+        self.workers = max(1, workers or 1)
+        self.settle = settle
+        self.interval = interval
+        self.fmt = fmt
+        self.pattern = pattern
+        self.cache = cache
+        self.log = log or (lambda line: print(line, flush=True))
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.seen = {}        # path -> (mtime_ns, size) when last queued
+        self.pending = set()  # queued or being processed
+        self.counts = {"processed": 0, "skipped": 0, "failed": 0}
+        self.waits, self.runs = [], []  # seconds: queue wait / processing, per processed file
+        self.pool = None  # process pool when workers > 1, replaced if it breaks
+        os.makedirs(out_dir, exist_ok=True)
+        self.state_path = os.path.join(out_dir, STATE_NAME)
+        self.report_path = os.path.join(out_dir, REPORT_NAME)
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                self.hashes = json.load(f)  # file name -> content hash last processed
+        except (OSError, ValueError):
+            self.hashes = {}
+
+    # ─────────── scanner ───────────
+
+    def scan(self) -> int:
+        """Queue the new, changed and settled files. Blocks while the queue is full. Returns files queued."""
+        now = time.time()
+        try:
+            entries = sorted(os.scandir(self.directory), key=lambda e: e.name)
+        except OSError as e:
+            self.log(f"scan failed: {e}")
+            return 0
+        names = {e.path for e in entries}
+        for path in [p for p in self.seen if p not in names]:
+            del self.seen[path]  # removed: a file dropped again under this name is new
+        queued = 0
+        for entry in entries:
+            if not entry.is_file() or not fnmatch.fnmatch(entry.name, self.pattern):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue  # removed since listing
+            sig = (st.st_mtime_ns, st.st_size)
+            if now - st.st_mtime < self.settle or self.seen.get(entry.path) == sig:
+                continue
+            with self.lock:
+                if entry.path in self.pending:
+                    continue  # picked up again once this round is done
+                self.pending.add(entry.path)
+            self.seen[entry.path] = sig
+            if not self._put((entry.path, time.perf_counter())):
+                return queued
+            queued += 1
+        return queued
+
+    def _put(self, item) -> bool:
+        while not self.stopping.is_set():
+            try:
+                self.queue.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue  # back-pressure: wait for a worker
+        return False
+
+    # ─────────── workers ───────────
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, queued_at = item
+            started = time.perf_counter()
+            try:
+                self._handle(path, queued_at, started)
+            except Exception as e:  # e.g. a broken process pool: report the file, keep the worker
+                try:
+                    self._report({"file": path, "ok": False, "error": f"{type(e).__name__}: {e}"}, queued_at, started)
+                except Exception as e2:
+                    self.log(f"FAIL {path}: {type(e).__name__}: {e} (and reporting it: {e2})")
+            finally:
+                with self.lock:
+                    self.pending.discard(path)
+
+    def _handle(self, path, queued_at, started):
+        name = os.path.basename(path)
+        try:
+            digest = content_hash(path)
+        except OSError as e:
+            return self._report({"file": path, "ok": False, "error": f"{type(e).__name__}: {e}"}, queued_at, started)
+        if self.hashes.get(name) == digest:
+            with self.lock:
+                self.counts["skipped"] += 1
+            return
+        args = (path, self.plan, self.out_dir, self.fmt, False, True, self.cache)
+        res = self._process(args) if self.workers > 1 else cli.process_file(*args)
+        if res["ok"]:
+            with self.lock:
+                self.hashes[name] = digest
+                self._save_state()
+        self._report(res, queued_at, started)
+
+    def _process(self, args):
+        """cli.process_file(*args) in the pool; a broken pool (e.g. a worker killed) is replaced for the next file."""
+        with self.lock:
+            pool = self.pool
+        try:
+            return pool.submit(cli.process_file, *args).result()
+        except BrokenProcessPool:
+            with self.lock:
+                if self.pool is pool:
+                    self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            pool.shutdown(wait=False)
+            raise
+
+    def _report(self, res, queued_at, started):
+        done = time.perf_counter()
+        res["stages"] = stage_seconds(res.pop("stages", []))
+        res["queue_wait"] = round(started - queued_at, 4)
+        res["processing"] = round(done - started, 4)
+        unwritten = None
+        with self.lock:
+            self.counts["processed" if res["ok"] else "failed"] += 1
+            self.waits.append(res["queue_wait"])
+            self.runs.append(res["processing"])
+            try:
+                with open(self.report_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(res) + "\n")
+            except OSError as e:
+                unwritten = e
+        line = cli.format_result(res) if "seconds" in res else f"FAIL {res['file']}: {res['error']}"
+        self.log(f"{line}  wait={res['queue_wait']:.2f}s" if res["ok"] else line)
+        if unwritten is not None:
+            self.log(f"  not written to {REPORT_NAME}: {unwritten}")
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.hashes, f)
+        os.replace(tmp, self.state_path)
+
+    # ─────────── running ───────────
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.counts,
+                "queued": self.queue.qsize(),
+                "queue_wait": percentiles(self.waits),
+                "processing": percentiles(self.runs),
+            }
+
+    def run(self, once=False):
+        """Scan every ``interval`` seconds until stop() (or, with ``once``, until the first scan is done)."""
+        self.pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        try:
+            while not self.stopping.is_set():
+                self.scan()
+                if once:
+                    break
+                self.stopping.wait(self.interval)
+        finally:
+            for _ in threads:
+                self.queue.put(None)  # after the queued files: workers finish what was accepted
+            for t in threads:
+                t.join()
+            if self.pool is not None:
+                self.pool.shutdown()
+        return self.stats()
+
+    def stop(self):
+        self.stopping.set()
+
+def cmd_watch(args) -> int:
+    with open(args.spec, encoding="utf-8") as f:
+        plan = json.load(f)
+    if args.price_only:
+        plan["price_only"] = True
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as f:
+            plan["rules"] = f.read()
+    try:
+        watcher = Watcher(
+            args.directory, plan, args.out_dir, args.workers, args.queue, args.settle, args.interval,
+            args.format, args.pattern, IndexCache() if args.index_cache else None
+        )
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"Watching {args.directory} → {args.out_dir} ({watcher.workers} workers, queue {args.queue})",
+          file=sys.stderr)
+    try:
+        stats = watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        watcher.stop()
+        stats = watcher.stats()
+    print(f"Stopped: {json.dumps(stats)}", file=sys.stderr)
+    return 1 if stats["failed"] else 0
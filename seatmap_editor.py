@@ -1,6 +1,7 @@
 import streamlit as st
-import json, re, itertools
-from collections import defaultdict, Counter
+import hashlib, copy, itertools
+
+from seatmap import cache, engine, instrument
 
 st.title("🎭 Seat Map Availability Editor")
 
@@ -9,246 +10,240 @@ uploaded_file = st.file_uploader("Upload your seat map JSON file", type=["json"]
 # ---- global UI controls ----
 multi_price_mode = st.checkbox("💰 Enable multiple price groups (any number you like)")
 price_only_mode = st.checkbox("💸 Only update seat prices (leave availability unchanged)")
+streaming_load = st.checkbox(
+    "🌊 Streaming load for very large files (keeps only seat fields in memory)",
+    help="Sections are parsed one at a time; the download re-reads the upload and merges the edits in."
+)
+layout_cache = st.checkbox(
+    "💾 Remember venue layouts on disk",
+    help="Opening another performance of a venue you've loaded before skips label parsing "
+         "(the first open of a venue is a little slower; see `seatmap bench --index-cache`)."
+)
+
+with st.expander("🚫 Blocked label words (per venue)"):
+    block_words_text = st.text_area(
+        "Seats whose number, label or notes contain any of these are never put on sale",
+        value=", ".join(engine.BLOCK_WORDS),
+        height=100
+    )
+block_words = tuple(w.strip() for w in block_words_text.split(",") if w.strip())
+
+DOWNLOAD_FORMATS = {
+    "Pretty JSON": "pretty",
+    "Compact JSON": "compact",
+    "Gzip JSON (.json.gz)": "gzip",
+    "JSON Patch (changed seats only)": "patch",
+}
+download_format = DOWNLOAD_FORMATS[st.selectbox("⬇️ Download format", list(DOWNLOAD_FORMATS))]
+
+with st.expander("🩺 Diagnostics"):
+    diag_enabled = st.checkbox("Record per-stage timings for each run (shown at the bottom)")
+    diag_memory = st.checkbox("Also record allocations (tracemalloc, makes runs slower)", disabled=not diag_enabled)
+
+# Stage recorder for this script run; the wrapped engine functions are near-free while it is off
+diag = instrument.Recorder(memory=diag_memory) if diag_enabled else None
+diag_token = instrument.start(diag)
 
 # ───────────────── helper functions ─────────────────
 
-BRACKET_RX = re.compile(r"(\([^)]*\))")
-
-BLOCK_WORDS = [
-    "pillar", "pillars",
-    "space", "spaces",
-    "blank", "blanks",
-    "aisle", "aisles",
-    "gap", "gaps",
-    "void",
-    "blocked",
-    "not for sale",
-    "no seat",
-    "not a seat",
-    "wheelchair space",
-    "companion space",
-]
-
-def strip_brackets(s: str) -> str:
-    return BRACKET_RX.sub("", s or "").strip()
-
-def is_blocked_label(seat: dict) -> bool:
-    """Identify seats/items that should never be on sale."""
-    raw = seat.get("number", "") or ""
-    label = seat.get("label", "") or ""
-    notes = seat.get("notes", "") or ""
-    text = strip_brackets(f"{raw} {label} {notes}".strip()).lower()
-
-    return any(word in text for word in BLOCK_WORDS)
-
-def compress_ranges(nums):
-    nums = sorted(set(nums))
-    out = []
-    for _, g in itertools.groupby(enumerate(nums), lambda x: x[1] - x[0]):
-        block = list(g)
-        s, e = block[0][1], block[-1][1]
-        out.append((s, e))
-    return out
-
-def row_order_key(pref: str):
-    m = re.fullmatch(r"row(\d+)", pref)
-    if m:
-        return (0, -int(m.group(1)))
-    return (1, pref.upper())
-
-def display_prefix(pref: str) -> str:
-    if pref.startswith("row"):
-        m = re.match(r"row(\d+)$", pref)
-        if m:
-            return f"ROW {m.group(1)} - "
-    return pref.upper()
-
-def norm_label(s: str) -> str:
-    s = strip_brackets(s or "")
-    s = s.replace("–", "-").replace("—", "-")
-    s = s.replace("\u00a0", " ").replace("\u202f", " ")
-    s = s.lower().replace("seat", "")
-    s = re.sub(r"\s*-\s*", "-", s)
-    s = re.sub(r"\s+", "", s)
-    s = re.sub(r"row0?(\d+)", r"row\1", s)
-    return s
-
-def split_norm_label(norm: str):
-    norm = norm.replace("seat", "")
-    m = re.match(r"(row\d+)-?(\d+)$", norm)
-    if m:
-        return m.group(1), int(m.group(2))
-    m = re.match(r"([a-z][a-z\-]{0,19})(\d+)$", norm)
-    if m:
-        return m.group(1), int(m.group(2))
-    return None
-
-def section_names_from_data(seat_data):
-    names = []
-    for sec in seat_data.values():
-        if isinstance(sec, dict) and sec.get("section_name") and sec.get("type", "def") != "aoi":
-            names.append(re.sub(r"\s+", " ", sec["section_name"].strip()))
-    return names
-
-# Parse ranges (prices provided by fields, no inline @price)
-# Returns: set[(sec_low,pref,num)]
-def parse_ranges(user_text: str, section_names):
-    requested = set()
-    if not user_text:
-        return requested
-
-    canon_sections = {s.lower(): s for s in section_names if s}
-    chunks = [c.strip() for c in re.split(r"\s*,\s*", user_text) if c.strip()]
-
-    rx = re.compile(
-        r"(?:(row)\s*(\d+)\s*(?:-|–)?\s*(\d+)\s*(?:to|–|-)\s*(\d+))"
-        r"|(?:(row)\s*(\d+)\s*(?:-|–)?\s*(\d+))"
-        r"|([a-z][a-z\-]{0,19})\s*(\d+)\s*(?:\s*(?:to|–|-)\s*(\d+))?",
-        re.I
+def refresh_views(work, stats=None):
+    """Recompute the status-dependent views of a working copy after it was edited."""
+    _, work["available_count"], work["tiers"] = engine.status_views(work["store"], stats, lines=False)
+    work["av_text"] = None  # copy/paste text, built when first shown (av_text)
+
+def av_text(work):
+    if work["av_text"] is None:
+        work["av_text"] = ", ".join(engine.iter_av_lines(work["store"]))
+    return work["av_text"]
+
+PAGE_SIZE = 300
+
+def page_bounds(total: int, key: str):
+    """(start, stop) of the page picked in a pager (only shown when there is more than one page)."""
+    pages = -(-total // PAGE_SIZE)
+    page = 1
+    if pages > 1:
+        page = st.number_input(
+            f"Page (of {pages}, {PAGE_SIZE} per page)", min_value=1, max_value=pages, value=1, step=1, key=key
+        )
+    start = (int(page) - 1) * PAGE_SIZE
+    return start, min(total, start + PAGE_SIZE)
+
+def show_last_apply(work):
+    """The lists from the last Go, a page at a time. Kept in the working copy so the pagers survive reruns."""
+    last = work["last_apply"]
+    store = work["store"]
+    n = last["n"]
+
+    if not last["price_only"]:
+        matched = last["matched"]
+        if len(matched):
+            st.markdown("### ✅ Availability Updated")
+            start, stop = page_bounds(len(matched), f"page_matched_{n}")
+            st.write(", ".join(engine.seat_names(store, matched[start:stop])))
+
+        missing, missing_rows = last["missing"]
+        n_missing = engine.missing_count(missing, missing_rows)
+        if n_missing:
+            start, stop = page_bounds(n_missing, f"page_missing_{n}")
+            shown = itertools.islice(engine.iter_missing(missing, missing_rows, work["section_names"]), start, stop)
+            more = f" ({start + 1}–{stop} of {n_missing})" if n_missing > PAGE_SIZE else ""
+            st.warning("⚠️ Seats not found" + more + ": " + ", ".join(shown))
+
+    updated = last["updated"]
+    if len(updated):
+        st.markdown("### 🎟️ Updated Seats")
+        start, stop = page_bounds(len(updated), f"page_updated_{n}")
+        st.dataframe(list(engine.seat_table(store, updated[start:stop])), use_container_width=True)
+
+    # Visibility check for seats below row price
+    mismatches = last["mismatches"]
+    if mismatches:
+        st.markdown("### 🔎 Seats priced below their row (expected, just for visibility)")
+        start, stop = page_bounds(len(mismatches), f"page_mismatches_{n}")
+        st.dataframe(list(engine.mismatch_table(mismatches[start:stop])), use_container_width=True)
+
+    st.markdown("### 📊 Seat Price Summary")
+    start, stop = page_bounds(len(store), f"page_prices_{n}")
+    st.dataframe(engine.price_sample(store, stop - start, start), use_container_width=True)
+
+def download_button(work, fmt, key=None):
+    """Download the working copy in the chosen format (the patch covers every change since upload)."""
+    suffix, mime = engine.FORMATS[fmt]
+    st.download_button(
+        "Download Updated JSON" if fmt != "patch" else "Download JSON Patch",
+        engine.export(work["seat_data"], fmt, work["store"], work["source"]),
+        file_name="updated_seatmap" + suffix,
+        mime=mime,
+        key=key
     )
 
-    for chunk in chunks:
-        sec_match = None
-        chunk_low = chunk.lower()
-
-        for low_name, canon in sorted(canon_sections.items(), key=lambda x: len(x[0]), reverse=True):
-            if chunk_low.startswith(low_name):
-                after = chunk_low[len(low_name):]
-                if after == "" or (after and after[0].isspace()):
-                    sec_match = (low_name, canon)
-                    break
-
-        if not sec_match:
-            continue
-
-        sec_low, sec_canon = sec_match
-        rest = chunk[len(sec_canon):].strip()
-
-        for m in rx.finditer(rest):
-            if m.group(1):
-                rownum = int(m.group(2))
-                a = int(m.group(3))
-                b = int(m.group(4))
-                lo, hi = sorted((a, b))
-                pref = f"row{rownum}"
-                for n in range(lo, hi + 1):
-                    requested.add((sec_low, pref, n))
-
-            elif m.group(5):
-                rownum = int(m.group(6))
-                n = int(m.group(7))
-                pref = f"row{rownum}"
-                requested.add((sec_low, pref, n))
-
-            else:
-                pref = m.group(8).lower()
-                a = int(m.group(9))
-                b = int(m.group(10) or m.group(9))
-                lo, hi = sorted((a, b))
-                for n in range(lo, hi + 1):
-                    requested.add((sec_low, pref, n))
-
-    return requested
-
-def set_row_price_to_max_only(seat_data):
-    """Set row['price'] to the highest numeric seat price found in that row. Never modifies seat prices."""
-    rows_updated = 0
-    for sec in seat_data.values():
-        if not isinstance(sec, dict) or sec.get("type") == "aoi":
-            continue
-        rows = sec.get("rows") or {}
-        for row in rows.values():
-            seats = row.get("seats") or {}
-            max_price = None
-            for seat in seats.values():
-                s = (str(seat.get("price")) if seat.get("price") is not None else "").strip()
-                if re.match(r"^\d+(?:\.\d+)?$", s):
-                    p = float(s)
-                    max_price = p if max_price is None else max(max_price, p)
-            if max_price is not None:
-                row["price"] = str(max_price)
-                rows_updated += 1
-    return rows_updated
+# ──────────────── load + index cache ────────────────
+# Keyed by a hash of the uploaded bytes so widget reruns never re-parse or re-index.
+# Entries are shared between sessions and must never be mutated; edits go to the
+# per-session working copy made by working_copy(). A new upload of a venue seen
+# before takes its index from the on-disk layout cache (seatmap/cache.py).
+
+@st.cache_resource(max_entries=8, show_spinner="Indexing seat map…")
+def load_and_index(digest: str, block_words: tuple, streaming: bool, layout_cache: bool, _raw: bytes):
+    stats = engine.PassStats()
+    journal = engine.Journal()  # load-time normalisation, so patches apply to the uploaded file
+    if streaming:
+        seat_data = engine.load_stream(_raw, journal)
+    else:
+        seat_data = engine.load_map(_raw, journal)
+    duplicates = []
+    seat_index, per_section_counts, row_index = cache.cached_index(
+        seat_data, stats, engine.block_matcher(block_words), journal,
+        cache.IndexCache() if layout_cache else None, duplicates=duplicates, source=_raw
+    )
+    section_names = engine.section_names_from_data(seat_data)
+    entry = {
+        "seat_data": seat_data,
+        "seat_index": seat_index,
+        "row_index": row_index,
+        "store": engine.build_store(row_index, stats, journal),
+        "per_section_counts": dict(per_section_counts),
+        "section_names": section_names,
+        "duplicate_seats": engine.duplicate_report(duplicates, section_names),
+        "load_stats": stats,
+        "source": _raw if streaming else None,  # streamed skeletons are merged back into this
+    }
+    refresh_views(entry, stats)
+    return entry
+
+def working_copy(digest: str, raw: bytes, block_words: tuple, streaming: bool, layout_cache: bool, reset: bool = False):
+    """Per-session editable copy of the cached entry (seat refs stay consistent)."""
+    work = st.session_state.get("seatmap_work")
+    key = (digest, block_words, streaming, layout_cache)
+    if reset or work is None or work["key"] != key:
+        # deepcopy with a shared memo keeps seat_index/tiers pointing into the copied map
+        work = copy.deepcopy(load_and_index(digest, block_words, streaming, layout_cache, raw))
+        work["key"] = key
+        st.session_state["seatmap_work"] = work
+    return work
 
 # ──────────────── main UI logic ────────────────
 if uploaded_file:
     try:
-        seat_data = json.loads(uploaded_file.read().decode("utf-8"))
+        with instrument.span("upload"):
+            raw_bytes = uploaded_file.getvalue()
+            digest = hashlib.sha256(raw_bytes).hexdigest()
+        col_reset, col_undo, col_redo = st.columns(3)
+        reset_edits = col_reset.button("↩️ Reset edits to uploaded file")
+        undo_clicked = col_undo.button("↶ Undo")
+        redo_clicked = col_redo.button("↷ Redo")
+        with instrument.span("working_copy"):
+            work = working_copy(digest, raw_bytes, block_words, streaming_load, layout_cache, reset=reset_edits)
+
+        seat_data = work["seat_data"]
+        seat_index = work["seat_index"]
+        store = work["store"]
+        journal = store.journal
+        row_index = work["row_index"]
+        per_section_counts = work["per_section_counts"]
         st.success("✅ Seat map loaded successfully!")
 
-        # Normalise section names
-        for sec in seat_data.values():
-            if isinstance(sec, dict) and "section_name" in sec:
-                sec["section_name"] = re.sub(r"\s+", " ", sec["section_name"]).strip()
-
-        # Build seat index: (section_low, prefix, number) -> (seat_obj, display_section)
-        seat_index = {}
-        per_section_counts = defaultdict(int)
-
-        for sec in seat_data.values():
-            if not isinstance(sec, dict):
-                continue
-            if sec.get("type", "def") == "aoi":
-                continue
-
-            sec_disp = sec.get("section_name", "Unknown Section").strip()
-            sec_low = sec_disp.lower()
-            rows = sec.get("rows", {}) or {}
-
-            for row in rows.values():
-                seats = row.get("seats") or {}
-                for seat in seats.values():
-                    # Force blocked/non-seat items to unavailable up front
-                    if is_blocked_label(seat):
-                        seat["status"] = "uav"
-
-                    raw = seat.get("number", "")
-                    norm = norm_label(raw)
-                    split = split_norm_label(norm)
-                    if not split:
-                        continue
-
-                    pref, num = split
-                    key = (sec_low, pref, num)
-                    seat_index[key] = (seat, sec_disp)
-                    per_section_counts[sec_low] += 1
-
-        st.caption(f"Indexed seats: {len(seat_index)} across {len(per_section_counts)} sections.")
-
-        # Build copy/paste helper of current AV seats
-        row_map = defaultdict(list)
-        available_count = 0
-
-        for (sec_low, pref, num), (seat, sec_disp) in seat_index.items():
-            if (seat.get("status", "") or "").lower() == "av":
-                available_count += 1
-                row_map[(sec_disp, pref)].append(num)
-
-        out_lines = []
-        for (sec_disp, pref), nums in sorted(
-            row_map.items(),
-            key=lambda x: (x[0][0].lower(), row_order_key(x[0][1]))
-        ):
-            for s, e in compress_ranges(nums):
-                disp_pref = display_prefix(pref)
-                if s == e:
-                    out_lines.append(f"{sec_disp} {disp_pref}{s}")
-                else:
-                    out_lines.append(f"{sec_disp} {disp_pref}{s}-{e}")
+        st.caption(
+            f"Indexed seats: {len(seat_index)} across {len(per_section_counts)} sections. "
+            f"Load: {work['load_stats'].summary()}"
+        )
+        if work["duplicate_seats"]:
+            with st.expander(f"⚠️ Seat labels used by more than one seat: {len(work['duplicate_seats'])}"):
+                st.caption("Only the last seat with each label can be targeted by ranges and rules.")
+                st.text(", ".join(work["duplicate_seats"]))
+
+        # Undo / redo replay the change journal in place
+        if undo_clicked or redo_clicked:
+            op = store.undo() if undo_clicked else store.redo()
+            if op is None:
+                st.info("Nothing to " + ("undo." if undo_clicked else "redo."))
+            else:
+                work.pop("last_apply", None)
+                refresh_views(work)
+                st.success(f"{'↶ Undid' if undo_clicked else '↷ Redid'} {op.label} ({op.size} changes).")
+                download_button(work, download_format, key="download_after_undo")
+        if journal.undo_stack or journal.redo_stack:
+            st.caption(
+                f"Journal: {len(journal.undo_stack)} to undo, {len(journal.redo_stack)} to redo."
+            )
+
+        # Copy/paste helper of current AV seats (the text is only built when shown)
+        available_count = work["available_count"]
 
         st.markdown("### 🪑 Copy-Paste Friendly Available Seat Ranges")
-        if out_lines:
-            st.text_area(
-                "📋 Paste this into 'Seat ranges' inputs below:",
-                value=", ".join(out_lines),
-                height=200
-            )
+        if available_count:
+            if st.checkbox("Show available seat ranges", key="show_av_text"):
+                st.text_area(
+                    "📋 Paste this into 'Seat ranges' inputs below:",
+                    value=av_text(work),
+                    height=200
+                )
             st.info(f"ℹ️ Total currently available seats in the list: **{available_count}**")
+
+            with st.expander("🎯 Find seats together (best available)"):
+                c1, c2, c3 = st.columns(3)
+                best_n = c1.number_input("Seats together", min_value=1, max_value=100, value=2, step=1, key="best_n")
+                best_section = c2.selectbox(
+                    "Section", ["All sections"] + sorted(work["section_names"], key=str.lower), key="best_section"
+                )
+                best_prefer = c3.selectbox("Rows first", engine.PREFER, key="best_prefer")
+                best_through = st.checkbox(
+                    "Allow blocked seats (aisle, pillar) inside a block", key="best_through_blocked"
+                )
+                blocks = engine.best_available(
+                    work["store"], int(best_n), None if best_section == "All sections" else best_section,
+                    best_prefer, best_through, limit=10
+                )
+                if blocks:
+                    st.dataframe([info for _, info in blocks], use_container_width=True)
+                else:
+                    st.info(f"No {int(best_n)} adjacent available seats found.")
         else:
             st.info("No available seats found.")
 
         # ---------- Price inputs ----------
-        section_names = section_names_from_data(seat_data)
+        section_names = work["section_names"]
 
         if multi_price_mode:
             group_count = st.number_input(
@@ -264,7 +259,7 @@ if uploaded_file:
                 st.markdown(f"#### Price Group {i+1}")
                 rng = st.text_input(
                     f"Seat ranges for Group {i+1}",
-                    placeholder="e.g. Stalls A1-A4, A5-A8  or  Rausing Circle ROW 1 - 1-6",
+                    placeholder="e.g. Stalls A1-A4, A5-A8  or  Rausing Circle ROW 1 - 1-6  or  Stalls B  or  Dress Circle *",
                     key=f"range_{i+1}"
                 )
                 prc = st.text_input(
@@ -283,7 +278,7 @@ if uploaded_file:
         else:
             seat_range_input = st.text_input(
                 "Enter seat ranges",
-                placeholder="Rausing Circle ROW 1 - 1-6, Stalls A1-A5"
+                placeholder="Rausing Circle ROW 1 - 1-6, Stalls A1-A5, Stalls B, Dress Circle *"
             )
 
             if price_only_mode:
@@ -298,14 +293,7 @@ if uploaded_file:
         tier_keys_order = []
 
         if price_only_mode:
-            tiers = defaultdict(list)  # (sec_disp, price) -> [ (sec_disp, pref, num, seat) ]
-
-            for (sec_low, pref, num), (seat, sec_disp) in seat_index.items():
-                if (seat.get("status", "") or "").lower() != "av":
-                    continue
-                seat_price = str(seat.get("price", "")).strip() or "∅"
-                key = (sec_disp, seat_price)
-                tiers[key].append((sec_disp, pref, num, seat))
+            tiers = work["tiers"]  # (sec_disp, price) -> store rows
 
             st.markdown("### 🧮 Price tiers (AV seats, grouped by section)")
             if not tiers:
@@ -319,9 +307,10 @@ if uploaded_file:
                     count = len(seats)
 
                     sample_locs = []
-                    for (sdisp, pref, num, _seat) in seats[:6]:
+                    for j in seats[:6].tolist():
+                        _, pref, num = store.key(j)
                         pp = "ROW " + pref[3:] if pref.startswith("row") else pref.upper()
-                        sample_locs.append(f"{sdisp} {pp}-{num}")
+                        sample_locs.append(f"{store.display_section(j)} {pp}-{num}")
 
                     tier_listing.append({
                         "Tier": tier_label,
@@ -346,258 +335,199 @@ if uploaded_file:
                     )
                     val = (val or "").strip()
                     if val:
-                        if not re.match(r"^\d+(?:\.\d+)?$", val):
+                        if not engine.PRICE_RX.match(val):
                             st.warning(
                                 f"'{val}' doesn’t look like a number, this tier will be skipped unless corrected."
                             )
                         else:
                             tier_new_values[key] = val
 
+                st.markdown("#### 📈 Change many tiers at once (per-tier prices above win)")
+                bulk_cols = st.columns([1, 1, 2])
+                with bulk_cols[0]:
+                    bulk_kind = st.selectbox("Change by", ["Percentage (%)", "Fixed amount (£)"], key="tier_bulk_kind")
+                with bulk_cols[1]:
+                    bulk_amount = st.text_input("Amount", key="tier_bulk_amount", placeholder="e.g. 10 or -5")
+                with bulk_cols[2]:
+                    tier_sections = sorted({sec for sec, _ in tier_keys_order}, key=str.lower)
+                    bulk_sections = st.multiselect(
+                        "Sections", tier_sections, default=tier_sections, key="tier_bulk_sections"
+                    )
+                bulk_amount = (bulk_amount or "").strip()
+                if bulk_amount:
+                    if not engine.PRICE_RX.match(bulk_amount.lstrip("+-")):
+                        st.warning(f"'{bulk_amount}' doesn’t look like a number, no tiers will be changed by it.")
+                    else:
+                        amount = float(bulk_amount)
+                        percent = amount if bulk_kind.startswith("Percentage") else None
+                        bulk = engine.tier_adjustments(
+                            store, percent, None if percent is not None else amount, sections=set(bulk_sections)
+                        )
+                        st.caption(
+                            f"{len(bulk)} tiers will be repriced"
+                            + "".join(f" · {sec} £{old} → £{new}" for (sec, old), new in itertools.islice(bulk.items(), 3))
+                            + (" …" if len(bulk) > 3 else "")
+                        )
+                        tier_new_values = {**bulk, **tier_new_values}
+
         # ----- Parse input ranges -----
-        requested_single = set()
+        requested_single = {}
         parsed_groups = []
 
         if multi_price_mode:
-            for g in groups:
-                seats = parse_ranges(g["range"], section_names) if g["range"] else set()
-                parsed_groups.append({"seats": seats, "price": g["price"]})
-
-            all_keys = [k for g in parsed_groups for k in g["seats"]]
-            dup_counts = Counter(all_keys)
-            overlaps = {k for k, c in dup_counts.items() if c > 1}
-            total_targets = sum(len(g["seats"]) for g in parsed_groups)
+            parsed_groups, overlaps = engine.parse_groups(groups, section_names, row_index)
+            total_targets = sum(engine.interval_count(g["ranges"], row_index) for g in parsed_groups)
+            overlap_count = engine.interval_count(overlaps, row_index)
 
             st.markdown("### 🔎 Parsed Seat Targets (Preview)")
             st.write(
                 f"Groups: **{len(parsed_groups)}** | "
                 f"Total seats targeted (with duplicates): **{total_targets}** | "
-                f"Overlapping seats: **{len(overlaps)}**"
+                f"Overlapping seats: **{overlap_count}**"
             )
 
             if overlaps:
                 sec_title = {s.lower(): s for s in section_names}
-
-                def pretty(k):
-                    sec_low, pref, n = k
-                    sec_disp = sec_title.get(sec_low, "?")
-                    pp = "ROW " + pref[3:] if pref.startswith("row") else pref.upper()
-                    return f"{sec_disp} {pp}-{n}"
-
-                sample = ", ".join(pretty(k) for k in sorted(list(overlaps))[:12])
+                sample = ", ".join(
+                    engine.pretty_key(k, sec_title) for k in itertools.islice(engine.iter_keys(overlaps, row_index), 12)
+                )
                 st.warning(
                     f"⚠️ Overlaps detected. Earlier groups take precedence. "
-                    f"Sample: {sample}{' …' if len(overlaps) > 12 else ''}"
+                    f"Sample: {sample}{' …' if overlap_count > 12 else ''}"
                 )
         else:
-            if "seat_range_input" in locals() and seat_range_input:
-                requested_single = parse_ranges(seat_range_input, section_names)
+            if seat_range_input:
+                requested_single = engine.parse_ranges(seat_range_input, section_names)
                 st.markdown("### 🔎 Parsed Seat Targets (Preview)")
-                st.write(f"Targets parsed: **{len(requested_single)}** seats")
+                st.write(f"Targets parsed: **{engine.interval_count(requested_single, row_index)}** seats")
+            parsed_groups = [{"ranges": requested_single, "price": price_input or ""}]
+
+        # ----- Pricing rules (dry run shown live, applied on Go after the ranges) -----
+        rules = []
+        with st.expander("🧾 Pricing rules (optional)"):
+            rules_text = st.text_area(
+                "One rule per line, the first rule matching a seat wins",
+                key="pricing_rules",
+                placeholder="Stalls rows A-F = 75\n*Circle rows ROW 1-3 except blocked = 60\nall with aisle = row + 5",
+                height=140
+            )
+            if (rules_text or "").strip():
+                try:
+                    rules = engine.compile_rules(rules_text, section_names)
+                except engine.RuleError as e:
+                    st.warning(f"⚠️ {e}. No rules will be applied until it is fixed.")
+                else:
+                    st.dataframe([
+                        {
+                            "Line": r["line"],
+                            "Rule": r["rule"],
+                            "Seats": r["seats"],
+                            "Would change": r["would_change"],
+                            "No price to adjust": r["unpriced"],
+                            "Sample": ", ".join(r["sample"])
+                        }
+                        for r in engine.rules_report(store, rules, seat_data)
+                    ], use_container_width=True)
 
         # ----- Apply updates -----
         if st.button("▶️ Go"):
-            matched = []
-            updated_seats = []
-            missing = []
+            # Everything below is one journal operation (undo reverts it as a whole)
+            journal.begin(f"Go #{len(journal.undo_stack) + 1}")
 
             # 1) Apply tier price edits first
             if price_only_mode and tier_new_values:
-                changed = 0
-                for (sec_low, pref, num), (seat, sec_disp) in seat_index.items():
-                    if (seat.get("status", "") or "").lower() != "av":
-                        continue
-                    cur_price = str(seat.get("price", "")).strip() or "∅"
-                    new_p = tier_new_values.get((sec_disp, cur_price))
-                    if new_p:
-                        seat["price"] = str(new_p)
-                        changed += 1
-
+                changed = engine.apply_tier_edits(store, tier_new_values)
                 if changed:
                     st.success(f"💸 Updated {changed} AV seats via tier edits.")
 
-            # 2) Multiple price groups mode
-            if multi_price_mode:
-                assignment = {}  # seat_key -> (group_index, price_str)
-
-                for idx, g in enumerate(parsed_groups):
-                    price = (g["price"] or "").strip()
-                    for key in g["seats"]:
-                        if key not in seat_index:
-                            missing.append(key)
-                            continue
-                        if key in assignment:
-                            continue
-                        assignment[key] = (idx, price)
-
-                # Availability changes
-                if not price_only_mode:
-                    for key, (idx, _price) in assignment.items():
-                        seat, sec_disp = seat_index[key]
-
-                        if is_blocked_label(seat):
-                            seat["status"] = "uav"
-                            continue
-
-                        if (seat.get("status", "") or "").lower() != "av":
-                            seat["status"] = "av"
-                            updated_seats.append({
-                                "Section": sec_disp,
-                                "Seat": seat.get("number", ""),
-                                "Status": "av",
-                                "Price": seat.get("price", "")
-                            })
-
-                        matched.append(f"{sec_disp} {seat.get('number', '').strip()}")
-
-                # Apply prices
-                for key, (idx, price) in assignment.items():
-                    if price:
-                        seat, _ = seat_index[key]
-                        seat["price"] = str(price)
-
-                # Auto set all non-target seats to UAV
-                if not price_only_mode:
-                    targeted = set(assignment.keys())
-                    turned_off = 0
-
-                    for key, (seat, _) in seat_index.items():
-                        if key not in targeted:
-                            if (seat.get("status", "") or "").lower() != "uav":
-                                seat["status"] = "uav"
-                                turned_off += 1
-
-                    if turned_off:
-                        st.info(f"🔕 Set {turned_off} non-targeted seats to UAV.")
-
-            # 3) Single range + price mode
-            else:
-                if not price_only_mode and requested_single:
-                    for key in requested_single:
-                        if key in seat_index:
-                            seat, sec_disp = seat_index[key]
-
-                            if is_blocked_label(seat):
-                                seat["status"] = "uav"
-                                continue
-
-                            if (seat.get("status", "") or "").lower() != "av":
-                                seat["status"] = "av"
-                                updated_seats.append({
-                                    "Section": sec_disp,
-                                    "Seat": seat.get("number", ""),
-                                    "Status": "av",
-                                    "Price": seat.get("price", "")
-                                })
-
-                            matched.append(f"{sec_disp} {seat.get('number', '').strip()}")
-                        else:
-                            missing.append(key)
-
-                if not price_only_mode and "price_input" in locals() and price_input:
-                    for key in requested_single:
-                        if key in seat_index:
-                            seat, _ = seat_index[key]
-                            seat["price"] = str(price_input)
-
-                if not price_only_mode:
-                    targeted = requested_single
-                    turned_off = 0
+            # 2) Range groups (a single range + price is one group)
+            result = engine.apply_groups(store, parsed_groups, price_only=price_only_mode)
 
-                    for key, (seat, _) in seat_index.items():
-                        if key not in targeted:
-                            if (seat.get("status", "") or "").lower() != "uav":
-                                seat["status"] = "uav"
-                                turned_off += 1
-
-                    if turned_off:
-                        st.info(f"🔕 Set {turned_off} non-targeted seats to UAV.")
+            if result["turned_off"]:
+                st.info(f"🔕 Set {result['turned_off']} non-targeted seats to UAV.")
 
             # Final enforcement for blocked labels
-            blocked_kept_uav = 0
-            for key, (seat, _) in seat_index.items():
-                if is_blocked_label(seat) and (seat.get("status", "").lower() != "uav"):
-                    seat["status"] = "uav"
-                    blocked_kept_uav += 1
-
+            blocked_kept_uav = engine.enforce_blocked(store)
             if blocked_kept_uav:
                 st.info(
                     f"🚫 Kept {blocked_kept_uav} blocked items "
                     f"(pillar, space, aisle, etc.) as UAV."
                 )
 
-            # Post-op messaging
-            if not price_only_mode:
-                if matched:
-                    st.markdown("### ✅ Availability Updated")
-                    st.write(", ".join(sorted(matched)))
-
-                if missing:
-                    sec_title = {s.lower(): s for s in section_names}
-                    pretty = [
-                        f"{sec_title.get(sec, '?')} "
-                        f"{(pref.upper() if not pref.startswith('row') else 'ROW ' + pref[3:])}-{n}"
-                        for (sec, pref, n) in sorted(set(missing))
-                    ]
-                    st.warning("⚠️ Seats not found: " + ", ".join(pretty))
-
-            if updated_seats:
-                st.markdown("### 🎟️ Updated Seats")
-                st.dataframe(updated_seats, use_container_width=True)
-
-            # Row price = max seat price in row
-            rows_updated = set_row_price_to_max_only(seat_data)
+            if rules:
+                rule_changed = sum(engine.apply_rules(store, rules, seat_data))
+                if rule_changed:
+                    st.success(f"📐 Repriced {rule_changed} seats via pricing rules.")
+
+            # Row price = max seat price in row, plus the seats priced below it (one pass)
+            apply_stats = engine.PassStats()
+            rows_updated, mismatches = engine.row_pass(seat_data, stats=apply_stats, journal=journal)
+            op = journal.commit()
             if rows_updated:
                 st.info(f"📏 Row prices set to the highest seat price in {rows_updated} rows.")
 
-            # Visibility check for seats below row price
-            mismatches = []
-            for sec in seat_data.values():
-                if not isinstance(sec, dict) or sec.get("type") == "aoi":
-                    continue
-
-                rows = sec.get("rows") or {}
-                for row_name, row in rows.items():
-                    row_price_s = (str(row.get("price")) if row.get("price") is not None else "").strip()
-                    row_price = float(row_price_s) if re.match(r"^\d+(?:\.\d+)?$", row_price_s) else None
-                    if row_price is None:
-                        continue
-
-                    seats = row.get("seats") or {}
-                    for seat in seats.values():
-                        seat_num = seat.get("number", "")
-                        seat_price_s = (str(seat.get("price")) if seat.get("price") is not None else "").strip()
-                        if re.match(r"^\d+(?:\.\d+)?$", seat_price_s):
-                            seat_price = float(seat_price_s)
-                            if seat_price < row_price:
-                                mismatches.append({
-                                    "Section": sec.get("section_name", ""),
-                                    "Row": row_name,
-                                    "Seat": seat_num,
-                                    "Row Price": row_price_s,
-                                    "Seat Price": seat_price_s
-                                })
-
-            if mismatches:
-                st.markdown("### 🔎 Seats priced below their row (expected, just for visibility)")
-                st.dataframe(mismatches[:300], use_container_width=True)
-
-            # Sample summary
-            st.markdown("### 📊 Seat Price Summary (sample)")
-            sample = []
-            for i, ((sec_low, pref, num), (seat, sec_disp)) in enumerate(sorted(seat_index.items())[:300]):
-                sample.append({
-                    "Section": sec_disp,
-                    "Seat": seat.get("number", ""),
-                    "Price": seat.get("price", "")
-                })
-            st.dataframe(sample, use_container_width=True)
-
-            st.download_button(
-                "Download Updated JSON",
-                json.dumps(seat_data, indent=2),
-                file_name="updated_seatmap.json",
-                mime="application/json"
+            # Result lists are rendered below from here on, a page at a time
+            work["last_apply"] = {
+                "n": work.get("last_apply", {}).get("n", 0) + 1,
+                "price_only": price_only_mode,
+                "matched": result["matched_rows"],
+                "updated": result["updated_rows"],
+                "missing": (result["missing"], result["missing_rows"]),
+                "mismatches": mismatches,
+            }
+
+            # Edits live on in the session copy; refresh the status-dependent views
+            refresh_views(work, apply_stats)
+            changes = ", ".join(f"{n} {field}" for field, n in op.summary().items()) if op else "nothing"
+            st.caption(f"Post-apply: {apply_stats.summary()}. Changed: {changes}.")
+
+            download_button(work, download_format)
+
+        if work.get("last_apply"):
+            show_last_apply(work)
+
+        # ----- Changes vs the uploaded file (or another performance), before publishing -----
+        if st.checkbox("🔍 Show seat changes since upload", key="show_diff"):
+            other_file = st.file_uploader(
+                "Compare with another performance instead (optional)", type=["json"], key="diff_other"
             )
+            if other_file is not None:
+                other_raw = other_file.getvalue()
+                base = load_and_index(
+                    hashlib.sha256(other_raw).hexdigest(), block_words, streaming_load, layout_cache, other_raw
+                )
+                base_name = getattr(other_file, "name", "the other performance")
+            else:
+                base = load_and_index(digest, block_words, streaming_load, layout_cache, raw_bytes)
+                base_name = "the uploaded file"
+            diff = engine.diff_stores(base["store"], store)
+            summary = engine.diff_summary(diff)
+            st.write(
+                f"Compared with {base_name}: **{summary['status_changed']}** status and "
+                f"**{summary['price_changed']}** price changes; {summary['only_a']} seats only there, "
+                f"{summary['only_b']} only here."
+            )
+            if summary["sections"]:
+                st.dataframe(summary["sections"], use_container_width=True)
+                diff_rows = list(engine.iter_diff_rows(diff))
+                start, stop = page_bounds(len(diff_rows), "page_diff")
+                st.dataframe(diff_rows[start:stop], use_container_width=True)
 
     except Exception as e:
         st.error(f"❌ Error reading file: {e}")
+
+# ──────────────── diagnostics ────────────────
+instrument.stop(diag_token)
+if diag is not None:
+    with st.expander("🩺 Diagnostics: stages of this run", expanded=True):
+        if diag.records:
+            st.dataframe(diag.summary(), use_container_width=True)
+            st.download_button(
+                "Download stage log (JSON lines)",
+                diag.to_jsonl(),
+                file_name="seatmap_stages.jsonl",
+                mime="application/x-ndjson",
+                key="download_stage_log"
+            )
+        else:
+            st.info("No pipeline stages ran (the map was already indexed and cached).")
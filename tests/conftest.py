@@ -0,0 +1,44 @@
+import copy, json
+
+import pytest
+
+from seatmap.synth import generate_venue
+
+def seat(number, status="av", price="50", **extra):
+    return {"number": number, "status": status, "price": price, **extra}
+
+VENUE = {
+    "s1": {"section_name": "Stalls", "rows": {
+        "r1": {"price": "50", "seats": {
+            f"a{n}": seat(f"A{n}", **({"notes": "Pillar"} if n == 3 else {})) for n in range(1, 7)
+        }},
+        "r2": {"seats": {f"b{n}": seat(f"B{n}", "uav" if n == 2 else "av", "40") for n in range(1, 5)}},
+        "r3": {"seats": {"x": {"number": "Aisle", "status": "av"}}},  # blocked, not indexed
+    }},
+    "s2": {"section_name": "Dress  Circle", "rows": {  # normalised to "Dress Circle" on load
+        "r1": {"seats": {f"c{n}": seat(f"C{n}", price="35") for n in range(1, 4)}},
+    }},
+    "s3": {"section_name": "Bar", "type": "aoi", "rows": {"r1": {"seats": {"z": seat("Z1")}}}},
+}
+
+@pytest.fixture
+def venue_raw():
+    """A small venue as JSON text: Stalls A1-6 (A3 a pillar), B1-4 (B2 UAV), an aisle; Dress Circle C1-3; an aoi."""
+    return json.dumps(copy.deepcopy(VENUE))
+
+@pytest.fixture
+def venue_with_duplicates():
+    """venue_with_duplicates(n_seats, seed): a synthetic venue as JSON text whose first seat label is
+    repeated in its own row, another row and the last section."""
+    def make(n_seats=3000, seed=1):
+        data = generate_venue(n_seats, seed)
+        sections = [sec for sec in data.values() if sec.get("type", "def") != "aoi"]
+        first_rows = list(sections[0]["rows"].values())
+        label = next(iter(first_rows[0]["seats"].values()))["number"]
+        for row in (first_rows[0], first_rows[-1]):
+            row["seats"]["dup"] = {"number": label, "status": "av", "price": "5"}
+        last = sections[-1]
+        last["section_name"] = sections[0]["section_name"]  # same section title, far away in the map
+        next(iter(last["rows"].values()))["seats"]["dup"] = {"number": label, "status": "av", "price": "6"}
+        return json.dumps(data)
+    return make
@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+import pytest
+
+from seatmap import engine
+from seatmap.blocks import PREFER
+from seatmap.store import ST_AV, ST_UAV, AvailIndex
+from seatmap.synth import generate_venue
+
+def store_of(raw):
+    return engine.build_store(engine.build_seat_index(engine.load_map(raw))[2])
+
+def seats(store, n, *args):
+    return [info["seats"] for _, info in engine.best_available(store, n, *args)]
+
+def test_best_blocks_in_the_venue(venue_raw):
+    store = store_of(venue_raw)
+    assert seats(store, 2, "Stalls") == ["Stalls A4-5", "Stalls B3-4"]  # nearest the middle of each row
+    assert seats(store, 3, "Stalls") == ["Stalls A4-6"]  # B2 is UAV, A3 a pillar
+    assert seats(store, 4) == []
+    assert seats(store, 3, "Stalls", "front", True) == ["Stalls A2, Stalls A4-5"]  # across the pillar
+    assert seats(store, 2, None, "back") == ["Dress Circle C1-2", "Stalls B3-4", "Stalls A4-5"]
+    assert seats(store, 2, None, "front", False, 1) == ["Dress Circle C1-2"]
+    for bad in ((0,), (2, None, "middle")):
+        with pytest.raises(ValueError):
+            engine.best_available(store, *bad)
+
+@pytest.mark.parametrize("through_blocked", [False, True])
+@pytest.mark.parametrize("prefer", PREFER)
+def test_blocks_stay_in_one_row_and_skip_unsellable_seats(prefer, through_blocked):
+    store = store_of(json.dumps(generate_venue(3000, 3)))
+    for n in (1, 3, 8):
+        blocks = engine.best_available(store, n, None, prefer, through_blocked, limit=50)
+        assert blocks
+        for rows, info in blocks:
+            assert info["count"] == len(rows) == n
+            assert len(set(store.sec_id[rows].tolist())) == 1 and len(set(store.pref_id[rows].tolist())) == 1
+            assert (store.status[rows] == ST_AV).all() and not store.blocked[rows].any()
+            assert (np.diff(store.num[rows]) > 0).all()
+            between = np.setdiff1d(np.arange(rows[0], rows[-1] + 1), rows)
+            # gaps only over blocked seats, and only when asked to straddle them
+            assert store.blocked[between].all() if through_blocked else not len(between)
+            assert (store.num[rows[-1]] - store.num[rows[0]]) == rows[-1] - rows[0]
+
+def same_index(a, b):
+    return (
+        np.array_equal(a.longest, b.longest) and np.array_equal(a.count, b.count)
+        and all(np.array_equal(x[0], y[0]) and np.array_equal(x[1], y[1]) for x, y in zip(a.runs, b.runs))
+    )
+
+def test_avail_index_follows_writes_like_a_rebuild():
+    store = store_of(json.dumps(generate_venue(3000, 3)))
+    index = store.avail_index()
+    rng = np.random.default_rng(7)
+    store.journal.begin("edits")
+    for _ in range(20):  # a few seats in a few rows: each row swept on its own
+        picked = store.mask(rng.choice(len(store), 5, replace=False))
+        store.set_status(picked, ST_UAV, "uav")
+        assert same_index(index, AvailIndex(store))
+        store.set_status(picked & (rng.random(len(store)) < 0.5), ST_AV, "av")
+        assert same_index(index, AvailIndex(store))
+    # seats in every row: more than 32 rows touched, swept as one span
+    assert len(store.row_keys) > 32
+    store.set_status(store.mask(np.arange(0, len(store), 7)), ST_AV, "av")
+    assert same_index(index, AvailIndex(store))
+    store.set_status(store.mask(np.arange(3, len(store), 5)), ST_UAV, "uav")
+    assert same_index(index, AvailIndex(store))
+    store.journal.commit()
+    assert store.undo()
+    assert same_index(index, AvailIndex(store))
+    assert len(index) == int((store.status == ST_AV).sum())
@@ -0,0 +1,80 @@
+import json, sqlite3
+
+from seatmap import cache, engine, instrument
+from seatmap.cache import IndexCache, cached_index
+from seatmap.layout import iter_seats
+
+def positions(seat_data, row_index):
+    """The row index with seat dicts replaced by their JSON positions, for comparing two loads."""
+    where = {id(seat): pos for pos, seat in iter_seats(seat_data)}
+    return {key: (nums, [where[id(s)] for s in seats], sections, flags)
+            for key, (nums, seats, sections, flags) in row_index.items()}
+
+def stages(fn):
+    """(fn(), names of the stages it ran)."""
+    recorder = instrument.Recorder()
+    with instrument.recording(recorder):
+        result = fn()
+    return result, {rec["stage"] for rec in recorder.records}
+
+def test_cache_hit_equals_build(tmp_path, venue_with_duplicates):
+    raw = venue_with_duplicates(1500, seed=2)
+    store = IndexCache(str(tmp_path / "layouts.sqlite"))
+    reference = engine.load_map(raw)
+    ref_dups = []
+    _, ref_counts, ref_index = engine.build_seat_index(reference, duplicates=ref_dups)
+    for attempt in ("miss", "hit"):
+        seat_data, journal, dups = engine.load_map(raw), engine.Journal(), []
+        stats = engine.PassStats()
+        _, counts, row_index = cached_index(seat_data, stats, journal=journal, cache=store, duplicates=dups)
+        assert ("index (cached)" in stats.as_dict()["detail"]) == (attempt == "hit")
+        assert sorted(dups) == sorted(ref_dups)
+        assert dict(counts) == dict(ref_counts)
+        assert positions(seat_data, row_index) == positions(reference, ref_index)
+        assert json.dumps(seat_data) == json.dumps(reference)  # same seats forced to UAV
+
+def test_other_performances_share_an_entry(tmp_path, venue_raw):
+    store = IndexCache(str(tmp_path / "layouts.sqlite"))
+    cached_index(engine.load_map(venue_raw), cache=store)
+    performance = json.loads(venue_raw)
+    performance["s1"]["rows"]["r2"]["seats"]["b3"].update(status="uav", price="99")
+    stats = engine.PassStats()
+    cached_index(engine.load_map(json.dumps(performance)), stats, cache=store)
+    assert "index (cached)" in stats.as_dict()["detail"]
+    performance["s1"]["rows"]["r2"]["seats"]["b3"]["notes"] = "pillar"  # now blocked: a different layout
+    stats = engine.PassStats()
+    cached_index(engine.load_map(json.dumps(performance)), stats, cache=store)
+    assert "index (cached)" not in stats.as_dict()["detail"]
+
+def test_same_file_is_found_by_digest(tmp_path, venue_raw):
+    store = IndexCache(str(tmp_path / "layouts.sqlite"))
+    raw = venue_raw.encode()
+    _, ran = stages(lambda: cached_index(engine.load_map(raw), cache=store, source=raw))
+    assert {"source_digest", "fingerprint", "index", "cache_write"} <= ran
+    seat_data = engine.load_map(raw)
+    (_, _, row_index), ran = stages(lambda: cached_index(seat_data, cache=store, source=raw))
+    assert "fingerprint" not in ran and "index" not in ran and "cache_bind" in ran
+    reference = engine.load_map(raw)
+    assert positions(seat_data, row_index) == positions(reference, engine.build_seat_index(reference)[2])
+
+def test_dropped_entries_take_their_digests(tmp_path, venue_raw):
+    store = IndexCache(str(tmp_path / "layouts.sqlite"), max_layouts=1)
+    other = json.loads(venue_raw)
+    other["s2"]["section_name"] = "Balcony"
+    for raw in (venue_raw, json.dumps(other)):
+        cached_index(engine.load_map(raw), cache=store, source=raw)
+    with sqlite3.connect(store.path) as db:
+        assert db.execute("SELECT COUNT(*) FROM layouts").fetchone() == (1,)
+        assert db.execute("SELECT COUNT(*) FROM sources").fetchone() == (1,)
+    assert store.fingerprint_of(cache.source_digest(venue_raw, engine.block_matcher().words)) is None
+
+def test_old_cache_files_start_afresh(tmp_path, venue_raw):
+    path = str(tmp_path / "layouts.sqlite")
+    with sqlite3.connect(path) as db:
+        db.execute("CREATE TABLE layouts (fingerprint TEXT PRIMARY KEY, rows BLOB)")
+        db.execute("PRAGMA user_version = 1")
+    store = IndexCache(path)
+    cached_index(engine.load_map(venue_raw), cache=store)
+    stats = engine.PassStats()
+    cached_index(engine.load_map(venue_raw), stats, cache=store)
+    assert "index (cached)" in stats.as_dict()["detail"]
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from seatmap import engine
+from seatmap.service import Service
+
+def store_of(data):
+    return engine.build_store(engine.build_seat_index(engine.load_map(json.dumps(data)))[2])
+
+@pytest.fixture
+def edited(venue_raw):
+    """(venue, a copy with seats re-statused, repriced, dropped and added)."""
+    a, b = json.loads(venue_raw), json.loads(venue_raw)
+    stalls = b["s1"]["rows"]
+    stalls["r1"]["seats"]["a1"]["status"] = "UAV"
+    for key in ("a2", "a4"):
+        stalls["r1"]["seats"][key]["price"] = "55"
+    stalls["r2"]["seats"]["b1"]["price"] = "55"
+    stalls["r2"]["seats"]["b3"]["price"] = "60"
+    del stalls["r1"]["seats"]["a6"]
+    stalls["r2"]["seats"]["b5"] = {"number": "B5", "status": "av", "price": "40"}
+    b["s2"]["rows"]["r2"] = {"seats": {"d1": {"number": "D1", "status": "av", "price": "35"}}}
+    # listed in another order: seats are aligned on keys, not JSON positions
+    b["s2"]["rows"]["r1"]["seats"] = dict(reversed(list(b["s2"]["rows"]["r1"]["seats"].items())))
+    return a, b
+
+def test_identical_maps_match_every_seat(venue_raw):
+    d = engine.diff_stores(store_of(json.loads(venue_raw)), store_of(json.loads(venue_raw)))
+    summary = engine.diff_summary(d)
+    assert (summary["matched"], summary["status_changed"], summary["price_changed"]) == (13, 0, 0)
+    assert summary["sections"] == [] and list(engine.iter_diff_rows(d)) == []
+
+def test_changes_and_one_sided_seats(edited):
+    a, b = map(store_of, edited)
+    d = engine.diff_stores(a, b)
+    assert d["matched"] == 12
+    assert [a.seat_label(i) for i in d["status"][0].tolist()] == ["A1"]  # "UAV" and "uav" are one status code
+    assert [a.seat_label(i) for i in d["price"][0].tolist()] == ["A2", "A4", "B1", "B3"]
+    assert [a.seat_label(i) for i in d["only_a"].tolist()] == ["A6"]
+    assert [b.seat_label(i) for i in d["only_b"].tolist()] == ["D1", "B5"]
+
+def test_summary_counts_per_section(edited):
+    summary = engine.diff_summary(engine.diff_stores(*map(store_of, edited)))
+    assert (summary["seats_a"], summary["seats_b"], summary["only_a"], summary["only_b"]) == (13, 14, 1, 2)
+    assert summary["sections"] == [
+        {"section": "Dress Circle", "status": 0, "price": 0, "only_a": 0, "only_b": 1},
+        {"section": "Stalls", "status": 1, "price": 4, "only_a": 1, "only_b": 1},
+    ]
+
+def test_rows_group_changes_per_seat_row(edited):
+    rows = list(engine.iter_diff_rows(engine.diff_stores(*map(store_of, edited))))
+    assert [(r["section"], r["row"], r["change"], r["from"], r["to"], r["seats"]) for r in rows] == [
+        ("Dress Circle", "D", "only_b", "", "", "D1"),
+        ("Stalls", "A", "status", "av", "UAV", "A1"),
+        ("Stalls", "A", "price", "50", "55", "A2, A4"),
+        ("Stalls", "A", "only_a", "", "", "A6"),
+        ("Stalls", "B", "price", "40", "55", "B1"),
+        ("Stalls", "B", "price", "40", "60", "B3"),
+        ("Stalls", "B", "only_b", "", "", "B5"),
+    ]
+
+def test_repeated_numbers_compare_the_seat_the_index_keeps(venue_raw):
+    a, b = json.loads(venue_raw), json.loads(venue_raw)
+    for data, price in ((a, "50"), (b, "70")):
+        data["s1"]["rows"]["r2"]["seats"]["b1x"] = {"number": "B1", "status": "av", "price": price}
+    d = engine.diff_stores(store_of(a), store_of(b))  # the last B1 of each map, as the index keeps it
+    assert d["matched"] == 13 and len(d["price"][0]) == 1
+
+def test_service_diff_truncates_rows(edited):
+    service = Service()
+    a, b = (service.upload(json.dumps(data).encode())["id"] for data in edited)
+    full = service.diff(a, b)
+    assert len(full["rows"]) == 7 and not full["truncated"]
+    head = service.diff(a, b, limit=3)
+    assert head["rows"] == full["rows"][:3] and head["truncated"]
+    assert not service.diff(a, b, limit=7)["truncated"]
+    assert service.diff(a, a)["rows"] == []
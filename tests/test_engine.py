@@ -0,0 +1,46 @@
+from seatmap import engine
+
+def seats_of(seat_data, section):
+    """{number: (status, price)} of one section key."""
+    return {
+        s["number"]: (s.get("status"), s.get("price"))
+        for row in seat_data[section]["rows"].values() for s in row["seats"].values()
+    }
+
+def run(raw, plan):
+    seat_data = engine.load_map(raw)
+    result = engine.run_plan(seat_data, plan)
+    return seat_data, result, engine.plan_summary(result, engine.section_names_from_data(seat_data))
+
+def test_earlier_group_wins_overlaps(venue_raw):
+    seat_data, result, summary = run(venue_raw, {"groups": [
+        {"range": "Stalls A1-4", "price": "60"},
+        {"range": "Stalls A3-6", "price": "70"},
+    ]})
+    stalls = seats_of(seat_data, "s1")
+    assert result["overlaps"] == 2  # A3, A4
+    assert [stalls[f"A{n}"][1] for n in range(1, 7)] == ["60", "60", "60", "60", "70", "70"]
+    # targeted seats go AV except the pillar, everything else goes UAV
+    assert [stalls[f"A{n}"][0] for n in range(1, 7)] == ["av", "av", "uav", "av", "av", "av"]
+    assert {stalls[f"B{n}"][0] for n in range(1, 5)} == {"uav"}
+    assert stalls["Aisle"][0] == "uav"
+    assert {status for status, _ in seats_of(seat_data, "s2").values()} == {"uav"}
+    assert seats_of(seat_data, "s3") == {"Z1": ("av", "50")}  # aoi sections are left alone
+    assert summary["assigned"] == 6
+    assert seat_data["s1"]["rows"]["r1"]["price"] == "70.0"  # row price: highest seat price
+
+def test_missing_seats_and_rows_are_reported(venue_raw):
+    seat_data, _, summary = run(venue_raw, {"groups": [{"range": "Stalls A5-8, Stalls Z, Dress Circle C2", "price": "70"}]})
+    assert summary["missing"] == 3
+    assert summary["missing_seats"] == ["Stalls A-7–8", "Stalls Z (whole row)"]
+    assert seats_of(seat_data, "s2")["C2"] == ("av", "70")
+
+def test_price_only_keeps_availability(venue_raw):
+    seat_data, _, summary = run(venue_raw, {"price_only": True, "groups": [{"range": "Stalls A, Stalls B1-2", "price": "65"}]})
+    stalls = seats_of(seat_data, "s1")
+    assert summary["turned_off"] == 0 and summary["made_av"] == 0
+    assert stalls["B2"] == ("uav", "65")
+    assert stalls["B3"] == ("av", "40")
+    assert stalls["A3"] == ("uav", "65")  # blocked seats are still forced to UAV
+    assert stalls["Aisle"][0] == "uav"
+    assert seats_of(seat_data, "s2")["C1"] == ("av", "35")
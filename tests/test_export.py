@@ -0,0 +1,89 @@
+import gzip, json
+
+import pytest
+
+from seatmap import engine
+from seatmap.stream import load_stream
+
+PLAN = {"groups": [{"range": "Stalls A1-5", "price": "61.5"}, {"range": "Dress Circle *", "price": "30"}]}
+
+PLANS = [
+    {"groups": [{"range": "Stalls A1-4", "price": "60"}, {"range": "Dress Circle C2", "price": ""}]},
+    {"price_only": True, "groups": [{"range": "Stalls *", "price": "42"}]},
+    {"groups": [{"range": "Stalls B", "price": "48"}], "label": "third"},
+]
+
+def apply_patch(doc, ops):
+    """RFC 6902 add / replace / remove on plain JSON objects (all json_patch() emits)."""
+    for op in ops:
+        *parents, last = [p.replace("~1", "/").replace("~0", "~") for p in op["path"].split("/")[1:]]
+        target = doc
+        for key in parents:
+            target = target[key]
+        if op["op"] == "remove":
+            del target[last]
+        else:
+            assert op["op"] in ("add", "replace")
+            target[last] = op["value"]
+    return doc
+
+def test_export_formats_decode_to_the_map(venue_raw):
+    seat_data = engine.load_map(venue_raw)
+    engine.run_plan(seat_data, PLAN)
+    expected = json.loads(json.dumps(seat_data))
+    assert json.loads(engine.export(seat_data, "pretty")) == expected
+    assert json.loads(engine.export(seat_data, "compact")) == expected
+    assert json.loads(gzip.decompress(engine.export(seat_data, "gzip"))) == expected
+    with pytest.raises(ValueError):
+        engine.export(seat_data, "xml")
+
+def test_patch_applied_to_upload_equals_full_export(venue_raw):
+    journal = engine.Journal()
+    seat_data = engine.load_map(venue_raw, journal)
+    store = engine.build_store(engine.build_seat_index(seat_data, journal=journal)[2], journal=journal)
+
+    def patched():
+        return apply_patch(json.loads(venue_raw), json.loads(engine.export(seat_data, "patch", store)))
+
+    for plan in PLANS:
+        engine.run_plan(seat_data, plan, store)
+        assert patched() == json.loads(engine.export(seat_data, "compact"))
+    store.undo()
+    assert patched() == json.loads(engine.export(seat_data, "compact"))
+    # everything undone: only what loading changed is left (section name, blocked seats forced UAV)
+    while store.undo():
+        pass
+    ops = json.loads(engine.export(seat_data, "patch", store))
+    assert {op["path"] for op in ops} == {
+        "/s2/section_name", "/s1/rows/r1/seats/a3/status", "/s1/rows/r3/seats/x/status"
+    }
+    assert patched() == json.loads(engine.export(seat_data, "compact"))
+
+# ──────────────── streamed ingestion ────────────────
+
+@pytest.fixture
+def rich_raw(venue_raw):
+    """The venue with fields the streamed load doesn't keep in memory, pretty-printed."""
+    data = json.loads(venue_raw)
+    data["meta"] = {"v": [1, 2.5, None, True], "s": "é \"q\""}
+    for sec in data.values():
+        if "rows" in sec:
+            sec["extra"] = {"deep": [1, 2]}
+            for row in sec["rows"].values():
+                for s in row["seats"].values():
+                    s["coords"] = [1.5, 2]
+    return json.dumps(data, indent=4)
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_streamed_export_equals_normal_export(rich_raw, chunk_size):
+    j1, j2 = engine.Journal(), engine.Journal()
+    full = engine.load_map(rich_raw, j1)
+    skeleton = load_stream(rich_raw.encode(), j2, chunk_size=chunk_size)
+    r1 = engine.run_plan(full, PLAN, journal=j1)
+    r2 = engine.run_plan(skeleton, PLAN, journal=j2)
+    names = engine.section_names_from_data(full)
+    assert engine.plan_summary(r1, names) == engine.plan_summary(r2, names)
+    for fmt in ("pretty", "compact", "patch"):
+        assert engine.export(full, fmt, r1["store"]) == engine.export(skeleton, fmt, r2["store"], rich_raw.encode())
+    assert gzip.decompress(engine.export(skeleton, "gzip", r2["store"], rich_raw.encode())) == \
+           engine.export(full, "compact")
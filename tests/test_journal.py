@@ -0,0 +1,45 @@
+import json
+
+from seatmap import engine
+
+PLANS = [
+    {"groups": [{"range": "Stalls A1-4", "price": "60"}, {"range": "Dress Circle C2", "price": ""}]},
+    {"price_only": True, "groups": [{"range": "Stalls *", "price": "42"}]},
+    {"groups": [{"range": "Stalls B", "price": "48"}], "label": "third"},
+]
+
+def load(raw):
+    journal = engine.Journal()
+    seat_data = engine.load_map(raw, journal)
+    store = engine.build_store(engine.build_seat_index(seat_data, journal=journal)[2], journal=journal)
+    return seat_data, store
+
+def test_undo_redo_round_trip(venue_raw):
+    seat_data, store = load(venue_raw)
+    states = [json.dumps(seat_data)]
+    for plan in PLANS:
+        engine.run_plan(seat_data, plan, store)
+        states.append(json.dumps(seat_data))
+    for state in reversed(states[:-1]):
+        assert store.undo() is not None
+        assert json.dumps(seat_data) == state
+    assert store.undo() is None
+    for state in states[1:]:
+        assert store.redo().label
+        assert json.dumps(seat_data) == state
+
+def test_net_changes_skip_fields_changed_back(venue_raw):
+    seat_data, store = load(venue_raw)
+    engine.run_plan(seat_data, {"price_only": True, "groups": [{"range": "Stalls B1", "price": "99"}]}, store)
+    engine.run_plan(seat_data, {"price_only": True, "groups": [{"range": "Stalls B1", "price": "40"}]}, store)
+    changed = {(obj.get("number"), field) for obj, field, _, _ in store.journal.net_changes(store)}
+    assert ("B1", "price") not in changed
+
+def test_new_apply_after_undo_drops_redo(venue_raw):
+    seat_data, store = load(venue_raw)
+    for plan in PLANS[:2]:
+        engine.run_plan(seat_data, plan, store)
+    store.undo()
+    engine.run_plan(seat_data, PLANS[2], store)
+    assert store.redo() is None
+    assert len(store.journal.undo_stack) == 2
@@ -0,0 +1,21 @@
+from seatmap.labels import norm_section_name, section_names_from_data, split_label, split_labels
+
+def test_split_labels_splits_each_distinct_label_once():
+    raws = ["A1", "A2", "A1", "ROW 3 - 12", "Row03-12", "Aisle", "", "A2"]
+    before = split_label.cache_info()
+    splits = split_labels(raws)
+    after = split_label.cache_info()
+    assert (after.hits + after.misses) - (before.hits + before.misses) == len(set(raws))
+    assert splits == [split_label(raw) for raw in raws]
+    assert splits[:5] == [("a", 1), ("a", 2), ("a", 1), ("row3", 12), ("row3", 12)]
+    assert splits[5:7] == [None, None]
+    assert splits[0][0] is splits[1][0]  # one interned prefix per row
+
+def test_section_names_are_normalised_like_load_map():
+    seat_data = {
+        "s1": {"section_name": "  Dress \t Circle ", "rows": {}},
+        "s2": {"section_name": "Bar", "type": "aoi"},
+        "s3": {"section_name": ""},
+        "meta": [1, 2],
+    }
+    assert section_names_from_data(seat_data) == [norm_section_name("  Dress \t Circle ")] == ["Dress Circle"]
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from seatmap import engine
+from seatmap.layout import Layout, LayoutMismatch
+
+def test_layout_binds_other_performances(venue_raw):
+    layout = Layout(engine.load_map(venue_raw))
+    performance = json.loads(venue_raw)
+    performance["s1"]["rows"]["r2"]["seats"]["b3"]["status"] = "uav"
+    seat_data = engine.load_map(json.dumps(performance))
+    _, _, expected = engine.build_seat_index(engine.load_map(json.dumps(performance)))
+    row_index = layout.bind(seat_data)
+    assert {k: [s["number"] for s in v[1]] for k, v in row_index.items()} == \
+           {k: [s["number"] for s in v[1]] for k, v in expected.items()}
+    assert seat_data["s1"]["rows"]["r3"]["seats"]["x"]["status"] == "uav"  # blocked, not indexed
+
+def renamed(data):
+    data["s2"]["section_name"] = "Upper Circle"
+
+def retyped(data):
+    data["s2"]["type"] = "ga"  # same seats, indexed either way
+
+def relabelled(data):
+    data["s1"]["rows"]["r2"]["seats"]["b3"]["number"] = "B9"
+
+def extra_seat(data):
+    data["s2"]["rows"]["r1"]["seats"]["c9"] = {"number": "C9", "status": "av", "price": "35"}
+
+@pytest.mark.parametrize("change", [renamed, retyped, relabelled, extra_seat])
+def test_bind_rejects_other_venues(venue_raw, change):
+    layout = Layout(engine.load_map(venue_raw))
+    performance = json.loads(venue_raw)
+    change(performance)
+    seat_data = engine.load_map(json.dumps(performance))
+    before = json.dumps(seat_data)
+    with pytest.raises(LayoutMismatch):
+        layout.bind(seat_data)
+    assert json.dumps(seat_data) == before  # checked before anything is forced to UAV
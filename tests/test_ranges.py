@@ -0,0 +1,40 @@
+from seatmap import engine
+from seatmap.ranges import ALL_ROWS, WHOLE_ROW, find_overlaps, interval_count, merge_intervals, subtract_numbers
+
+def test_parse_ranges_intervals_merge_and_longest_section_wins():
+    ranges = engine.parse_ranges(
+        "Dress Circle C1-3, Dress Circle C2-5, Dress Circle C9, Nowhere A1", ["Dress", "Dress Circle"]
+    )
+    assert ranges == {("dress circle", "c"): [(1, 5), (9, 9)]}
+
+def test_interval_helpers():
+    assert merge_intervals([(5, 6), (1, 3), (4, 4), (9, 9)]) == [(1, 6), (9, 9)]
+    assert subtract_numbers(1, 10, [2, 3, 7]) == [(1, 1), (4, 6), (8, 10)]
+    assert interval_count({("s", "a"): [(1, 5), (9, 9)]}) == 6
+
+def test_find_overlaps_sweeps_each_row():
+    specs = [{("s", "a"): [(1, 5)]}, {("s", "a"): [(4, 9)], ("s", "b"): [(1, 2)]}, {("s", "a"): [(9, 9)]}]
+    assert find_overlaps(specs) == {("s", "a"): [(4, 5), (9, 9)]}
+
+# ──────────────── wildcards (row index) ────────────────
+
+def test_parse_ranges_wildcards():
+    ranges = engine.parse_ranges("Stalls A, Stalls B*, Stalls ROW 3 - *", ["Stalls"])
+    assert ranges[("stalls", "a")] == [WHOLE_ROW]
+    assert ranges[("stalls", "b")] == [WHOLE_ROW]
+    assert ranges[("stalls", "row3")] == [WHOLE_ROW]
+    assert engine.parse_ranges("Stalls *", ["Stalls"]) == {("stalls", ALL_ROWS): [WHOLE_ROW]}
+
+def test_wildcards_count_existing_seats(venue_raw):
+    _, _, row_index = engine.build_seat_index(engine.load_map(venue_raw))
+    ranges = engine.parse_ranges("Stalls B, Dress Circle *", ["Stalls", "Dress Circle"])
+    assert interval_count(ranges, row_index) == 7
+    assert [k[2] for k in engine.iter_keys(ranges, row_index)] == [1, 2, 3, 1, 2, 3, 4]
+
+def test_whole_row_and_all_rows_resolve_to_existing_seats(venue_raw):
+    seat_data = engine.load_map(venue_raw)
+    result = engine.run_plan(seat_data, {"groups": [{"range": "Stalls B, Dress Circle *", "price": ""}]})
+    assert engine.plan_summary(result, engine.section_names_from_data(seat_data))["missing"] == 0
+    stalls = [s for row in seat_data["s1"]["rows"].values() for s in row["seats"].values()]
+    assert {s["number"] for s in stalls if s["status"] == "av"} == {"B1", "B2", "B3", "B4"}
+    assert {s["status"] for s in seat_data["s2"]["rows"]["r1"]["seats"].values()} == {"av"}
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from seatmap import engine
+
+def prices_of(seat_data, section):
+    """{number: price} of one section key."""
+    return {s["number"]: s.get("price") for row in seat_data[section]["rows"].values() for s in row["seats"].values()}
+
+def seat(number, price):
+    return {"number": number, "status": "av", "price": price}
+
+def reprice(data, rules):
+    """(seat_data, seats changed per rule, rules_report taken before applying) for a map given as a dict."""
+    seat_data = engine.load_map(json.dumps(data))
+    store = engine.build_store(engine.build_seat_index(seat_data)[2])
+    compiled = engine.compile_rules(rules, engine.section_names_from_data(seat_data))
+    report = engine.rules_report(store, compiled, seat_data)
+    return seat_data, engine.apply_rules(store, compiled, seat_data), report
+
+@pytest.mark.parametrize("text, error", [
+    ("Stalls", "expected '<seats> = <price>'"),
+    ("= 60", "expected '<seats> = <price>'"),
+    ("Nowhere = 60", "'Nowhere' is not a section"),
+    ("Stalls = abc", "bad price 'abc'"),
+    ("Stalls = row * 2", "bad price"),
+    ("Stalls = max", "bad price"),
+])
+def test_parse_errors_name_the_line(text, error):
+    with pytest.raises(engine.RuleError, match=f"^line 2: .*{error}"):
+        engine.compile_rules(["# first line is a comment", text], ["Stalls", "Dress Circle"])
+
+def test_compiled_prices():
+    rules = engine.compile_rules(
+        "Stalls = 75\nStalls = +5\nStalls = -10%\nStalls = row\nStalls = ROW  max - 2.5\nStalls = row + 5%", ["Stalls"]
+    )
+    assert [r["price"] for r in rules] == [
+        ("abs", "75", False), ("seat", 5.0, False), ("seat", -10.0, True),
+        ("row", 0.0, False), ("row max", -2.5, False), ("row", 5.0, True),
+    ]
+
+def test_first_matching_rule_wins(venue_raw):
+    seat_data, changed, report = reprice(json.loads(venue_raw), [
+        "Stalls A1-2 = 70",
+        "Stalls except blocked, uav = 60",
+        "all with pillar = 99",
+        "all = 10",
+    ])
+    stalls = prices_of(seat_data, "s1")
+    assert [stalls[f"A{n}"] for n in range(1, 7)] == ["70", "70", "99", "60", "60", "60"]
+    assert [stalls[f"B{n}"] for n in range(1, 5)] == ["60", "10", "60", "60"]  # B2 is UAV
+    assert set(prices_of(seat_data, "s2").values()) == {"10"}
+    assert [r["seats"] for r in report] == [2, 6, 1, 4]
+    assert changed == [2, 6, 1, 4]
+
+def test_relative_prices(venue_raw):
+    data = json.loads(venue_raw)
+    data["s1"]["rows"]["r2"]["seats"]["b4"]["price"] = "TBA"
+    seat_data, changed, report = reprice(data, ["Stalls A = +5", "Stalls B = -10%", "Dress Circle = -100"])
+    stalls = prices_of(seat_data, "s1")
+    assert {stalls[f"A{n}"] for n in range(1, 7)} == {"55"}
+    assert [stalls[f"B{n}"] for n in range(1, 5)] == ["36", "36", "36", "TBA"]  # no plain number to adjust
+    assert set(prices_of(seat_data, "s2").values()) == {"0"}  # never below zero
+    assert [r["unpriced"] for r in report] == [0, 1, 0]
+    assert changed == [6, 3, 3]
+
+def test_row_bases_come_from_the_json_row():
+    # two JSON rows of one index row (Stalls A): "row" and "row max" follow each seat's own JSON row
+    data = {"s1": {"section_name": "Stalls", "rows": {
+        "r1": {"price": "50", "seats": {"a1": seat("A1", "40"), "a2": seat("A2", "45")}},
+        "r2": {"price": "80", "seats": {"a3": seat("A3", "70"), "a4": seat("A4", "75")}},
+        "r3": {"seats": {"a5": seat("A5", "30")}},  # no row price
+    }}}
+    seat_data, _, _ = reprice(data, ["Stalls = row + 5"])
+    assert list(prices_of(seat_data, "s1").values()) == ["55", "55", "85", "85", "30"]
+    seat_data, _, _ = reprice(data, ["Stalls = row max + 10%"])
+    assert list(prices_of(seat_data, "s1").values()) == ["49.5", "49.5", "82.5", "82.5", "33"]
+
+def test_rules_in_a_plan_undo_as_one_operation(venue_raw):
+    seat_data = engine.load_map(venue_raw)
+    result = engine.run_plan(seat_data, {"price_only": True, "rules": ["Stalls = row + 5"]})
+    assert result["rule_changed"] == 6
+    assert prices_of(seat_data, "s1")["A1"] == "55"
+    assert prices_of(seat_data, "s1")["B1"] == "40"  # row B has no price: nothing to add to
+    assert result["store"].undo()
+    assert prices_of(seat_data, "s1")["A1"] == "50"
@@ -0,0 +1,152 @@
+import gzip, json, threading, urllib.error, urllib.request
+
+import pytest
+
+from seatmap.service import MEMORY_FACTOR, PoolHTTPServer, Service, make_server
+
+@pytest.fixture
+def serve():
+    """serve(server) runs it on a thread; returns call(method, path, body=None) → (status, JSON or bytes, headers)."""
+    servers = []
+
+    def start(server):
+        servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = "http://%s:%d" % server.server_address[:2]
+
+        def call(method, path, body=None):
+            data = body if body is None or isinstance(body, bytes) else json.dumps(body).encode()
+            request = urllib.request.Request(base + path, data=data, method=method)
+            try:
+                with urllib.request.urlopen(request) as r:
+                    status, payload, headers = r.status, r.read(), r.headers
+            except urllib.error.HTTPError as e:
+                status, payload, headers = e.code, e.read(), e.headers
+            if headers.get("Content-Type", "").endswith("json"):
+                payload = json.loads(payload)
+            return status, payload, headers
+        return call
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def call(serve):
+    return serve(make_server(port=0, workers=4, quiet=True))
+
+def upload(call, raw, query=""):
+    status, body, _ = call("POST", "/maps" + query, raw.encode())
+    assert status == 201, body
+    return body["id"]
+
+def test_upload_and_read_back(call, venue_raw):
+    status, body, _ = call("POST", "/maps", venue_raw.encode())
+    assert status == 201
+    assert (body["seats"], body["sections"], body["available"], body["undo"]) == (13, 2, 11, 0)
+    map_id = body["id"]
+    assert call("GET", f"/maps/{map_id}")[1]["seats"] == 13
+    assert [m["id"] for m in call("GET", "/maps")[1]["maps"]] == [map_id]
+    assert call("GET", f"/maps/{map_id}/tiers")[1]["tiers"] == [
+        {"section": "Dress Circle", "price": "35", "seats": 3},
+        {"section": "Stalls", "price": "40", "seats": 3},
+        {"section": "Stalls", "price": "50", "seats": 5},
+    ]
+
+def test_preview_apply_undo_redo(call, venue_raw):
+    map_id = upload(call, venue_raw)
+    status, preview, _ = call("POST", f"/maps/{map_id}/preview", {"range": "Stalls A1-8", "price": "60"})
+    assert status == 200
+    assert (preview["targets"], preview["missing"], preview["missing_seats"]) == (6, 2, ["Stalls A-7–8"])
+
+    status, applied, _ = call("POST", f"/maps/{map_id}/apply", {"groups": [{"range": "Stalls A1", "price": 7}]})
+    assert status == 200, applied
+    assert applied["assigned"] == 1 and applied["map"]["undo"] == 1
+    exported = call("GET", f"/maps/{map_id}/export")[1]
+    assert exported["s1"]["rows"]["r1"]["seats"]["a1"]["price"] == "7"
+
+    undone = call("POST", f"/maps/{map_id}/undo")[1]
+    assert undone["label"] and (undone["map"]["undo"], undone["map"]["redo"]) == (0, 1)
+    assert call("GET", f"/maps/{map_id}/export")[1]["s1"]["rows"]["r1"]["seats"]["a1"]["price"] == "50"
+    assert call("POST", f"/maps/{map_id}/redo")[1]["map"]["undo"] == 1
+    assert call("POST", f"/maps/{map_id}/redo")[1]["label"] is None  # nothing left to redo
+
+def test_export_formats(call, venue_raw):
+    map_id = upload(call, venue_raw)
+    call("POST", f"/maps/{map_id}/apply", {"price_only": True, "groups": [{"range": "Stalls B1", "price": "45"}]})
+    pretty = call("GET", f"/maps/{map_id}/export")[1]
+    status, compact, headers = call("GET", f"/maps/{map_id}/export?format=compact")
+    assert status == 200 and compact == pretty
+    assert f'filename="{map_id}.json"' in headers["Content-Disposition"]
+    assert json.loads(gzip.decompress(call("GET", f"/maps/{map_id}/export?format=gzip")[1])) == pretty
+    patch = call("GET", f"/maps/{map_id}/export?format=patch")[1]
+    assert {"op": "replace", "path": "/s1/rows/r2/seats/b1/price", "value": "45"} in patch
+    assert call("GET", f"/maps/{map_id}/export?format=xml")[0] == 400
+
+def test_rules_diff_and_best(call, venue_raw):
+    a, b = upload(call, venue_raw), upload(call, venue_raw)
+    status, report, _ = call("POST", f"/maps/{a}/rules", {"rules": ["Stalls = 70"]})
+    assert status == 200 and report["seats"] > 0
+    call("POST", f"/maps/{b}/apply", {"price_only": True, "groups": [{"range": "Stalls A1, Stalls B1", "price": "45"}]})
+    status, diff, _ = call("GET", f"/maps/{a}/diff?against={b}&limit=1")
+    assert status == 200
+    assert (diff["matched"], diff["price_changed"], len(diff["rows"]), diff["truncated"]) == (13, 2, 1, True)
+    status, best, _ = call("GET", f"/maps/{a}/best?n=2&section=Stalls")
+    assert status == 200 and best["blocks"]
+    assert call("GET", f"/maps/{a}/best?n=99")[1]["blocks"] == []
+
+def test_lru_evicts_and_delete(serve, venue_raw):
+    cost = len(venue_raw.encode()) * MEMORY_FACTOR
+    call = serve(PoolHTTPServer(("127.0.0.1", 0), Service(int(cost * 2.5)), workers=2, quiet=True))
+    first, second = upload(call, venue_raw), upload(call, venue_raw)
+    status, third, _ = call("POST", "/maps", venue_raw.encode())
+    assert third["evicted"] == [first]
+    assert call("GET", f"/maps/{first}")[0] == 404
+    assert call("DELETE", f"/maps/{second}")[1] == {"deleted": second}
+    assert [m["id"] for m in call("GET", "/maps")[1]["maps"]] == [third["id"]]
+    assert call("DELETE", f"/maps/{second}")[0] == 404
+
+@pytest.mark.parametrize("raw, error", [
+    (b"", "empty upload"),
+    (b"[1, 2]", "not a seat map"),
+    (b"{not json", "not a seat map"),
+    (b'{"a": 1}', 'no section has "rows"'),
+])
+def test_bad_uploads(call, raw, error):
+    status, body, _ = call("POST", "/maps", raw)
+    assert status == 400 and error in body["error"]
+    assert call("GET", "/maps")[1]["maps"] == []
+
+@pytest.mark.parametrize("path, spec, error", [
+    ("apply", [1], "JSON object"),
+    ("apply", {"rules": ["Stalls = abc"]}, "bad rules"),
+    ("apply", {"price_only": True, "tiers": [{"section": "Stalls", "price": "50", "new_price": "abc"}]}, "bad spec"),
+    ("apply", {"price_only": True, "tier_change": {"percent": "ten"}}, "bad spec"),
+    ("apply", {"groups": [{"range": 5, "price": "7"}]}, "bad spec"),
+    ("apply", {"groups": [{"range": "Stalls A1", "price": [7]}]}, "bad spec"),
+    ("apply", {"groups": [{"price": "7"}]}, '"groups"'),
+    ("apply", {"block_words": ["exit"]}, "fixed at upload"),
+    ("preview", {"groups": "Stalls A1"}, '"groups"'),
+    ("preview", {"range": 5}, "bad spec"),
+    ("rules", {"rules": 5}, '"rules"'),
+])
+def test_bad_specs_change_nothing(call, venue_raw, path, spec, error):
+    map_id = upload(call, venue_raw)
+    before = call("GET", f"/maps/{map_id}/export?format=compact")[1]
+    status, body, _ = call("POST", f"/maps/{map_id}/{path}", spec)
+    assert status == 400 and error in body["error"], body
+    assert call("GET", f"/maps/{map_id}")[1]["undo"] == 0
+    assert call("GET", f"/maps/{map_id}/export?format=compact")[1] == before
+
+def test_unknown_routes_and_methods(call, venue_raw):
+    map_id = upload(call, venue_raw)
+    assert call("GET", "/nowhere")[0] == 404
+    assert call("GET", "/maps/ffff")[0] == 404
+    status, _, headers = call("PUT", f"/maps/{map_id}/apply", {})
+    assert status == 405 or status == 501  # http.server answers 501 for methods it has no do_ handler for
+    status, _, headers = call("GET", f"/maps/{map_id}/apply")
+    assert status == 405 and headers["Allow"] == "POST"
+    assert call("POST", f"/maps/{map_id}/apply", b"{oops")[0] == 400
+    assert call("GET", f"/maps/{map_id}/best?n=x")[0] == 400
+    assert call("GET", f"/maps/{map_id}/diff")[0] == 400
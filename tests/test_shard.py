@@ -0,0 +1,44 @@
+import json, multiprocessing
+from collections import Counter
+
+import pytest
+
+from seatmap import engine, shard
+from seatmap.layout import iter_seats
+
+def positions(seat_data, row_index, per_section_counts, forced, duplicates, blocked):
+    """Index output with seat dicts replaced by their JSON positions, for comparing two builds."""
+    where = {id(seat): pos for pos, seat in iter_seats(seat_data)}
+    return (
+        {key: (nums, [where[id(s)] for s in seats], sections, flags)
+         for key, (nums, seats, sections, flags) in row_index.items()},
+        list(row_index),
+        dict(per_section_counts),
+        [(where[id(obj)], old) for obj, old in forced.entries(None)],
+        Counter(duplicates),
+        [where[id(s)] for s in blocked],
+    )
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="sharding needs fork")
+def test_sharded_index_equals_serial(monkeypatch, venue_with_duplicates):
+    raw = venue_with_duplicates()
+    matcher = engine.block_matcher()
+    monkeypatch.setattr(shard, "SHARD_MIN_SEATS", 0)
+
+    serial_data, serial_dups, serial_blocked = engine.load_map(raw), [], []
+    row_index, counts, forced, visits = engine._index_serial(serial_data, matcher, serial_dups, serial_blocked)
+    sharded_data, sharded_dups, sharded_blocked = engine.load_map(raw), [], []
+    built = shard.sharded_index(sharded_data, matcher, 3, sharded_dups, sharded_blocked)
+    assert built is not None
+    assert serial_dups  # synthetic venues repeat labels too; the merge must see every repeat
+    assert built[3] == visits
+    assert positions(sharded_data, built[0], built[1], built[2], sharded_dups, sharded_blocked) == \
+           positions(serial_data, row_index, counts, forced, serial_dups, serial_blocked)
+    assert json.dumps(sharded_data) == json.dumps(serial_data)  # same seats forced to UAV
+
+def test_small_maps_are_indexed_serially(venue_raw):
+    seat_data = engine.load_map(venue_raw)
+    assert shard.sharded_index(seat_data, engine.block_matcher(), 3) is None
+    _, counts, row_index = engine.build_seat_index(seat_data, workers=3)
+    _, serial_counts, serial_index = engine.build_seat_index(engine.load_map(venue_raw))
+    assert dict(counts) == dict(serial_counts) and list(row_index) == list(serial_index)
@@ -0,0 +1,52 @@
+import pytest
+
+from seatmap import engine
+from seatmap.store import TierIndex
+
+def seats_of(seat_data, section):
+    """{number: (status, price)} of one section key."""
+    return {
+        s["number"]: (s.get("status"), s.get("price"))
+        for row in seat_data[section]["rows"].values() for s in row["seats"].values()
+    }
+
+def views(store, tiers):
+    return {key: rows.tolist() for key, rows in tiers.views(store).items()}
+
+def test_price_only_tier_edits(venue_raw):
+    seat_data = engine.load_map(venue_raw)
+    engine.run_plan(seat_data, {
+        "price_only": True,
+        "tier_change": {"percent": 10},
+        "tiers": [{"section": "Stalls", "price": "40", "new_price": "45"}],
+    })
+    stalls = seats_of(seat_data, "s1")
+    assert stalls["B1"] == ("av", "45")  # explicit tier price wins over the bulk change
+    assert stalls["B2"] == ("uav", "40")  # only AV seats are repriced
+    assert stalls["A1"] == ("av", "55")
+    assert seats_of(seat_data, "s2")["C1"] == ("av", "38.5")
+
+def test_malformed_tier_change_changes_nothing(venue_raw):
+    seat_data = engine.load_map(venue_raw)
+    store = engine.build_store(engine.build_seat_index(seat_data)[2])
+    with pytest.raises(ValueError):
+        engine.run_plan(seat_data, {"price_only": True, "tier_change": {"percent": "abc"}}, store)
+    assert not store.journal.recording and not store.journal.undo_stack
+
+def test_tier_index_follows_edits_and_undo(venue_raw):
+    seat_data = engine.load_map(venue_raw)
+    store = engine.build_store(engine.build_seat_index(seat_data)[2])
+    tiers = store.tier_index()
+    plans = [
+        {"price_only": True, "groups": [{"range": "Stalls A1-2, Stalls B", "price": "40"}]},
+        {"price_only": True, "tiers": [{"section": "Stalls", "price": "40", "new_price": "45"}]},
+        {"price_only": True, "tiers": [{"section": "Dress Circle", "price": "35", "new_price": "30"}]},
+    ]
+    for plan in plans:
+        engine.run_plan(seat_data, plan, store)
+        assert views(store, tiers) == views(store, TierIndex(store))
+    assert len(tiers.rows(store, "Stalls", "45")) == 5  # A1, A2, B1, B3, B4 (B2 is UAV)
+    assert len(tiers.rows(store, "Dress Circle", "30")) == 3
+    while store.undo():
+        assert views(store, tiers) == views(store, TierIndex(store))
+    assert len(tiers.rows(store, "Stalls", "45")) == 0
@@ -0,0 +1,73 @@
+import json, os
+
+import pytest
+
+from seatmap.watch import REPORT_NAME, STATE_NAME, Watcher
+
+PLAN = {"groups": [{"range": "Stalls A1-4", "price": "60"}]}
+
+@pytest.fixture
+def dirs(tmp_path):
+    """(watched dir, output dir, watcher factory: settled files at once, one in-process worker, log kept)."""
+    incoming, out = tmp_path / "in", tmp_path / "out"
+    incoming.mkdir()
+
+    def watcher():
+        lines = []
+        w = Watcher(str(incoming), PLAN, str(out), workers=1, settle=0, log=lines.append)
+        w.lines = lines
+        return w
+    return incoming, out, watcher
+
+def report(out):
+    with open(out / REPORT_NAME, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_processes_and_records_a_file(dirs, venue_raw):
+    incoming, out, watcher = dirs
+    (incoming / "show.json").write_text(venue_raw)
+    (incoming / "notes.txt").write_text("not a map")  # doesn't match the pattern
+    w = watcher()
+    stats = w.run(once=True)
+    assert (stats["processed"], stats["skipped"], stats["failed"]) == (1, 0, 0)
+    [line] = report(out)
+    assert line["ok"] and line["file"] == str(incoming / "show.json")
+    assert set(line) >= {"queue_wait", "processing", "stages"} and line["stages"]
+    published = json.loads(open(line["out"], encoding="utf-8").read())
+    assert published["s1"]["rows"]["r1"]["seats"]["a1"]["price"] == "60"
+    assert list(json.loads((out / STATE_NAME).read_text())) == ["show.json"]
+    assert len(w.lines) == 1
+
+def test_unchanged_content_is_skipped_by_hash(dirs, venue_raw):
+    incoming, out, watcher = dirs
+    path = incoming / "show.json"
+    path.write_text(venue_raw)
+    w = watcher()
+    w.run(once=True)
+    # touched (new mtime, same bytes): queued again, skipped on its hash
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns - 10**9))
+    assert w.run(once=True)["skipped"] == 1
+    # a restart reads the state file and skips it too
+    stats = watcher().run(once=True)
+    assert (stats["processed"], stats["skipped"]) == (0, 1)
+    assert len(report(out)) == 1
+    # changed content is processed again
+    path.write_text(venue_raw.replace('"35"', '"36"'))
+    assert watcher().run(once=True)["processed"] == 1
+    assert len(report(out)) == 2
+
+def test_a_failed_file_is_reported_and_the_next_one_runs(dirs, venue_raw):
+    incoming, out, watcher = dirs
+    (incoming / "1-bad.json").write_text("{not json")
+    (incoming / "2-good.json").write_text(venue_raw)
+    stats = watcher().run(once=True)
+    assert (stats["processed"], stats["failed"]) == (1, 1)
+    bad, good = report(out)
+    assert not bad["ok"] and bad["file"].endswith("1-bad.json") and bad["error"]
+    assert good["ok"] and good["file"].endswith("2-good.json")
+    assert list(json.loads((out / STATE_NAME).read_text())) == ["2-good.json"]  # the bad file is retried
+    assert watcher().run(once=True)["failed"] == 1
+
+def test_output_must_not_be_the_watched_directory(tmp_path):
+    with pytest.raises(ValueError):
+        Watcher(str(tmp_path), PLAN, str(tmp_path))